@@ -0,0 +1,239 @@
+"""Benchmarks of python-fakturoid against local stub server.
+
+    python -m benchmarks.run --output results.json
+    python -m benchmarks.run --quick --compare results.json
+
+Results are written as JSON. Timings are in seconds, best and median of
+repeated runs are reported. With --compare ratios of best times to given
+earlier results are printed (values above 1 are slower).
+"""
+import argparse
+import copy
+import gc
+import json
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+
+from fakturoid import Fakturoid, Invoice, Expense, Subject
+from fakturoid.search import SubjectIndex
+
+from benchmarks.server import StubServer, invoice_fields, expense_fields, subject_fields
+
+LISTINGS = [
+    # name, collection, find kwargs, streamed
+    ('list_invoices', 'invoices', {}, False),
+    ('list_invoices_lazy', 'invoices', {'lazy': True}, False),
+    ('list_invoices_compact', 'invoices', {'compact': True}, False),
+    ('list_invoices_prefetch', 'invoices', {'prefetch': 4}, False),
+    ('list_invoices_stream', 'invoices', {}, True),
+    ('list_expenses', 'expenses', {}, False),
+    ('list_subjects', 'subjects', {}, False),
+]
+
+MODELS = [
+    ('invoice', Invoice, invoice_fields),
+    ('expense', Expense, expense_fields),
+    ('subject', Subject, subject_fields),
+]
+
+SEARCHES = [
+    # name, query (short and common terms match most of subjects)
+    ('search_short', 'c'),
+    ('search_common', 'praha'),
+    ('search_number', '1000'),
+    ('search_typo', 'clinet'),
+    ('search_terms', 'client 12 praha'),
+]
+
+
+def timed(fn, repeat, setup=None):
+    """Times repeated calls of fn. If setup is given, it's called before
+    every run (not timed) and its result is passed to fn.
+    """
+    times = []
+    for _ in range(repeat):
+        args = (setup(),) if setup is not None else ()
+        gc.collect()
+        start = time.perf_counter()
+        fn(*args)
+        times.append(time.perf_counter() - start)
+    return {'best': min(times), 'median': statistics.median(times), 'repeat': repeat}
+
+
+def session(server):
+    return Fakturoid('bench', 'bench@example.com', 'key', base_url=server.base_url, coalesce=False)
+
+
+def listing(fa, collection, kwargs, streamed):
+    if collection == 'subjects':
+        # fa.subjects() returns first page only, paged list goes through all of them
+        items = fa.list_type(fa._models_api[Subject], collection, dict(kwargs))
+    else:
+        items = getattr(fa, collection)(**kwargs)
+    return items.stream(incremental=True) if streamed else items
+
+
+def bench_listings(server, repeat):
+    results = {}
+    for name, collection, kwargs, streamed in LISTINGS:
+        counts = []
+        with session(server) as fa:
+            def run():
+                counts.append(sum(1 for _ in listing(fa, collection, kwargs, streamed)))
+            result = timed(run, repeat)
+        count = counts[0]
+        result['items'] = count
+        result['items_per_second'] = count / result['best']
+        results[name] = result
+    return results
+
+
+def bench_models(count, lines, repeat):
+    results = {}
+    for name, model_type, generate in MODELS:
+        raw = [generate(id, lines) for id in range(1, count + 1)]
+
+        # update() converts values in place, so every run decodes own copy
+        def decode(data):
+            for fields in data:
+                model_type().update(fields)
+        result = timed(decode, repeat, lambda: copy.deepcopy(raw))
+        result['per_item'] = result['best'] / count
+        results['decode_' + name] = result
+
+        models = []
+        for fields in copy.deepcopy(raw):
+            model = model_type()
+            model.update(fields)
+            models.append(model)
+
+        def serialize():
+            for model in models:
+                model.get_fields()
+        result = timed(serialize, repeat)
+        result['per_item'] = result['best'] / count
+        results['serialize_' + name] = result
+    return results
+
+
+def bench_search(count, repeat, queries=100):
+    subjects = []
+    for id in range(1, count + 1):
+        subject = Subject()
+        subject.update(subject_fields(id))
+        subjects.append(subject)
+    index = SubjectIndex(subjects)
+    index.search('warm up')  # sorted words and ranks are built lazily
+    results = {}
+    for name, query in SEARCHES:
+        def search():
+            for _ in range(queries):
+                index.search(query)
+        result = timed(search, repeat)
+        result['subjects'] = count
+        result['per_query'] = result['best'] / queries
+        results[name] = result
+    return results
+
+
+def bench_memory(server):
+    results = {}
+    for name, kwargs, streamed in [('memory_list', {}, False),
+                                   ('memory_list_compact', {'compact': True}, False),
+                                   ('memory_stream', {}, True)]:
+        with session(server) as fa:
+            gc.collect()
+            tracemalloc.start()
+            try:
+                items = listing(fa, 'invoices', kwargs, streamed)
+                for _ in items:
+                    pass
+                current, peak = tracemalloc.get_traced_memory()
+            finally:
+                tracemalloc.stop()
+            del items
+        results[name] = {'peak_bytes': peak, 'retained_bytes': current, 'items': server.counts['invoices']}
+    return results
+
+
+def import_time():
+    """Returns seconds spent importing fakturoid in fresh interpreter
+    as reported by -X importtime.
+    """
+    output = subprocess.check_output([sys.executable, '-X', 'importtime', '-c', 'import fakturoid'],
+                                     stderr=subprocess.STDOUT).decode('utf-8')
+    for line in output.splitlines():
+        parts = line.split('|')
+        if len(parts) == 3 and parts[2].strip() == 'fakturoid':
+            return int(parts[1]) / 1e6
+    raise RuntimeError('import time of fakturoid not reported')
+
+
+def bench_import(repeat):
+    times = [import_time() for _ in range(max(repeat, 5))]
+    return {'import': {'best': min(times), 'median': statistics.median(times), 'repeat': len(times)}}
+
+
+def run(invoices=2000, lines=10, latency=0.0, repeat=5):
+    config = {'invoices': invoices, 'lines': lines, 'latency': latency, 'repeat': repeat}
+    results = bench_import(repeat)
+    with StubServer(invoices=invoices, expenses=invoices, subjects=invoices, lines=lines, latency=latency) as server:
+        results.update(bench_listings(server, repeat))
+        results.update(bench_memory(server))
+    results.update(bench_models(min(invoices, 1000), lines, repeat))
+    results.update(bench_search(invoices * 5, repeat))
+    return {
+        'python': platform.python_version(),
+        'implementation': platform.python_implementation(),
+        'platform': platform.platform(),
+        'config': config,
+        'results': results,
+    }
+
+
+def compare(current, baseline):
+    """Returns ratios of current to baseline values for common benchmarks."""
+    ratios = {}
+    for name, result in current['results'].items():
+        base = baseline['results'].get(name)
+        if not base:
+            continue
+        key = 'best' if 'best' in result else 'peak_bytes'
+        if base.get(key):
+            ratios[name] = result[key] / float(base[key])
+    return ratios
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--invoices', type=int, default=2000, help='documents in every collection')
+    parser.add_argument('--lines', type=int, default=10, help='lines per invoice and expense')
+    parser.add_argument('--latency', type=float, default=0.0, help='response latency in seconds')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--quick', action='store_true', help='small run for smoke testing')
+    parser.add_argument('--output', help='file to write results to (stdout by default)')
+    parser.add_argument('--compare', help='results of earlier run to compare with')
+    args = parser.parse_args(argv)
+
+    if args.quick:
+        args.invoices, args.repeat = 100, 1
+    data = run(args.invoices, args.lines, args.latency, args.repeat)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(data, f, indent=2, sort_keys=True)
+    else:
+        json.dump(data, sys.stdout, indent=2, sort_keys=True)
+        sys.stdout.write('\n')
+    if args.compare:
+        with open(args.compare) as f:
+            ratios = compare(data, json.load(f))
+        for name in sorted(ratios):
+            sys.stderr.write('{0:<28} {1:6.2f}x\n'.format(name, ratios[name]))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,250 @@
+"""Local stub of Fakturoid API used by benchmarks.
+
+Serves paged ``invoices``, ``expenses`` and ``subjects`` collections with
+Link headers and single invoices, expenses and subjects by id. Documents are
+generated deterministically and encoded once, so serving them costs almost
+nothing compared to client side work.
+
+    with StubServer(invoices=1000, lines=10, latency=0.02) as server:
+        fa = Fakturoid('bench', 'bench@example.com', 'key', base_url=server.base_url)
+"""
+import json
+import re
+import threading
+import time
+from datetime import date, timedelta
+
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+from urllib.parse import urlparse, parse_qs
+
+__all__ = ['StubServer', 'invoice_fields', 'expense_fields', 'subject_fields']
+
+PAGE_SIZE = 20
+
+_path_pattern = re.compile(r'^/api/v2/accounts/[^/]+/(invoices|expenses|subjects)(?:/(\d+))?\.json$')
+
+
+def _day(n):
+    return (date(2020, 1, 1) + timedelta(days=n % 1500)).isoformat()
+
+
+def _lines(id, count):
+    return [{
+        'id': id * 1000 + i,
+        'name': 'Item {0}'.format(i),
+        'quantity': '{0}.0'.format(i % 5 + 1),
+        'unit_name': 'pcs',
+        'unit_price': '{0}.5'.format(100 + i),
+        'vat_rate': 21,
+        'unit_price_without_vat': '{0}.5'.format(100 + i),
+        'unit_price_with_vat': '{0}.6'.format(121 + i),
+    } for i in range(count)]
+
+
+def invoice_fields(id, lines=2):
+    return {
+        'id': id,
+        'proforma': False,
+        'number': '2020-{0:05d}'.format(id),
+        'variable_symbol': '2020{0:05d}'.format(id),
+        'your_name': 'Alexandr Hejsek',
+        'your_street': 'Hopsinková 14',
+        'your_city': 'Praha',
+        'your_zip': '10000',
+        'your_country': 'CZ',
+        'your_registration_no': '87654321',
+        'your_vat_no': 'CZ87654321',
+        'client_name': 'Client {0} s.r.o.'.format(id % 500),
+        'client_street': 'Trojanova 1216/46',
+        'client_city': 'Praha',
+        'client_zip': '11000',
+        'client_country': 'CZ',
+        'client_registration_no': '{0:08d}'.format(id % 500),
+        'client_vat_no': 'CZ{0:08d}'.format(id % 500),
+        'subject_id': id % 500 + 1,
+        'generator_id': None,
+        'related_id': None,
+        'token': 'udDTG8Q{0}'.format(id),
+        'status': ('open', 'sent', 'overdue', 'paid')[id % 4],
+        'order_number': None,
+        'issued_on': _day(id),
+        'taxable_fulfillment_due': _day(id),
+        'due': 14,
+        'due_on': _day(id + 14),
+        'sent_at': None,
+        'paid_at': '2020-05-13T12:11:37+02:00' if id % 4 == 3 else None,
+        'note': None,
+        'bank_account': '1234/1234',
+        'payment_method': 'bank',
+        'currency': 'CZK',
+        'exchange_rate': '1.0',
+        'language': 'cz',
+        'transferred_tax_liability': False,
+        'subtotal': '40000.0',
+        'total': '48400.0',
+        'remaining_amount': '48400.0',
+        'native_subtotal': '40000.0',
+        'native_total': '48400.0',
+        'lines': _lines(id, lines),
+        'html_url': 'https://app.fakturoid.cz/bench/invoices/{0}'.format(id),
+        'url': 'https://app.fakturoid.cz/api/v2/accounts/bench/invoices/{0}.json'.format(id),
+        'updated_at': '2020-05-13T12:11:37+02:00',
+    }
+
+
+def expense_fields(id, lines=2):
+    return {
+        'id': id,
+        'original_number': 'FV{0:06d}'.format(id),
+        'number': 'N{0:05d}'.format(id),
+        'variable_symbol': '{0:010d}'.format(id),
+        'supplier_name': 'Supplier {0} a.s.'.format(id % 200),
+        'supplier_city': 'Brno',
+        'supplier_registration_no': '{0:08d}'.format(id % 200),
+        'subject_id': id % 500 + 1,
+        'status': ('open', 'overdue', 'paid')[id % 3],
+        'document_type': 'invoice',
+        'issued_on': _day(id),
+        'taxable_fulfillment_due': _day(id),
+        'due_on': _day(id + 14),
+        'paid_on': _day(id + 10) if id % 3 == 2 else None,
+        'currency': 'CZK',
+        'exchange_rate': '1.0',
+        'payment_method': 'bank',
+        'subtotal': '1000.0',
+        'total': '1210.0',
+        'native_subtotal': '1000.0',
+        'native_total': '1210.0',
+        'lines': _lines(id, lines),
+        'url': 'https://app.fakturoid.cz/api/v2/accounts/bench/expenses/{0}.json'.format(id),
+        'updated_at': '2020-05-13T12:11:37+02:00',
+    }
+
+
+def subject_fields(id, lines=None):
+    return {
+        'id': id,
+        'custom_id': None,
+        'type': 'customer',
+        'name': 'Client {0} s.r.o.'.format(id % 500),
+        'street': 'Vyskočilova 1461/2a',
+        'city': 'Praha',
+        'zip': '14000',
+        'country': 'CZ',
+        'registration_no': '{0:08d}'.format(id),
+        'vat_no': 'CZ{0:08d}'.format(id),
+        'email': 'info{0}@example.com'.format(id),
+        'phone': '',
+        'web': '',
+        'html_url': 'https://app.fakturoid.cz/bench/subjects/{0}'.format(id),
+        'url': 'https://app.fakturoid.cz/api/v2/accounts/bench/subjects/{0}.json'.format(id),
+        'updated_at': '2020-05-13T12:11:38+02:00',
+        'created_at': '2020-05-13T12:11:38+02:00',
+    }
+
+
+GENERATORS = {
+    'invoices': invoice_fields,
+    'expenses': expense_fields,
+    'subjects': subject_fields,
+}
+
+
+class _HTTPServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        stub = self.server.stub
+        url = urlparse(self.path)
+        m = _path_pattern.match(url.path)
+        if not m:
+            return self._send(404, b'{"errors": "not found"}')
+        collection, id = m.group(1), m.group(2)
+        if stub.latency:
+            time.sleep(stub.latency)
+        with stub._lock:
+            stub.requests += 1
+        if id:
+            id = int(id)
+            if not 1 <= id <= stub.counts[collection]:
+                return self._send(404, b'{"errors": "not found"}')
+            return self._send(200, json.dumps(GENERATORS[collection](id, stub.lines)).encode('utf-8'))
+        page = int(parse_qs(url.query).get('page', ['1'])[0])
+        body, last = stub.page(collection, page)
+        link = '<{0}{1}?page={2}>; rel="last"'.format(stub.base_url, url.path[len('/api/v2'):], last)
+        self._send(200, body, {'Link': link})
+
+    def _send(self, status, body, headers=None):
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class StubServer(object):
+    """Stub Fakturoid API listening on localhost.
+
+    invoices, expenses, subjects -- number of documents in collections
+    lines -- number of lines of every invoice and expense
+    latency -- seconds every response is delayed
+    """
+
+    def __init__(self, invoices=200, expenses=200, subjects=200, lines=2, latency=0.0, port=0):
+        self.counts = {'invoices': invoices, 'expenses': expenses, 'subjects': subjects}
+        self.lines = lines
+        self.latency = latency
+        self.requests = 0
+        self._pages = {}
+        self._lock = threading.Lock()
+        self._server = _HTTPServer(('127.0.0.1', port), _Handler)
+        self._server.stub = self
+        self._thread = None
+
+    @property
+    def base_url(self):
+        return 'http://127.0.0.1:{0}/api/v2'.format(self._server.server_address[1])
+
+    def page(self, collection, n):
+        """Returns encoded page n (counted from 1) and number of last page."""
+        count = self.counts[collection]
+        last = max(1, (count + PAGE_SIZE - 1) // PAGE_SIZE)
+        key = (collection, n)
+        with self._lock:
+            body = self._pages.get(key)
+        if body is None:
+            ids = range((n - 1) * PAGE_SIZE + 1, min(n * PAGE_SIZE, count) + 1)
+            generate = GENERATORS[collection]
+            body = json.dumps([generate(id, self.lines) for id in ids]).encode('utf-8')
+            with self._lock:
+                self._pages[key] = body
+        return body, last
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever)
+        self._thread.daemon = True
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+        self._thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
@@ -0,0 +1,276 @@
+"""Asyncio interface to Fakturoid API. Requires httpx (pip install fakturoid[async]).
+
+    from fakturoid.aio import AsyncFakturoid
+
+    async with AsyncFakturoid('yourslug', 'your@email.com', 'apikey038dc73...') as fa:
+        invoice = await fa.invoice(9)
+        async for invoice in fa.invoices(status='paid'):
+            print(invoice.number)
+"""
+import asyncio
+import inspect
+from collections import OrderedDict
+
+import httpx
+
+from fakturoid.api import Fakturoid, ValidationError
+from fakturoid.bulk import BulkResult
+from fakturoid.coalesce import flight_key, copy_response
+from fakturoid.index import Index
+from fakturoid.search import SubjectIndex
+from fakturoid.throttle import priority, BULK
+from fakturoid.transport import Transport
+
+__all__ = ['AsyncFakturoid', 'AsyncModelList', 'AsyncTransport']
+
+
+class AsyncModelList(object):
+    """Async counterpart of ModelList. Supports ``async for`` and fetches
+    up to prefetch following pages concurrently once page count is known.
+    """
+
+    def __init__(self, model_api, endpoint, params=None, prefetch=None, cache_pages=None, lazy=False, compact=False):
+        self.model_api = model_api
+        self.endpoint = endpoint
+        self.params = params or {}
+        self.prefetch = prefetch or 4
+        self.cache_pages = cache_pages
+        self.lazy = lazy
+        self.compact = compact
+        self.pages = OrderedDict()
+        self.page_count = None
+        self.indexes = {}
+
+    async def load_page(self, n):
+        params = {'page': n + 1}
+        params.update(self.params)
+        response = await self.model_api.session._get(self.endpoint, params=params)
+        if self.page_count is None:
+            self.page_count = response.get('page_count', n + 1)
+        page = list(self.model_api.unpack(response, lazy=self.lazy, compact=self.compact))
+        for index in list(self.indexes.values()):
+            index.add(page)
+        return page
+
+    async def get_page(self, n):
+        if self.page_count and n >= self.page_count:
+            raise IndexError('index out of range')
+        if n in self.pages:
+            if self.cache_pages:
+                self.pages.move_to_end(n)
+            return self.pages[n]
+        page = await self.load_page(n)
+        if page:
+            self.pages[n] = page
+            if self.cache_pages:
+                while len(self.pages) > self.cache_pages:
+                    self.pages.popitem(last=False)
+            return page
+        raise IndexError('index out of range')
+
+    async def ensure_page_count(self):
+        if self.page_count is None:
+            await self.get_page(0)
+
+    async def fetch_all(self):
+        """Loads all pages concurrently and returns list of all models."""
+        try:
+            await self.ensure_page_count()
+        except IndexError:
+            return []
+        semaphore = asyncio.Semaphore(self.prefetch)
+
+        async def fetch(n):
+            async with semaphore:
+                return await self.get_page(n)
+
+        pages = await asyncio.gather(*[fetch(n) for n in range(self.page_count)])
+        return [model for page in pages for model in page]
+
+    async def index(self, field, load=True):
+        """Returns Index of models by field value, see ModelList.index."""
+        index = self.indexes.get(field)
+        if index is None:
+            index = self.indexes[field] = Index(field)
+            index.add(model for page in list(self.pages.values()) for model in page)
+        if load and not index.complete:
+            await self.fetch_all()
+            index.complete = True
+        return index
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        try:
+            first = await self.get_page(0)
+        except IndexError:
+            return
+        pending = {}
+        next_page = 1
+        current = first
+        n = 0
+        try:
+            while True:
+                # keep up to `prefetch` following pages in flight
+                while next_page < self.page_count and len(pending) < self.prefetch:
+                    pending[next_page] = asyncio.ensure_future(self.get_page(next_page))
+                    next_page += 1
+                for model in current:
+                    yield model
+                n += 1
+                if n >= self.page_count:
+                    break
+                try:
+                    current = await pending.pop(n)
+                except IndexError:
+                    break
+        finally:
+            for task in pending.values():
+                task.cancel()
+
+    def __str__(self):
+        return "<async list of {0} models>".format(self.model_api.model_type.__name__)
+
+
+class AsyncTransport(Transport):
+    """Transport using httpx.AsyncClient, request() and close() are coroutines."""
+
+    def __init__(self, pool_size=10, keep_alive=True):
+        self.pool_size = pool_size
+        self.keep_alive = keep_alive
+        self._http = None
+
+    def _get_http(self):
+        if self._http is None:
+            limits = httpx.Limits(
+                max_connections=self.pool_size,
+                max_keepalive_connections=self.pool_size if self.keep_alive else 0
+            )
+            self._http = httpx.AsyncClient(limits=limits)
+        return self._http
+
+    async def request(self, method, url, **kwargs):
+        if 'data' in kwargs:
+            kwargs['content'] = kwargs.pop('data')
+        return await self._get_http().request(method.upper(), url, **kwargs)
+
+    async def close(self):
+        if self._http is not None:
+            http, self._http = self._http, None
+            await http.aclose()
+
+
+class _Flight(object):
+
+    def __init__(self):
+        self.future = None
+        self.followers = 0
+        self.result = None
+
+
+class AsyncFakturoid(Fakturoid):
+    """Fakturoid API client with awaitable methods. Uses same models
+    and parameter validation as Fakturoid.
+    """
+    list_type = AsyncModelList
+
+    def __init__(self, *args, **kwargs):
+        super(AsyncFakturoid, self).__init__(*args, **kwargs)
+        self._in_flight = {}
+        self._search_index_lock = None  # asyncio lock, created in running loop
+
+    async def subject_index(self, max_age=None):
+        """Awaitable variant of Fakturoid.subject_index()."""
+        if self._search_index_lock is None:
+            self._search_index_lock = asyncio.Lock()
+        async with self._search_index_lock:
+            if self.search_index is None:
+                index = SubjectIndex()
+                await index.refresh_async(self)
+                self.search_index = index
+            elif max_age is not None and self.search_index.age() > max_age:
+                await self.search_index.refresh_async(self)
+            return self.search_index
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.close()
+
+    def __enter__(self):
+        raise TypeError("use 'async with' with AsyncFakturoid")
+
+    async def close(self):
+        await self.transport.close()
+
+    def default_transport(self):
+        return AsyncTransport(self.pool_size, self.keep_alive)
+
+    async def _make_request(self, method, success_status, endpoint, **kwargs):
+        url = self._url(endpoint)
+        headers = {'User-Agent': self.user_agent}
+        headers.update(kwargs.pop('headers', {}))
+        attempt = 0
+        while True:
+            await self.scheduler.acquire_async()
+            request = self._before_request(method, endpoint, url, kwargs.get('params'), attempt)
+            r = await self.transport.request(method, url, auth=(self.email, self.api_key), headers=headers, **kwargs)
+            self._after_request(request, r)
+            self.scheduler.feedback(r.status_code, r.headers)
+            delay = self.scheduler.retry_delay(method, r.status_code, r.headers, attempt)
+            if delay is None:
+                break
+            attempt += 1
+            await asyncio.sleep(delay)
+        return self._process_response(r, success_status, request=request)
+
+    def _get(self, endpoint, params=None):
+        if self._flights is None:
+            return self._fetch(endpoint, params)
+        return self._coalesced_get(endpoint, params)
+
+    async def _coalesced_get(self, endpoint, params):
+        key = flight_key(endpoint, params)
+        flight = self._in_flight.get(key)
+        if flight is not None:
+            flight.followers += 1
+            await asyncio.shield(flight.future)
+            return copy_response(flight.result)
+        flight = self._in_flight[key] = _Flight()
+        flight.future = asyncio.ensure_future(self._fly(key, flight, endpoint, params))
+        # shielded, cancelled caller must not cancel request shared with others
+        return await asyncio.shield(flight.future)
+
+    async def _fly(self, key, flight, endpoint, params):
+        try:
+            result = await self._fetch(endpoint, params)
+        finally:
+            if self._in_flight.get(key) is flight:
+                del self._in_flight[key]
+        if flight.followers:
+            # copied before any caller is resumed, leader's caller owns original
+            flight.result = copy_response(result)
+        return result
+
+    async def _run_bulk(self, fn, items, workers):
+        semaphore = asyncio.Semaphore(workers)
+
+        async def call(item):
+            async with semaphore:
+                try:
+                    with priority(BULK):
+                        return BulkResult(item, BulkResult.OK, await fn(item), None)
+                except ValidationError as e:
+                    return BulkResult(item, BulkResult.INVALID, None, e)
+                except Exception as e:
+                    return BulkResult(item, BulkResult.FAILED, None, e)
+
+        return await asyncio.gather(*[call(item) for item in items])
+
+    def _then(self, response, callback):
+        async def chain():
+            result = await response if inspect.isawaitable(response) else response
+            return callback(result)
+        return chain()
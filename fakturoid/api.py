@@ -1,31 +1,69 @@
 import re
 import json
+import threading
+import time
 from datetime import date, datetime
 from functools import wraps
 
-import requests
+from urllib.parse import urlencode
 
 from fakturoid.models import Account, Subject, Invoice, Generator, Message, Expense
+from fakturoid.bulk import run_bulk
+from fakturoid.cache import CacheEntry, copy_values
+from fakturoid.coalesce import SingleFlight, Memo, flight_key
+from fakturoid.compact import compact_type
+from fakturoid.jsonstream import loads, iter_array
+from fakturoid.mirror import Mirror
+from fakturoid.search import SubjectIndex
+from fakturoid.throttle import Scheduler, priority, BULK
+from fakturoid.transport import RequestsTransport
 from fakturoid.paging import ModelList
 
-__all__ = ['Fakturoid']
+__all__ = ['Fakturoid', 'ValidationError']
 
 link_header_pattern = re.compile(r'page=(\d+)[^>]*>; rel="last"')
 
 
+class ValidationError(ValueError):
+    """Request was rejected by Fakturoid, errors are available as errors attribute."""
+
+    @property
+    def errors(self):
+        return self.args[0]
+
+
 class Fakturoid(object):
     """Fakturoid API v2 - http://docs.fakturoid.apiary.io/"""
     slug = None
     api_key = None
     user_agent = 'python-fakturoid (https://github.com/farin/python-fakturoid)'
+    base_url = 'https://app.fakturoid.cz/api/v2'
+
+    list_type = ModelList
+
+    STREAM_CHUNK_SIZE = 64 * 1024
 
     _models_api = None
 
-    def __init__(self, slug, email, api_key, user_agent=None):
+    def __init__(self, slug, email, api_key, user_agent=None, pool_size=10, keep_alive=True, cache=None,
+                 rate_limit=None, max_retries=3, scheduler=None, coalesce=True, memo_ttl=None,
+                 transport=None, base_url=None, instruments=()):
         self.slug = slug
         self.api_key = api_key
         self.email = email
         self.user_agent = user_agent or self.user_agent
+        self.base_url = (base_url or self.base_url).rstrip('/')
+        self.pool_size = pool_size
+        self.keep_alive = keep_alive
+        self.cache = cache
+        self.scheduler = scheduler or Scheduler(rate=rate_limit, max_retries=max_retries)
+        self.memo = Memo(memo_ttl) if memo_ttl else None
+        self._flights = SingleFlight() if coalesce else None
+
+        self.transport = transport or self.default_transport()
+        self.instruments = list(instruments)
+        self.search_index = None
+        self._search_index_lock = threading.Lock()
 
         self._models_api = {
             Account: AccountApi(self),
@@ -49,12 +87,49 @@ class Fakturoid(object):
         self.subjects = subjects_find
         self.subjects.search = subjects_search
 
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        """Close pooled connections. Session can be still used after close,
+        new connections are opened on next request.
+        """
+        self.transport.close()
+
+    def default_transport(self):
+        return RequestsTransport(self.pool_size, self.keep_alive)
+
+    def add_instrument(self, instrument):
+        """Adds instrument notified about requests, see fakturoid.instrumentation."""
+        # list is replaced, so that threads iterating over it are not affected
+        self.instruments = self.instruments + [instrument]
+
+    def remove_instrument(self, instrument):
+        self.instruments = [i for i in self.instruments if i is not instrument]
+
+    def _notify(self, event, *args):
+        for instrument in self.instruments:
+            getattr(instrument, event)(*args)
+
+    def bulk(self):
+        """Context manager lowering priority of requests made inside it,
+        interactive requests from other threads are served first.
+        """
+        return priority(BULK)
+
     def model_api(model_type=None):
         def wrap(fn):
             @wraps(fn)
             def wrapper(self, *args, **kwargs):
                 mt = model_type or type(args[0])
-                mapi = self._models_api.get(mt)
+                mapi = None
+                for base in mt.__mro__:  # compact models are subclasses
+                    mapi = self._models_api.get(base)
+                    if mapi:
+                        break
                 if not mapi:
                     raise TypeError('model expected, got {0}'.format(mt.__name__))
                 return fn(self, mapi, *args, **kwargs)
@@ -110,9 +185,26 @@ class Fakturoid(object):
     def generators(self, mapi, *args, **kwargs):
         return mapi.find(*args, **kwargs)
 
+    def mirror(self, path, prefetch=None):
+        """Returns local SQLite mirror of account stored in path, see fakturoid.mirror."""
+        return Mirror(self, path, prefetch=prefetch)
+
+    def subject_index(self, max_age=None):
+        """Returns local search index of subjects (see fakturoid.search). Index
+        is loaded on first call and refreshed if it's older than max_age seconds.
+        """
+        with self._search_index_lock:
+            if self.search_index is None:
+                index = SubjectIndex()
+                index.refresh(self)
+                self.search_index = index
+            elif max_age is not None and self.search_index.age() > max_age:
+                self.search_index.refresh(self)
+            return self.search_index
+
     @model_api()
     def save(self, mapi, obj, **kwargs):
-        mapi.save(obj, **kwargs)
+        return mapi.save(obj, **kwargs)
 
     @model_api()
     def delete(self, mapi, obj):
@@ -122,7 +214,42 @@ class Fakturoid(object):
 
         fa.delete(Subject(id=1234))
         """
-        mapi.delete(obj)
+        return mapi.delete(obj)
+
+    def save_many(self, models, workers=4):
+        """Saves models using parallel workers. Returns list of BulkResult
+        (see fakturoid.bulk), value of successful result is saved model.
+        """
+        def save(model):
+            return self._then(self.save(model), lambda result: model)
+        return self._run_bulk(save, models, workers)
+
+    def delete_many(self, models, workers=4):
+        """Deletes models using parallel workers.
+
+        fa.delete_many([Subject(id=1234), Subject(id=1235)])
+        """
+        return self._run_bulk(self.delete, models, workers)
+
+    def fire_invoice_events(self, events, workers=4):
+        """Fires events given as (id, event) or (id, event, kwargs) tuples.
+
+        fa.fire_invoice_events([(11331402, 'pay', {'paid_at': date(2018, 11, 17)}), (11331403, 'cancel')])
+        """
+        return self._run_bulk(self._event_firer(self.fire_invoice_event), events, workers)
+
+    def fire_expense_events(self, events, workers=4):
+        """Same as fire_invoice_events for expenses."""
+        return self._run_bulk(self._event_firer(self.fire_expense_event), events, workers)
+
+    def _run_bulk(self, fn, items, workers):
+        return run_bulk(fn, items, workers)
+
+    def _event_firer(self, fire):
+        def fire_event(event):
+            args, kwargs = (event[:2], event[2]) if len(event) == 3 else (event, {})
+            return fire(*args, **kwargs)
+        return fire_event
 
     def _extract_page_link(self, header):
         m = link_header_pattern.search(header)
@@ -131,30 +258,142 @@ class Fakturoid(object):
         return None
 
     def _make_request(self, method, success_status, endpoint, **kwargs):
-        url = "https://app.fakturoid.cz/api/v2/accounts/{0}/{1}.json".format(self.slug, endpoint)
+        url = self._url(endpoint)
         headers = {'User-Agent': self.user_agent}
         headers.update(kwargs.pop('headers', {}))
-        r = getattr(requests, method)(url, auth=(self.email, self.api_key), headers=headers, **kwargs)
-        try:
-            json_result = r.json()
-        except Exception:
+        stream = kwargs.get('stream', False)
+        attempt = 0
+        while True:
+            self.scheduler.acquire()
+            request = self._before_request(method, endpoint, url, kwargs.get('params'), attempt)
+            r = self.transport.request(method, url, auth=(self.email, self.api_key), headers=headers, **kwargs)
+            self._after_request(request, r, stream)
+            self.scheduler.feedback(r.status_code, r.headers)
+            delay = self.scheduler.retry_delay(method, r.status_code, r.headers, attempt)
+            if delay is None:
+                break
+            r.close()  # release connection of discarded (possibly streamed) response
+            attempt += 1
+            self.scheduler.sleep(delay)
+        return self._process_response(r, success_status, stream, request)
+
+    def _before_request(self, method, endpoint, url, params, attempt):
+        if not self.instruments:
+            return None
+        from fakturoid.instrumentation import RequestInfo
+        request = RequestInfo(method, endpoint, url, params, attempt)
+        self._notify('before_request', request)
+        request.elapsed = time.perf_counter()
+        return request
+
+    def _after_request(self, request, r, stream=False):
+        if request is None:
+            return
+        request.elapsed = time.perf_counter() - request.elapsed
+        request.status_code = r.status_code
+        if 'content-length' in r.headers:
+            request.bytes = int(r.headers['content-length'])
+        elif not stream:
+            request.bytes = len(r.content)
+        self._notify('after_request', request, r)
+
+    def _url(self, endpoint):
+        return "{0}/accounts/{1}/{2}.json".format(self.base_url, self.slug, endpoint)
+
+    def _process_response(self, r, success_status, stream=False, request=None):
+        if stream and r.status_code == success_status:
             json_result = None
+            response = {'json': None, 'items': self._iter_items(r)}
+        else:
+            start = time.perf_counter()
+            try:
+                json_result = loads(r.content)
+            except Exception:
+                json_result = None
+            if request is not None and r.content:
+                self._notify('json_decoded', request, time.perf_counter() - start)
+            response = {'json': json_result}
 
         if r.status_code == success_status:
-            response = {'json': json_result}
             if 'link' in r.headers:
                 page_count = self._extract_page_link(r.headers['link'])
                 if page_count:
                     response['page_count'] = page_count
+            for header in ('etag', 'last-modified'):
+                if header in r.headers:
+                    response[header] = r.headers[header]
             return response
 
+        if r.status_code == 304:
+            return {'json': None, 'not_modified': True}
+
         if json_result and "errors" in json_result:
-            raise ValueError(json_result["errors"])
+            raise ValidationError(json_result["errors"])
 
         r.raise_for_status()
 
+    def _iter_items(self, r):
+        try:
+            for item in iter_array(r.iter_content(self.STREAM_CHUNK_SIZE)):
+                yield item
+        finally:
+            r.close()
+
+    def _then(self, response, callback):
+        """Passes response to callback. Async session overrides it to chain
+        callback after awaited response, so model apis can be shared.
+        """
+        return callback(response)
+
     def _get(self, endpoint, params=None):
-        return self._make_request('get', 200, endpoint, params=params)
+        if self._flights is None:
+            return self._fetch(endpoint, params)
+        return self._flights.do(flight_key(endpoint, params), lambda: self._fetch(endpoint, params))
+
+    def _load(self, endpoint):
+        """GET of single resource, answered from memo if it's enabled."""
+        if self.memo is None:
+            return self._get(endpoint)
+        response = self.memo.get(endpoint)
+        if response is not None:
+            return response
+        return self._then(self._get(endpoint), lambda result: self._memoize(endpoint, result))
+
+    def _memoize(self, endpoint, response):
+        self.memo.set(endpoint, response)
+        return response
+
+    def _invalidate(self, endpoint):
+        if self.memo is not None:
+            self.memo.invalidate(endpoint)
+
+    def _fetch(self, endpoint, params=None):
+        if self.cache is None:
+            return self._make_request('get', 200, endpoint, params=params)
+        key = '{0}/{1}?{2}'.format(self.slug, endpoint, urlencode(sorted((params or {}).items())))
+        entry = self.cache.get(key)
+        headers = entry.conditional_headers() if entry else {}
+        response = self._make_request('get', 200, endpoint, params=params, headers=headers)
+        return self._then(response, lambda result: self._cache_response(key, entry, result))
+
+    def _cache_response(self, key, entry, response):
+        if response.get('not_modified') and entry is not None:
+            response = {'json': entry.json, 'cache_entry': entry, 'not_modified': True}
+            if entry.page_count:
+                response['page_count'] = entry.page_count
+        elif 'etag' in response or 'last-modified' in response:
+            # caller gets decoded data, entry keeps own copy
+            entry = CacheEntry(response.get('etag'), response.get('last-modified'),
+                               copy_values(response['json']), response.get('page_count'))
+            self.cache.set(key, entry)
+            response['cache_entry'] = entry
+        return response
+
+    def _get_stream(self, endpoint, params=None):
+        """GET of list endpoint without reading whole body. Items of returned
+        JSON array are decoded one by one when response['items'] is iterated.
+        """
+        return self._make_request('get', 200, endpoint, params=params, stream=True)
 
     def _post(self, endpoint, data, params=None):
         return self._make_request('post', 201, endpoint, headers={'Content-Type': 'application/json'}, data=json.dumps(data), params=params)
@@ -183,38 +422,79 @@ class ModelApi(object):
             raise ValueError("object wit unassigned id")
         return value.id
 
-    def unpack(self, response):
+    def unpack(self, response, lazy=False, compact=False):
+        entry = response.get('cache_entry')
         raw = response['json']
+        if entry is not None:
+            if isinstance(raw, dict):
+                # cached resource, reuse converted values but create own models,
+                # models of list pages are not kept at all
+                if entry.decoded is None:
+                    entry.decoded = self.model_type.decode_fields(raw)
+                raw = copy_values(entry.decoded)
+            elif response.get('not_modified'):
+                raw = copy_values(raw)  # data of cache entry
+        return self.create_models(raw, lazy, compact)
+
+    def create_models(self, raw, lazy=False, compact=False):
+        if self.session.instruments:
+            start = time.perf_counter()
+            result = self._create_models(raw, lazy, compact)
+            model_type = compact_type(self.model_type) if compact else self.model_type
+            count = len(result) if isinstance(result, list) else 1
+            self.session._notify('models_created', self.endpoint, model_type, count, time.perf_counter() - start)
+            return result
+        return self._create_models(raw, lazy, compact)
+
+    def _create_models(self, raw, lazy=False, compact=False):
+        model_type = compact_type(self.model_type) if compact else self.model_type
+        construct = model_type.lazy if lazy else lambda fields: model_type(**fields)
+
+        def create(fields):
+            obj = construct(fields)
+            obj.mark_clean()
+            return obj
+
         if isinstance(raw, list):
             objects = []
             for fields in raw:
-                objects.append(self.model_type(**fields))
+                objects.append(create(fields))
             return objects
         else:
-            return self.model_type(**raw)
+            return create(raw)
 
 
 class CrudModelApi(ModelApi):
     def load(self, id):
         if not isinstance(id, int):
             raise TypeError('id must be int')
-        response = self.session._get('{0}/{1}'.format(self.endpoint, id))
-        return self.unpack(response)
+        response = self.session._load('{0}/{1}'.format(self.endpoint, id))
+        return self.session._then(response, self.unpack)
 
-    def find(self, params={}, endpoint=None):
+    def find(self, params={}, endpoint=None, lazy=False, compact=False):
         response = self.session._get(endpoint or self.endpoint, params=params)
-        return self.unpack(response)
+        return self.session._then(response, lambda result: self.unpack(result, lazy=lazy, compact=compact))
 
     def save(self, model):
         if model.id:
-            result = self.session._put('{0}/{1}'.format(self.endpoint, model.id), model.get_fields())
+            # only fields changed since model was loaded
+            fields = model.get_changed_fields()
+            if not fields:
+                return self.session._then(None, lambda result: None)  # nothing to save
+            response = self.session._put('{0}/{1}'.format(self.endpoint, model.id), fields)
         else:
-            result = self.session._post(self.endpoint, model.get_fields())
-        model.update(result['json'])
+            response = self.session._post(self.endpoint, model.get_fields())
+        return self.session._then(response, lambda result: self.saved(model, result['json']))
+
+    def saved(self, model, fields):
+        model.update(fields)
+        model.mark_clean()
+        self.session._invalidate('{0}/{1}'.format(self.endpoint, model.id))
 
     def delete(self, model):
         id = self.extract_id(model)
-        self.session._delete('{0}/{1}'.format(self.endpoint, id))
+        response = self.session._delete('{0}/{1}'.format(self.endpoint, id))
+        return self.session._then(response, lambda result: self.session._invalidate('{0}/{1}'.format(self.endpoint, id)))
 
 
 class AccountApi(ModelApi):
@@ -223,14 +503,14 @@ class AccountApi(ModelApi):
 
     def load(self):
         response = self.session._get(self.endpoint)
-        return self.unpack(response)
+        return self.session._then(response, self.unpack)
 
 
 class SubjectsApi(CrudModelApi):
     model_type = Subject
     endpoint = 'subjects'
 
-    def find(self, since=None, updated_since=None, custom_id=None):
+    def find(self, since=None, updated_since=None, custom_id=None, compact=False):
         params = {}
         if since:
             if not isinstance(since, (datetime, date)):
@@ -242,16 +522,35 @@ class SubjectsApi(CrudModelApi):
             params['updated_since'] = updated_since.isoformat()
         if custom_id:
             params['custom_id'] = custom_id
-        return super(SubjectsApi, self).find(params)
+        return super(SubjectsApi, self).find(params, compact=compact)
 
-    def search(self, query):
+    def search(self, query, local=False, max_age=60):
         """Full text search as described in
         https://fakturoid.docs.apiary.io/#reference/subjects/subjects-collection-fulltext-search/fulltextove-vyhledavani-v-kontaktech
+
+        If local is set, query is answered from local index (see fakturoid.search)
+        refreshed when older than max_age seconds.
         """
         if not isinstance(query, str):
             raise TypeError("'query' parameter must be str")
+        if local:
+            return self.session._then(self.session.subject_index(max_age), lambda index: index.search(query))
         response = self.session._get('subjects/search'.format(self.endpoint), {'query': query})
-        return self.unpack(response)
+        return self.session._then(response, self.unpack)
+
+    def saved(self, model, fields):
+        super(SubjectsApi, self).saved(model, fields)
+        if self.session.search_index is not None:
+            self.session.search_index.add([model])
+
+    def delete(self, model):
+        id = self.extract_id(model)
+        response = super(SubjectsApi, self).delete(model)
+        return self.session._then(response, lambda result: self.deleted(id))
+
+    def deleted(self, id):
+        if self.session.search_index is not None:
+            self.session.search_index.remove(id)
 
 
 class InvoicesApi(CrudModelApi):
@@ -286,9 +585,10 @@ class InvoicesApi(CrudModelApi):
                 raise TypeError("'paid_at' argument must be date")
             params['paid_at'] = params['paid_at'].isoformat()
 
-        self.session._post('invoices/{0}/fire'.format(invoice_id), {}, params=params)
+        response = self.session._post('invoices/{0}/fire'.format(invoice_id), {}, params=params)
+        return self.session._then(response, lambda result: self.session._invalidate('invoices/{0}'.format(invoice_id)))
 
-    def find(self, proforma=None, subject_id=None, since=None, updated_since=None, number=None, status=None, custom_id=None):
+    def find(self, proforma=None, subject_id=None, since=None, updated_since=None, number=None, status=None, custom_id=None, prefetch=None, cache_pages=None, lazy=False, compact=False):
         params = {}
         if subject_id:
             if not isinstance(subject_id, int):
@@ -318,7 +618,7 @@ class InvoicesApi(CrudModelApi):
         else:
             endpoint = '{0}/regular'.format(self.endpoint)
 
-        return ModelList(self, endpoint, params)
+        return self.session.list_type(self, endpoint, params, prefetch=prefetch, cache_pages=cache_pages, lazy=lazy, compact=compact)
 
 
 class ExpensesApi(CrudModelApi):
@@ -353,9 +653,10 @@ class ExpensesApi(CrudModelApi):
                 raise TypeError("'paid_on' argument must be date")
             params['paid_on'] = params['paid_on'].isoformat()
 
-        self.session._post('expenses/{0}/fire'.format(expense_id), {}, params=params)
+        response = self.session._post('expenses/{0}/fire'.format(expense_id), {}, params=params)
+        return self.session._then(response, lambda result: self.session._invalidate('expenses/{0}'.format(expense_id)))
 
-    def find(self, subject_id=None, since=None, updated_since=None, number=None, status=None, custom_id=None, variable_symbol=None):
+    def find(self, subject_id=None, since=None, updated_since=None, number=None, status=None, custom_id=None, variable_symbol=None, prefetch=None, cache_pages=None, lazy=False, compact=False):
         params = {}
         if subject_id:
             if not isinstance(subject_id, int):
@@ -380,14 +681,14 @@ class ExpensesApi(CrudModelApi):
         if variable_symbol:
             params['variable_symbol'] = variable_symbol
 
-        return ModelList(self, self.endpoint, params)
+        return self.session.list_type(self, self.endpoint, params, prefetch=prefetch, cache_pages=cache_pages, lazy=lazy, compact=compact)
 
 
 class GeneratorsApi(CrudModelApi):
     model_type = Generator
     endpoint = 'generators'
 
-    def find(self, recurring=None, subject_id=None, since=None):
+    def find(self, recurring=None, subject_id=None, since=None, updated_since=None, lazy=False, compact=False):
         params = {}
         if subject_id:
             if not isinstance(subject_id, int):
@@ -397,6 +698,10 @@ class GeneratorsApi(CrudModelApi):
             if not isinstance(since, (datetime, date)):
                 raise TypeError("'since' parameter must be date or datetime")
             params['since'] = since.isoformat()
+        if updated_since:
+            if not isinstance(updated_since, (datetime, date)):
+                raise TypeError("'updated_since' parameter must be date or datetime")
+            params['updated_since'] = updated_since.isoformat()
 
         if recurring is None:
             endpoint = self.endpoint
@@ -405,7 +710,7 @@ class GeneratorsApi(CrudModelApi):
         else:
             endpoint = '{0}/template'.format(self.endpoint)
 
-        return super(GeneratorsApi, self).find(params, endpoint)
+        return super(GeneratorsApi, self).find(params, endpoint, lazy=lazy, compact=compact)
 
 
 class MessagesApi(ModelApi):
@@ -416,5 +721,5 @@ class MessagesApi(ModelApi):
         invoice_id = kwargs.get('invoice_id')
         if not isinstance(invoice_id, int):
             raise TypeError("invoice_id must be int")
-        result = self.session._post('invoices/{0}/{1}'.format(invoice_id, self.endpoint), model.get_fields())
-        model.update(result['json'])
+        response = self.session._post('invoices/{0}/{1}'.format(invoice_id, self.endpoint), model.get_fields())
+        return self.session._then(response, lambda result: model.update(result['json']))
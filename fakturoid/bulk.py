@@ -0,0 +1,53 @@
+"""Bulk operations running on bounded worker pool.
+
+Every item gets own BulkResult, failure of one item doesn't stop others.
+Requests are sent with bulk priority (see fakturoid.throttle).
+"""
+from collections import namedtuple
+
+from fakturoid.throttle import priority, BULK
+
+__all__ = ['BulkResult', 'run_bulk']
+
+
+class BulkResult(namedtuple('BulkResult', ['item', 'status', 'value', 'error'])):
+    """Result of single item. Status is one of OK, INVALID (request rejected
+    with validation errors, see errors) or FAILED (HTTP or other error).
+    """
+    OK = 'ok'
+    INVALID = 'invalid'
+    FAILED = 'failed'
+
+    __slots__ = ()
+
+    @property
+    def ok(self):
+        return self.status == self.OK
+
+    @property
+    def errors(self):
+        """Validation errors returned by Fakturoid."""
+        if self.status == self.INVALID and self.error.args:
+            return self.error.args[0]
+        return None
+
+
+def call_item(fn, item):
+    from fakturoid.api import ValidationError  # api imports this module
+    try:
+        with priority(BULK):
+            return BulkResult(item, BulkResult.OK, fn(item), None)
+    except ValidationError as e:
+        return BulkResult(item, BulkResult.INVALID, None, e)
+    except Exception as e:
+        return BulkResult(item, BulkResult.FAILED, None, e)
+
+
+def run_bulk(fn, items, workers=4):
+    """Calls fn for every item and returns list of BulkResult in same order."""
+    items = list(items)
+    if workers <= 1 or len(items) <= 1:
+        return [call_item(fn, item) for item in items]
+    from concurrent.futures import ThreadPoolExecutor
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(lambda item: call_item(fn, item), items))
@@ -0,0 +1,128 @@
+"""Response caches for conditional GET requests.
+
+Cache stores validators (ETag, Last-Modified) with response data.
+If server responds with 304 Not Modified, cached data is used. Field values
+of single resources converted before are reused, but every caller gets
+own models.
+"""
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+
+__all__ = ['CacheEntry', 'MemoryCache', 'FileCache']
+
+
+def copy_values(value):
+    """Copies lists and dicts of decoded values, other values are immutable."""
+    if type(value) is dict:
+        return dict((k, copy_values(v)) for k, v in value.items())
+    if type(value) is list:
+        return [copy_values(v) for v in value]
+    return value
+
+
+class CacheEntry(object):
+
+    def __init__(self, etag=None, last_modified=None, json=None, page_count=None):
+        self.etag = etag
+        self.last_modified = last_modified
+        self.json = json
+        self.page_count = page_count
+        self.decoded = None  # converted field values of single resource, kept in memory only
+
+    def conditional_headers(self):
+        headers = {}
+        if self.etag:
+            headers['If-None-Match'] = self.etag
+        if self.last_modified:
+            headers['If-Modified-Since'] = self.last_modified
+        return headers
+
+
+class MemoryCache(object):
+    """Thread safe in-memory LRU cache."""
+
+    def __init__(self, maxsize=256):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def set(self, key, entry):
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class FileCache(MemoryCache):
+    """Cache persisted in directory, one JSON file per key. Recently used
+    entries are kept also in memory.
+    """
+
+    def __init__(self, directory, maxsize=256):
+        super(FileCache, self).__init__(maxsize)
+        self.directory = directory
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+
+    def _path(self, key):
+        return os.path.join(self.directory, hashlib.sha1(key.encode('utf-8')).hexdigest() + '.json')
+
+    def get(self, key):
+        entry = super(FileCache, self).get(key)
+        if entry is not None:
+            return entry
+        try:
+            with open(self._path(key)) as f:
+                data = json.load(f)
+        except (IOError, OSError, ValueError):
+            return None
+        entry = CacheEntry(data.get('etag'), data.get('last_modified'), data.get('json'), data.get('page_count'))
+        super(FileCache, self).set(key, entry)
+        return entry
+
+    def set(self, key, entry):
+        super(FileCache, self).set(key, entry)
+        data = {
+            'key': key,
+            'etag': entry.etag,
+            'last_modified': entry.last_modified,
+            'json': entry.json,
+            'page_count': entry.page_count,
+        }
+        fd, tmp = tempfile.mkstemp(dir=self.directory)
+        with os.fdopen(fd, 'w') as f:
+            json.dump(data, f)
+        os.replace(tmp, self._path(key))
+
+    def delete(self, key):
+        super(FileCache, self).delete(key)
+        try:
+            os.remove(self._path(key))
+        except OSError:
+            pass
+
+    def clear(self):
+        super(FileCache, self).clear()
+        for name in os.listdir(self.directory):
+            if name.endswith('.json'):
+                os.remove(os.path.join(self.directory, name))
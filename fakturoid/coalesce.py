@@ -0,0 +1,117 @@
+"""Deduplication of identical GET requests.
+
+Concurrent identical GET requests (same endpoint and params) share one
+in-flight request (single-flight). Responses of ``load()`` calls can also be
+memoized for short time, memo is invalidated when model is saved, deleted
+or event is fired on it.
+
+Every caller gets its own copy of response data, so decoded models are
+never shared between callers.
+"""
+import copy
+import threading
+import time
+from collections import OrderedDict
+
+__all__ = ['SingleFlight', 'Memo']
+
+
+def flight_key(endpoint, params=None):
+    return endpoint, tuple(sorted((params or {}).items()))
+
+
+def copy_response(response):
+    """Returns copy of response with own json data. Cache entry is left
+    out, so that values decoded from it before are not reused.
+    """
+    result = dict((key, value) for key, value in response.items() if key != 'cache_entry')
+    result['json'] = copy.deepcopy(response['json'])
+    return result
+
+
+class _Call(object):
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.followers = 0
+        self.result = None  # copy of result for followers, caller of leader owns original
+        self.error = None
+
+
+class SingleFlight(object):
+    """Thread safe single-flight. First caller of key runs function,
+    callers arriving before it finishes wait and get copy of its result.
+    Copy is taken before result is returned to first caller, so changes
+    made by it are never seen by others.
+    """
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, fn):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+            else:
+                call.followers += 1
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return copy_response(call.result)
+        try:
+            result = fn()
+            with self._lock:
+                del self._calls[key]  # no more followers can join
+                followers = call.followers
+            if followers:
+                call.result = copy_response(result)
+            return result
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.done.set()
+
+
+class Memo(object):
+    """Thread safe memo of responses valid for ttl seconds."""
+
+    def __init__(self, ttl, maxsize=1024):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._clock = time.monotonic
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires, response = entry
+            if expires <= self._clock():
+                del self._entries[key]
+                return None
+        return copy_response(response)
+
+    def set(self, key, response):
+        response = copy_response(response)
+        with self._lock:
+            self._entries[key] = (self._clock() + self.ttl, response)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
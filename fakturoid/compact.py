@@ -0,0 +1,160 @@
+"""Memory efficient variants of models for bulk listings.
+
+Known Fakturoid fields and private state of model are stored in slots,
+unknown fields fall back to instance dict, which is created only when
+such field is set. Compact models are subclasses of regular models, so
+they can be used anywhere regular models are expected.
+"""
+
+from fakturoid.models import Subject, InvoiceLine, Invoice, Expense, Generator
+
+__all__ = ['CompactSubject', 'CompactInvoiceLine', 'CompactInvoice',
+           'CompactExpense', 'CompactGenerator', 'compact_type']
+
+_missing = object()
+
+# private state of Model kept in slots too
+STATE_SLOTS = ('_pending', '_changed', '_snapshot', '_extra')
+
+SUBJECT_FIELDS = (
+    'id', 'custom_id', 'user_id', 'type', 'name', 'street', 'street2', 'city',
+    'zip', 'country', 'registration_no', 'vat_no', 'local_vat_no',
+    'bank_account', 'iban', 'variable_symbol', 'full_name', 'email',
+    'email_copy', 'phone', 'web', 'enabled_reminders', 'private_note',
+    'avatar_url', 'html_url', 'url', 'created_at', 'updated_at',
+)
+
+INVOICE_LINE_FIELDS = (
+    'id', 'name', 'quantity', 'unit_name', 'unit_price', 'vat_rate',
+    'unit_price_without_vat', 'unit_price_with_vat',
+)
+
+INVOICE_FIELDS = (
+    'id', 'custom_id', 'proforma', 'partial_proforma', 'number',
+    'number_format_id', 'variable_symbol',
+    'your_name', 'your_street', 'your_street2', 'your_city', 'your_zip',
+    'your_country', 'your_registration_no', 'your_vat_no', 'your_local_vat_no',
+    'client_name', 'client_street', 'client_street2', 'client_city',
+    'client_zip', 'client_country', 'client_registration_no', 'client_vat_no',
+    'client_local_vat_no', 'subject_id', 'subject_custom_id', 'generator_id',
+    'related_id', 'correction', 'correction_id', 'token', 'status',
+    'order_number', 'issued_on', 'taxable_fulfillment_due', 'due', 'due_on',
+    'sent_at', 'paid_at', 'reminder_sent_at', 'accepted_at', 'cancelled_at',
+    'webinvoice_seen_on', 'note', 'footer_note', 'private_note', 'tags',
+    'bank_account', 'iban', 'swift_bic', 'payment_method', 'currency',
+    'exchange_rate', 'paypal', 'gopay', 'language',
+    'transferred_tax_liability', 'supply_code', 'eu_electronic_service',
+    'vat_price_mode', 'round_total', 'subtotal', 'total', 'native_subtotal',
+    'native_total', 'remaining_amount', 'remaining_native_amount',
+    'paid_amount', 'attachment', 'html_url', 'public_html_url', 'url',
+    'pdf_url', 'subject_url', 'created_at', 'updated_at',
+    'lines', '_loaded_lines',
+)
+
+EXPENSE_FIELDS = (
+    'id', 'custom_id', 'number', 'original_number', 'variable_symbol',
+    'supplier_name', 'supplier_street', 'supplier_city', 'supplier_zip',
+    'supplier_country', 'supplier_registration_no', 'supplier_vat_no',
+    'subject_id', 'status', 'issued_on', 'taxable_fulfillment_due',
+    'received_on', 'due_on', 'paid_on', 'description', 'private_note', 'tags',
+    'bank_account', 'iban', 'swift_bic', 'payment_method', 'currency',
+    'exchange_rate', 'transferred_tax_liability', 'vat_price_mode',
+    'supply_code', 'proportional_vat_deduction', 'tax_deductible', 'subtotal',
+    'total', 'native_subtotal', 'native_total', 'attachment', 'html_url',
+    'url', 'subject_url', 'created_at', 'updated_at',
+    'lines', '_loaded_lines',
+)
+
+GENERATOR_FIELDS = (
+    'id', 'custom_id', 'name', 'subject_id', 'recurring', 'proforma',
+    'paypal', 'gopay', 'start_date', 'end_date', 'months_period',
+    'next_occurrence_on', 'due', 'note', 'footer_note', 'bank_account',
+    'iban', 'swift_bic', 'payment_method', 'currency', 'exchange_rate',
+    'language', 'vat_price_mode', 'tags', 'order_number', 'send_email',
+    'subtotal', 'total', 'native_subtotal', 'native_total', 'html_url',
+    'url', 'subject_url', 'created_at', 'updated_at',
+    'lines', '_loaded_lines',
+)
+
+
+class CompactMixin(object):
+    __slots__ = ()
+
+    def __new__(cls, *args, **kwargs):
+        obj = object.__new__(cls)
+        # unset slot would fall to __getattr__, which needs _pending
+        for name in STATE_SLOTS:
+            object.__setattr__(obj, name, None)
+        return obj
+
+    def __setattr__(self, name, value):
+        if name not in self._slot_names:
+            object.__setattr__(self, '_extra', True)
+        super(CompactMixin, self).__setattr__(name, value)
+
+    def __getattr__(self, name):
+        try:
+            return super(CompactMixin, self).__getattr__(name)
+        except AttributeError:
+            # unset slot behaves same as missing instance attribute
+            # of regular model, including class level defaults
+            default = getattr(self._base_type, name, _missing)
+            if default is _missing:
+                raise
+            return default
+
+    def set_fields(self, values):
+        slot_names = self._slot_names
+        for field, value in values.items():
+            if field not in slot_names:
+                object.__setattr__(self, '_extra', True)
+            object.__setattr__(self, field, value)
+
+    def field_items(self):
+        for name, slot in self._slots:
+            try:
+                yield name, slot.__get__(self, None)
+            except AttributeError:
+                pass
+        if self._extra:
+            # instance dict is created on access, so it's touched only if used
+            for item in self.__dict__.items():
+                yield item
+
+
+def _compact(model_type, fields):
+    cls = type('Compact{0}'.format(model_type.__name__), (CompactMixin, model_type), {
+        '__slots__': fields + STATE_SLOTS,
+        '__doc__': 'Compact variant of {0}.'.format(model_type.__name__),
+        '__module__': __name__,
+        '_base_type': model_type,
+    })
+    cls._slots = [(name, cls.__dict__[name]) for name in fields]
+    cls._slot_names = frozenset(fields + STATE_SLOTS)
+    return cls
+
+
+CompactSubject = _compact(Subject, SUBJECT_FIELDS)
+CompactInvoiceLine = _compact(InvoiceLine, INVOICE_LINE_FIELDS)
+CompactInvoice = _compact(Invoice, INVOICE_FIELDS)
+CompactInvoice.line_type = CompactInvoiceLine
+CompactExpense = _compact(Expense, EXPENSE_FIELDS)
+CompactExpense.line_type = CompactInvoiceLine
+CompactGenerator = _compact(Generator, GENERATOR_FIELDS)
+CompactGenerator.line_type = CompactInvoiceLine
+
+COMPACT_TYPES = {
+    Subject: CompactSubject,
+    InvoiceLine: CompactInvoiceLine,
+    Invoice: CompactInvoice,
+    Expense: CompactExpense,
+    Generator: CompactGenerator,
+}
+
+
+def compact_type(model_type):
+    """Returns compact variant of given model type."""
+    try:
+        return COMPACT_TYPES[model_type]
+    except KeyError:
+        raise TypeError('{0} has no compact variant'.format(model_type.__name__))
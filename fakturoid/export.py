@@ -0,0 +1,217 @@
+"""Columnar export of model lists. Pages are converted directly from API
+data without creating model objects. Invoice lines are flattened to
+separate table with reference to parent record.
+
+Arrow and Parquet export requires pyarrow (pip install fakturoid[export]).
+"""
+import csv
+import json
+from decimal import Decimal
+
+from fakturoid.models import InvoiceLine, parse_date, parse_datetime
+
+__all__ = ['iter_rows', 'to_table', 'to_parquet', 'to_csv']
+
+DECIMAL_PRECISION = 20
+DECIMAL_SCALE = 6
+
+
+def convert_record(model_type, fields):
+    row = {}
+    for field, value in fields.items():
+        if field == 'lines':
+            continue
+        if isinstance(value, (dict, list)):
+            value = json.dumps(value)
+        elif isinstance(value, str):
+            converter = model_type.field_converter(field)
+            if converter is not None:
+                value = converter(value) if value else None
+        row[field] = value
+    return row
+
+
+def parent_key(model_type):
+    return '{0}_id'.format(model_type.__name__.lower())
+
+
+def iter_rows(model_list):
+    """Yields tuple (rows, line_rows) of converted values for each page."""
+    model_type = model_list.model_api.model_type
+    key = parent_key(model_type)
+    for page in model_list.iter_raw_pages():
+        rows = []
+        line_rows = []
+        for fields in page:
+            rows.append(convert_record(model_type, fields))
+            for line in fields.get('lines') or []:
+                line_row = convert_record(InvoiceLine, line)
+                line_row[key] = fields.get('id')
+                line_rows.append(line_row)
+        yield rows, line_rows
+
+
+def column_names(rows):
+    names = []
+    seen = set()
+    for row in rows:
+        for name in row:
+            if name not in seen:
+                seen.add(name)
+                names.append(name)
+    return names
+
+
+def _import_pyarrow():
+    try:
+        import pyarrow
+    except ImportError:
+        raise ImportError('pyarrow is required for arrow and parquet export, install fakturoid[export]')
+    return pyarrow
+
+
+def _arrow_type(pa, converter):
+    if converter is parse_datetime:
+        return pa.timestamp('us', tz='UTC')
+    if converter is parse_date:
+        return pa.date32()
+    if converter is Decimal:
+        return pa.decimal128(DECIMAL_PRECISION, DECIMAL_SCALE)
+    return None
+
+
+_decimal_exponent = Decimal(1).scaleb(-DECIMAL_SCALE)
+
+
+def _arrow_table(pa, model_type, rows):
+    columns = {}
+    for name in column_names(rows):
+        values = [row.get(name) for row in rows]
+        converter = model_type.field_converter(name)
+        if converter is Decimal:
+            # column has fixed scale, more decimal places are rounded
+            values = [value.quantize(_decimal_exponent) if isinstance(value, Decimal) else value
+                      for value in values]
+        columns[name] = pa.array(values, type=_arrow_type(pa, converter))
+    return pa.table(columns)
+
+
+def _concat(pa, tables):
+    if not tables:
+        return pa.table({})
+    try:
+        return pa.concat_tables(tables, promote_options='permissive')
+    except TypeError:  # pyarrow < 14
+        return pa.concat_tables(tables, promote=True)
+
+
+def to_table(model_list):
+    """Returns tuple (records, lines) of pyarrow tables."""
+    pa = _import_pyarrow()
+    model_type = model_list.model_api.model_type
+    records = []
+    lines = []
+    for rows, line_rows in iter_rows(model_list):
+        if rows:
+            records.append(_arrow_table(pa, model_type, rows))
+        if line_rows:
+            lines.append(_arrow_table(pa, InvoiceLine, line_rows))
+    return _concat(pa, records), _concat(pa, lines)
+
+
+class _ParquetSink(object):
+    """Writes tables to parquet file as row groups. Schema is taken from
+    first table, columns without any value are stored as strings.
+    """
+
+    def __init__(self, pa, pq, path):
+        self.pa = pa
+        self.pq = pq
+        self.path = path
+        self.schema = None
+        self.writer = None
+
+    def write(self, table):
+        pa = self.pa
+        if self.writer is None:
+            self.schema = pa.schema([pa.field(f.name, pa.string()) if pa.types.is_null(f.type) else f
+                                     for f in table.schema])
+            self.writer = self.pq.ParquetWriter(self.path, self.schema)
+        self.writer.write_table(self.conform(table))
+
+    def conform(self, table):
+        """Casts table to file schema, missing columns are filled with nulls
+        and columns unknown to schema are dropped.
+        """
+        columns = []
+        for field in self.schema:
+            if field.name in table.column_names:
+                column = table.column(field.name)
+                if column.type != field.type:
+                    column = column.cast(field.type)
+            else:
+                column = self.pa.nulls(table.num_rows, field.type)
+            columns.append(column)
+        return self.pa.Table.from_arrays(columns, schema=self.schema)
+
+    def close(self):
+        if self.writer is None:
+            self.pq.write_table(self.pa.table({}), self.path)
+        else:
+            self.writer.close()
+
+
+def to_parquet(model_list, path, lines_path=None):
+    """Writes records and optionally lines to parquet files page by page.
+    Columns are taken from first page, fields appearing on later pages
+    only are skipped.
+    """
+    pa = _import_pyarrow()
+    import pyarrow.parquet as pq
+    model_type = model_list.model_api.model_type
+    records = _ParquetSink(pa, pq, path)
+    lines = _ParquetSink(pa, pq, lines_path) if lines_path else None
+    try:
+        for rows, line_rows in iter_rows(model_list):
+            if rows:
+                records.write(_arrow_table(pa, model_type, rows))
+            if lines is not None and line_rows:
+                lines.write(_arrow_table(pa, InvoiceLine, line_rows))
+    finally:
+        records.close()
+        if lines is not None:
+            lines.close()
+
+
+def _csv_value(value):
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    return value
+
+
+def to_csv(model_list, path, lines_path=None):
+    """Writes records and optionally lines to CSV files. Columns are taken
+    from first page, fields appearing on later pages only are skipped.
+    """
+    records_file = open(path, 'w', newline='')
+    lines_file = open(lines_path, 'w', newline='') if lines_path else None
+    writer = None
+    lines_writer = None
+    try:
+        for rows, line_rows in iter_rows(model_list):
+            if writer is None and rows:
+                writer = csv.DictWriter(records_file, column_names(rows), extrasaction='ignore')
+                writer.writeheader()
+            for row in rows:
+                writer.writerow(dict((k, _csv_value(v)) for k, v in row.items()))
+            if lines_file is None:
+                continue
+            if lines_writer is None and line_rows:
+                lines_writer = csv.DictWriter(lines_file, column_names(line_rows), extrasaction='ignore')
+                lines_writer.writeheader()
+            for row in line_rows:
+                lines_writer.writerow(dict((k, _csv_value(v)) for k, v in row.items()))
+    finally:
+        records_file.close()
+        if lines_file is not None:
+            lines_file.close()
@@ -0,0 +1,83 @@
+"""Hash indexes of models by field value.
+
+    invoices = fa.invoices(status='open')
+    by_vs = invoices.index('variable_symbol')
+    for payment in payments:
+        for invoice in by_vs.get(payment.vs):
+            ...
+
+Index can be also built from any iterable of models, e.g. mirror results
+``Index('number', mirror.invoices())``. Models are deduplicated by id, model
+added again (e.g. page reloaded after eviction) replaces older one.
+Values can be normalized by key function, which is applied to indexed
+values and to looked up keys, e.g. ``Index('email', subjects, key=str.lower)``.
+"""
+import threading
+
+__all__ = ['Index']
+
+
+class Index(object):
+    """Maps field value to list of models with that value. Models with
+    None value are not indexed. Thread safe, pages loaded by prefetch
+    threads are added concurrently.
+    """
+
+    def __init__(self, field, models=(), key=None):
+        self.field = field
+        self.key = key
+        self.complete = False  # set by ModelList when all pages were indexed
+        self._buckets = {}
+        self._keys = {}  # model id -> indexed value
+        self._lock = threading.Lock()
+        self.add(models)
+
+    def normalize(self, key):
+        if key is not None and self.key is not None:
+            key = self.key(key)
+        return key
+
+    def add(self, models):
+        field = self.field
+        with self._lock:
+            for model in models:
+                key = self.normalize(getattr(model, field, None))
+                model_id = model.id if model.id is not None else id(model)
+                old_key = self._keys.pop(model_id, None)
+                if old_key is not None:
+                    bucket = self._buckets[old_key]
+                    del bucket[model_id]
+                    if not bucket:
+                        del self._buckets[old_key]
+                if key is not None:
+                    self._buckets.setdefault(key, {})[model_id] = model
+                    self._keys[model_id] = key
+
+    def __getitem__(self, key):
+        return list(self._buckets[self.normalize(key)].values())
+
+    def get(self, key, default=()):
+        """Returns list of models with given value or default."""
+        bucket = self._buckets.get(self.normalize(key))
+        if bucket is None:
+            return default
+        return list(bucket.values())
+
+    def first(self, key, default=None):
+        """Returns any model with given value, useful for unique fields like number."""
+        bucket = self._buckets.get(self.normalize(key))
+        if not bucket:
+            return default
+        return next(iter(bucket.values()))
+
+    def __contains__(self, key):
+        return self.normalize(key) in self._buckets
+
+    def __len__(self):
+        return len(self._buckets)
+
+    def keys(self):
+        return self._buckets.keys()
+
+    def __repr__(self):
+        return '<Index of {0} with {1} values>'.format(self.field, len(self._buckets))
@@ -0,0 +1,290 @@
+"""Instrumentation of session requests.
+
+Instruments given to session are notified about every HTTP request attempt,
+JSON decoding of responses and construction of models. Subclass Instrument
+and override its methods or pass plain functions to Callbacks.
+MetricsCollector aggregates metrics per endpoint and exports them
+to log or in Prometheus text format.
+
+    from fakturoid.instrumentation import MetricsCollector, Callbacks
+
+    metrics = MetricsCollector()
+    fa = Fakturoid('yourslug', 'your@email.com', 'apikey038dc73...', instruments=[metrics])
+    fa.add_instrument(Callbacks(after_request=lambda request, response: print(request)))
+
+    fa.invoices(prefetch=4).to_csv('invoices.csv')
+    metrics.log(logging.getLogger('fakturoid'))
+    print(metrics.to_prometheus())
+
+Instruments are called from threads sending requests (prefetch threads,
+bulk helpers), so they have to be thread safe. Exceptions raised by
+instrument are propagated to caller.
+"""
+import logging
+import re
+import threading
+from bisect import bisect_left
+
+__all__ = ['Instrument', 'Callbacks', 'LoggingInstrument', 'MetricsCollector', 'Histogram', 'RequestInfo']
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_id_pattern = re.compile(r'(?<=/)\d+(?=/|$)')
+
+
+def endpoint_name(endpoint):
+    """Endpoint with ids replaced by placeholder, e.g. invoices/:id/fire."""
+    return _id_pattern.sub(':id', endpoint)
+
+
+class RequestInfo(object):
+    """Single attempt of HTTP request. status_code, elapsed (seconds) and
+    bytes (size of response body, None if unknown) are set after response
+    is received.
+    """
+    __slots__ = ('method', 'endpoint', 'name', 'url', 'params', 'attempt', 'status_code', 'elapsed', 'bytes')
+
+    def __init__(self, method, endpoint, url, params=None, attempt=0):
+        self.method = method.upper()
+        self.endpoint = endpoint
+        self.name = endpoint_name(endpoint)
+        self.url = url
+        self.params = params
+        self.attempt = attempt
+        self.status_code = None
+        self.elapsed = None
+        self.bytes = None
+
+    def __repr__(self):
+        return '<RequestInfo {0} {1} {2}>'.format(self.method, self.endpoint, self.status_code)
+
+
+class Instrument(object):
+    """Base of instruments, all methods do nothing by default."""
+
+    def before_request(self, request):
+        """Called before every attempt (repeated requests have attempt > 0)."""
+
+    def after_request(self, request, response):
+        """Called with transport response of every attempt."""
+
+    def json_decoded(self, request, seconds):
+        """Called when response body is decoded."""
+
+    def models_created(self, endpoint, model_type, count, seconds):
+        """Called when models are constructed from decoded data."""
+
+
+class Callbacks(Instrument):
+    """Instrument calling given functions before and after request."""
+
+    def __init__(self, before_request=None, after_request=None):
+        self._before = before_request
+        self._after = after_request
+
+    def before_request(self, request):
+        if self._before is not None:
+            self._before(request)
+
+    def after_request(self, request, response):
+        if self._after is not None:
+            self._after(request, response)
+
+
+class LoggingInstrument(Instrument):
+    """Logs every request attempt."""
+
+    def __init__(self, logger=None, level=logging.DEBUG):
+        self.logger = logger or logging.getLogger('fakturoid')
+        self.level = level
+
+    def after_request(self, request, response):
+        self.logger.log(self.level, '%s %s %s %.3fs %s bytes (attempt %d)', request.method, request.endpoint,
+                        request.status_code, request.elapsed, request.bytes, request.attempt + 1)
+
+
+class Histogram(object):
+    """Histogram of observed values with fixed bucket upper bounds."""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # last one is +Inf
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        if value > self.max:
+            self.max = value
+
+    def cumulative(self):
+        """Returns list of (upper bound, count of values <= bound) pairs."""
+        result = []
+        total = 0
+        for bound, count in zip(self.buckets + (float('inf'),), self.counts):
+            total += count
+            result.append((bound, total))
+        return result
+
+    def quantile(self, q):
+        """Estimates quantile as upper bound of bucket containing it."""
+        if not self.count:
+            return None
+        rank = q * self.count
+        for bound, total in self.cumulative():
+            if total >= rank:
+                return min(bound, self.max)
+        return self.max
+
+
+class _EndpointStats(object):
+
+    def __init__(self, buckets):
+        self.latency = Histogram(buckets)
+        self.statuses = {}
+        self.retries = 0
+        self.bytes = 0
+        self.decode_count = 0
+        self.decode_seconds = 0.0
+
+
+class _ModelStats(object):
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+
+
+class MetricsCollector(Instrument):
+    """Thread safe collector of request metrics. Requests are grouped
+    by method and endpoint name (ids are replaced by :id), models by
+    endpoint of model api and model type.
+    """
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self._endpoints = {}
+        self._models = {}
+        self._lock = threading.Lock()
+
+    def _endpoint(self, request):
+        key = (request.method, request.name)
+        stats = self._endpoints.get(key)
+        if stats is None:
+            stats = self._endpoints[key] = _EndpointStats(self.buckets)
+        return stats
+
+    def after_request(self, request, response):
+        with self._lock:
+            stats = self._endpoint(request)
+            stats.latency.observe(request.elapsed)
+            stats.statuses[request.status_code] = stats.statuses.get(request.status_code, 0) + 1
+            if request.attempt:
+                stats.retries += 1
+            if request.bytes:
+                stats.bytes += request.bytes
+
+    def json_decoded(self, request, seconds):
+        with self._lock:
+            stats = self._endpoint(request)
+            stats.decode_count += 1
+            stats.decode_seconds += seconds
+
+    def models_created(self, endpoint, model_type, count, seconds):
+        key = (endpoint, model_type.__name__)
+        with self._lock:
+            stats = self._models.get(key)
+            if stats is None:
+                stats = self._models[key] = _ModelStats()
+            stats.count += count
+            stats.seconds += seconds
+
+    def reset(self):
+        with self._lock:
+            self._endpoints.clear()
+            self._models.clear()
+
+    def snapshot(self):
+        """Returns metrics as plain data, suitable for JSON or for feeding
+        counters of other metric systems (e.g. OpenTelemetry).
+        """
+        with self._lock:
+            requests = []
+            for (method, name), stats in sorted(self._endpoints.items()):
+                requests.append({
+                    'method': method,
+                    'endpoint': name,
+                    'count': stats.latency.count,
+                    'statuses': dict(stats.statuses),
+                    'retries': stats.retries,
+                    'bytes': stats.bytes,
+                    'latency_sum': stats.latency.sum,
+                    'latency_max': stats.latency.max,
+                    'latency_p50': stats.latency.quantile(0.5),
+                    'latency_p95': stats.latency.quantile(0.95),
+                    'latency_buckets': stats.latency.cumulative(),
+                    'decode_count': stats.decode_count,
+                    'decode_seconds': stats.decode_seconds,
+                })
+            models = []
+            for (endpoint, model), stats in sorted(self._models.items()):
+                models.append({'endpoint': endpoint, 'model': model, 'count': stats.count, 'seconds': stats.seconds})
+        return {'requests': requests, 'models': models}
+
+    def log(self, logger=None, level=logging.INFO):
+        """Logs summary line for every endpoint and model type."""
+        logger = logger or logging.getLogger('fakturoid')
+        data = self.snapshot()
+        for r in data['requests']:
+            statuses = ' '.join('{0}:{1}'.format(status, count) for status, count in sorted(r['statuses'].items()))
+            logger.log(level, '%s %s: %d requests (%s), %d retries, p50 %.3fs, p95 %.3fs, max %.3fs, '
+                              '%d bytes, decode %.3fs', r['method'], r['endpoint'], r['count'], statuses,
+                       r['retries'], r['latency_p50'] or 0, r['latency_p95'] or 0, r['latency_max'],
+                       r['bytes'], r['decode_seconds'])
+        for m in data['models']:
+            logger.log(level, '%s %s: %d models constructed in %.3fs', m['endpoint'], m['model'],
+                       m['count'], m['seconds'])
+
+    def to_prometheus(self, prefix='fakturoid'):
+        """Returns metrics in Prometheus text exposition format."""
+        data = self.snapshot()
+        lines = []
+
+        def metric(name, kind, samples):
+            lines.append('# TYPE {0}_{1} {2}'.format(prefix, name, kind))
+            for suffix, labels, value in samples:
+                label_text = ','.join('{0}="{1}"'.format(k, v) for k, v in labels)
+                lines.append('{0}_{1}{2}{{{3}}} {4}'.format(prefix, name, suffix, label_text, _number(value)))
+
+        def labels(r, *extra):
+            return (('method', r['method']), ('endpoint', r['endpoint'])) + extra
+
+        requests = data['requests']
+        samples = []
+        for r in requests:
+            for bound, count in r['latency_buckets']:
+                samples.append(('_bucket', labels(r, ('le', _number(bound))), count))
+            samples.append(('_sum', labels(r), r['latency_sum']))
+            samples.append(('_count', labels(r), r['count']))
+        metric('request_duration_seconds', 'histogram', samples)
+        metric('responses_total', 'counter', [('', labels(r, ('status', status)), count)
+                                              for r in requests for status, count in sorted(r['statuses'].items())])
+        metric('retries_total', 'counter', [('', labels(r), r['retries']) for r in requests])
+        metric('response_bytes_total', 'counter', [('', labels(r), r['bytes']) for r in requests])
+        metric('json_decode_seconds_total', 'counter', [('', labels(r), r['decode_seconds']) for r in requests])
+
+        models = data['models']
+        metric('models_total', 'counter',
+               [('', (('endpoint', m['endpoint']), ('model', m['model'])), m['count']) for m in models])
+        metric('model_construction_seconds_total', 'counter',
+               [('', (('endpoint', m['endpoint']), ('model', m['model'])), m['seconds']) for m in models])
+        return '\n'.join(lines) + '\n'
+
+
+def _number(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(value) if isinstance(value, float) else str(value)
@@ -0,0 +1,84 @@
+"""JSON decoding helpers.
+
+``loads`` uses orjson or ujson if installed, standard json otherwise.
+Backend is imported on first call.
+``iter_array`` decodes JSON array read in chunks and yields its items
+one by one, so that whole response body and all decoded items are never
+held in memory together.
+"""
+import codecs
+import json
+import re
+
+__all__ = ['loads', 'iter_array']
+
+_whitespace = re.compile(r'\s*')
+_decoder = json.JSONDecoder()
+_loads = None
+
+
+def _backend():
+    global _loads
+    try:
+        import orjson
+        _loads = orjson.loads
+    except ImportError:
+        try:
+            import ujson
+            _loads = ujson.loads
+        except ImportError:
+            _loads = json.loads
+    return _loads
+
+
+def loads(data):
+    return (_loads or _backend())(data)
+
+
+def iter_array(chunks):
+    """Yields items of JSON array (objects or arrays) from iterable of
+    UTF-8 encoded chunks. Raises ValueError for invalid or truncated data.
+    """
+    text_decoder = codecs.getincrementaldecoder('utf-8')()
+    buf = ''
+    state = 'start'
+    final = False
+    chunks = iter(chunks)
+    while not final:
+        try:
+            chunk = next(chunks)
+        except StopIteration:
+            chunk, final = b'', True
+        buf += text_decoder.decode(chunk, final=final)
+        pos = 0
+        while True:
+            pos = _whitespace.match(buf, pos).end()
+            if pos >= len(buf):
+                break
+            if state == 'start':
+                if buf[pos] != '[':
+                    raise ValueError('JSON array expected')
+                pos += 1
+                state = 'first'
+            elif state == 'separator':
+                char = buf[pos]
+                pos += 1
+                if char == ',':
+                    state = 'item'
+                elif char == ']':
+                    return
+                else:
+                    raise ValueError('invalid JSON array at character {0!r}'.format(char))
+            else:
+                if state == 'first' and buf[pos] == ']':
+                    return
+                try:
+                    item, pos = _decoder.raw_decode(buf, pos)
+                except ValueError:
+                    if final:
+                        raise
+                    break  # item is not complete yet, wait for next chunk
+                yield item
+                state = 'separator'
+        buf = buf[pos:]
+    raise ValueError('unexpected end of JSON array')
@@ -0,0 +1,181 @@
+"""Matching of bank payments to unpaid invoices.
+
+    matcher = Matcher.load(fa)
+    result = matcher.match(read_payments_csv('statement.csv'))
+    fa.fire_invoice_events(result.pay_events())
+    for match in result.ambiguous:
+        print(match.payment, match.candidates)
+
+Invoices are indexed by variable symbol, remaining amount and subject, so
+whole batch is matched in one pass with constant time lookups per payment.
+Variable symbols are compared without leading zeros (bank statements often
+pad them to 10 digits).
+Payments matched to same invoice within batch are deducted from its
+remaining amount.
+"""
+import csv
+from collections import namedtuple
+from decimal import Decimal
+
+from fakturoid.index import Index
+from fakturoid.models import parse_date
+
+__all__ = ['Payment', 'Match', 'MatchResult', 'Matcher', 'read_payments_csv', 'parse_amount', 'normalize_variable_symbol']
+
+
+def normalize_variable_symbol(value):
+    """Returns variable symbol as string without leading zeros or None if it's empty."""
+    if value is None:
+        return None
+    return str(value).strip().lstrip('0') or None
+
+
+class Payment(namedtuple('Payment', ['variable_symbol', 'amount', 'paid_on', 'subject_id', 'reference'])):
+    """Incoming payment. Amount is Decimal, subject_id and reference are optional."""
+    __slots__ = ()
+
+    def __new__(cls, variable_symbol, amount, paid_on=None, subject_id=None, reference=None):
+        if isinstance(amount, float):
+            amount = str(amount)  # exact value as written, not binary approximation
+        return super(Payment, cls).__new__(cls, normalize_variable_symbol(variable_symbol), Decimal(amount),
+                                           paid_on, subject_id, reference)
+
+
+class Match(namedtuple('Match', ['payment', 'invoice', 'candidates'])):
+    """Payment with matched invoice (None if payment is ambiguous or unmatched)
+    and list of considered invoices.
+    """
+    __slots__ = ()
+
+
+class MatchResult(object):
+    """Matches sorted to exact (paid amount equals remaining amount),
+    partial (less than remaining amount), ambiguous (more candidates or
+    overpayment, needs manual check) and unmatched.
+    """
+
+    def __init__(self):
+        self.exact = []
+        self.partial = []
+        self.ambiguous = []
+        self.unmatched = []
+
+    def pay_events(self):
+        """Returns pay events of exact and partial matches for Fakturoid.fire_invoice_events()."""
+        events = []
+        for match in self.exact + self.partial:
+            args = {'paid_amount': match.payment.amount}
+            if match.payment.paid_on:
+                args['paid_at'] = match.payment.paid_on
+            events.append((match.invoice.id, 'pay', args))
+        return events
+
+    def __repr__(self):
+        return '<MatchResult exact={0} partial={1} ambiguous={2} unmatched={3}>'.format(
+            len(self.exact), len(self.partial), len(self.ambiguous), len(self.unmatched))
+
+
+class Matcher(object):
+    """Matches payments to given unpaid invoices."""
+
+    def __init__(self, invoices):
+        invoices = list(invoices)
+        self.by_variable_symbol = Index('variable_symbol', invoices, key=normalize_variable_symbol)
+        self.by_amount = Index('remaining_amount', invoices)
+        self.by_subject = Index('subject_id', invoices)
+
+    @classmethod
+    def load(cls, session, statuses=('open', 'sent', 'overdue'), prefetch=4):
+        """Creates matcher from all invoices of session with given statuses."""
+        invoices = []
+        for status in statuses:
+            invoices.extend(session.invoices(status=status, prefetch=prefetch, compact=True))
+        return cls(invoices)
+
+    def match(self, payments):
+        """Matches iterable of Payment objects, returns MatchResult."""
+        result = MatchResult()
+        remaining = {}  # invoice id -> remaining amount after payments in this batch
+
+        def remaining_amount(invoice):
+            amount = remaining.get(invoice.id)
+            if amount is None:
+                amount = invoice.remaining_amount if invoice.remaining_amount is not None else invoice.total
+            return amount
+
+        for payment in payments:
+            candidates = self.candidates(payment, remaining_amount)
+            if len(candidates) > 1:
+                # prefer invoices with exactly paid amount
+                exact = [invoice for invoice in candidates if remaining_amount(invoice) == payment.amount]
+                if len(exact) == 1:
+                    candidates = exact
+            if not candidates:
+                # amount alone is not reliable, such matches are left for manual check
+                candidates = list(self.by_amount.get(payment.amount))
+                if candidates:
+                    result.ambiguous.append(Match(payment, None, candidates))
+                else:
+                    result.unmatched.append(Match(payment, None, []))
+                continue
+            if len(candidates) > 1:
+                result.ambiguous.append(Match(payment, None, candidates))
+                continue
+
+            invoice = candidates[0]
+            amount = remaining_amount(invoice)
+            if payment.amount == amount:
+                result.exact.append(Match(payment, invoice, candidates))
+            elif payment.amount < amount:
+                result.partial.append(Match(payment, invoice, candidates))
+            else:
+                result.ambiguous.append(Match(payment, None, candidates))
+                continue
+            remaining[invoice.id] = amount - payment.amount
+        return result
+
+    def candidates(self, payment, remaining_amount=lambda invoice: invoice.remaining_amount):
+        """Returns unpaid invoices payment may belong to. Variable symbol is
+        used first, without it payment has to match subject and remaining amount.
+        """
+        if payment.variable_symbol:
+            candidates = self.by_variable_symbol.get(payment.variable_symbol)
+            if candidates and payment.subject_id is not None and len(candidates) > 1:
+                candidates = [invoice for invoice in candidates if invoice.subject_id == payment.subject_id] or candidates
+            if candidates:
+                return list(candidates)
+        if payment.subject_id is not None:
+            return [invoice for invoice in self.by_subject.get(payment.subject_id)
+                    if remaining_amount(invoice) == payment.amount]
+        return []
+
+
+def parse_amount(text, decimal_separator=None):
+    """Parses amount written with thousands separators, e.g. '1 234,56',
+    '1.234,56' or '1,234.56'. If decimal_separator is not given, the last
+    of comma and dot is taken as decimal separator.
+    """
+    text = text.replace(' ', '').replace('\xa0', '')
+    if decimal_separator is None:
+        decimal_separator = ',' if text.rfind(',') > text.rfind('.') else '.'
+    thousands_separator = '.' if decimal_separator == ',' else ','
+    return Decimal(text.replace(thousands_separator, '').replace(decimal_separator, '.'))
+
+
+def read_payments_csv(path, variable_symbol='variable_symbol', amount='amount', paid_on='paid_on',
+                      subject_id='subject_id', reference='reference', decimal_separator=None, **reader_args):
+    """Yields Payment objects from CSV file with header. Column names
+    can be changed by keyword arguments, other arguments are passed to csv.DictReader.
+    Amounts are parsed by parse_amount() with given decimal_separator.
+    """
+    with open(path) as f:
+        for row in csv.DictReader(f, **reader_args):
+            subject = row.get(subject_id)
+            date = row.get(paid_on)
+            yield Payment(
+                row.get(variable_symbol),
+                parse_amount(row[amount], decimal_separator),
+                parse_date(date) if date else None,
+                int(subject) if subject else None,
+                row.get(reference),
+            )
@@ -0,0 +1,167 @@
+"""Local SQLite mirror of account data.
+
+    mirror = fa.mirror('fakturoid.sqlite')
+    mirror.sync()   # first call downloads everything, next ones only changes
+    mirror.invoices(status='overdue', subject_id=28)
+
+Each collection keeps its high-water mark (latest seen ``updated_at``)
+and synchronization requests only records updated since then. Records
+deleted in Fakturoid are not reported by API, ``sync(full=True)``
+downloads everything again and removes records missing on server.
+"""
+import json
+import threading
+
+from fakturoid.models import Subject, Invoice, Expense, Generator, parse_datetime
+from fakturoid.paging import ModelList
+
+__all__ = ['Mirror']
+
+COLLECTIONS = [
+    ('subjects', Subject),
+    ('invoices', Invoice),
+    ('expenses', Expense),
+    ('generators', Generator),
+]
+
+COLUMNS = ['number', 'custom_id', 'subject_id', 'status', 'variable_symbol', 'updated_at']
+
+
+class Mirror(object):
+
+    def __init__(self, session, path, prefetch=None):
+        self.session = session
+        self.path = path
+        self.prefetch = prefetch
+        self.model_types = dict(COLLECTIONS)
+        self._lock = threading.Lock()
+        import sqlite3
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._create_tables()
+
+    def close(self):
+        self._db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def _create_tables(self):
+        with self._lock, self._db:
+            self._db.execute('CREATE TABLE IF NOT EXISTS sync_state (collection TEXT PRIMARY KEY, updated_since TEXT)')
+            for name, _ in COLLECTIONS:
+                self._db.execute(
+                    'CREATE TABLE IF NOT EXISTS {0} (id INTEGER PRIMARY KEY, {1}, data TEXT NOT NULL)'.format(
+                        name, ', '.join(COLUMNS)))
+                for column in COLUMNS:
+                    self._db.execute('CREATE INDEX IF NOT EXISTS {0}_{1} ON {0} ({1})'.format(name, column))
+
+    def _check_collection(self, collection):
+        if collection not in self.model_types:
+            raise ValueError('invalid collection, expected one of {0}'.format(', '.join(self.model_types)))
+
+    def updated_since(self, collection):
+        """Returns high-water mark of collection as string or None if collection wasn't synchronized yet."""
+        self._check_collection(collection)
+        with self._lock:
+            row = self._db.execute('SELECT updated_since FROM sync_state WHERE collection = ?', (collection,)).fetchone()
+        return row[0] if row else None
+
+    def sync(self, collections=None, full=False):
+        """Downloads records changed since last synchronization. Returns
+        dict with number of updated records per collection.
+        """
+        result = {}
+        for name, _ in COLLECTIONS:
+            if collections is None or name in collections:
+                result[name] = self.sync_collection(name, full)
+        return result
+
+    def sync_collection(self, collection, full=False):
+        self._check_collection(collection)
+        mapi = self.session._models_api[self.model_types[collection]]
+        since = None if full else self.updated_since(collection)
+        params = {'updated_since': since} if since else {}
+
+        high_water = since
+        high_water_dt = parse_datetime(since) if since else None
+        seen = []
+        insert = 'INSERT OR REPLACE INTO {0} VALUES ({1})'.format(collection, ', '.join(['?'] * (len(COLUMNS) + 2)))
+        # every page is written in own transaction, so local queries are not blocked during sync
+        for page in ModelList(mapi, mapi.endpoint, params, prefetch=self.prefetch).iter_raw_pages():
+            rows = []
+            for fields in page:
+                rows.append([fields['id']] + [self._column_value(fields.get(c)) for c in COLUMNS] + [json.dumps(fields)])
+                updated_at = fields.get('updated_at')
+                if updated_at:
+                    updated_at_dt = parse_datetime(updated_at)
+                    if high_water_dt is None or updated_at_dt > high_water_dt:
+                        high_water, high_water_dt = updated_at, updated_at_dt
+            with self._lock, self._db:
+                self._db.executemany(insert, rows)
+            seen.extend(row[0] for row in rows)
+
+        with self._lock, self._db:
+            if full:
+                # remove records deleted in Fakturoid
+                self._db.execute('CREATE TEMP TABLE IF NOT EXISTS seen_ids (id INTEGER PRIMARY KEY)')
+                self._db.execute('DELETE FROM seen_ids')
+                self._db.executemany('INSERT OR IGNORE INTO seen_ids VALUES (?)', ((id,) for id in seen))
+                self._db.execute('DELETE FROM {0} WHERE id NOT IN (SELECT id FROM seen_ids)'.format(collection))
+            if high_water:
+                self._db.execute('INSERT OR REPLACE INTO sync_state VALUES (?, ?)', (collection, high_water))
+        return len(seen)
+
+    def _column_value(self, value):
+        if isinstance(value, (dict, list)):
+            return None
+        return value
+
+    def find(self, collection, **filters):
+        """Returns list of models matching all filters. Filter can be any of
+        number, custom_id, subject_id, status, variable_symbol.
+        """
+        self._check_collection(collection)
+        where = []
+        args = []
+        for column, value in sorted(filters.items()):
+            if column not in COLUMNS or column == 'updated_at':
+                raise TypeError("invalid filter '{0}'".format(column))
+            if value is not None:
+                where.append('{0} = ?'.format(column))
+                args.append(value)
+        sql = 'SELECT data FROM {0}'.format(collection)
+        if where:
+            sql += ' WHERE ' + ' AND '.join(where)
+        sql += ' ORDER BY id DESC'
+        with self._lock:
+            rows = self._db.execute(sql, args).fetchall()
+        return [self._model(collection, row[0]) for row in rows]
+
+    def get(self, collection, id):
+        """Returns model with given id or None."""
+        self._check_collection(collection)
+        with self._lock:
+            row = self._db.execute('SELECT data FROM {0} WHERE id = ?'.format(collection), (id,)).fetchone()
+        return self._model(collection, row[0]) if row else None
+
+    def _model(self, collection, data):
+        model = self.model_types[collection](**json.loads(data))
+        model.mark_clean()
+        return model
+
+    def subjects(self, custom_id=None):
+        return self.find('subjects', custom_id=custom_id)
+
+    def invoices(self, number=None, custom_id=None, subject_id=None, status=None, variable_symbol=None):
+        return self.find('invoices', number=number, custom_id=custom_id, subject_id=subject_id,
+                         status=status, variable_symbol=variable_symbol)
+
+    def expenses(self, number=None, custom_id=None, subject_id=None, status=None, variable_symbol=None):
+        return self.find('expenses', number=number, custom_id=custom_id, subject_id=subject_id,
+                         status=status, variable_symbol=variable_symbol)
+
+    def generators(self, subject_id=None):
+        return self.find('generators', subject_id=subject_id)
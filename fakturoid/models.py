@@ -1,34 +1,248 @@
-from __future__ import unicode_literals
-
+from datetime import date, datetime
 from decimal import Decimal
-from dateutil.parser import parse
-
-from fakturoid import six
 
 __all__ = ['Account', 'Subject', 'InvoiceLine', 'Invoice', 'Generator',
            'Message', 'Expense']
 
 
-class Model(six.UnicodeMixin):
+def parse_datetime(value):
+    """Fakturoid sends ISO 8601, dateutil is used (and imported) only as fallback."""
+    try:
+        return datetime.fromisoformat(value)
+    except (ValueError, AttributeError):
+        from dateutil.parser import parse
+        return parse(value)
+
+
+def parse_date(value):
+    try:
+        return date.fromisoformat(value)
+    except (ValueError, AttributeError):
+        return parse_datetime(value).date()
+
+
+class pending_default(object):
+    """Class level default for field which needs conversion. Lazy model may
+    keep such field pending and default attribute must not shadow it.
+    """
+
+    def __init__(self, name, default):
+        self.name = name
+        self.default = default
+
+    def __get__(self, obj, owner):
+        if obj is not None:
+            pending = obj._pending
+            if pending and self.name in pending:
+                obj.decode_pending(self.name)
+                return getattr(obj, self.name)
+        return self.default
+
+
+_CLEAN = frozenset()  # shared changed fields of tracked model until first change
+
+
+class Model(object):
     """Base class for all Fakturoid model objects"""
     id = None
+    _pending = None  # raw values of lazy model waiting for conversion
+    _changed = None  # names of fields set since mark_clean(), None for untracked model
+    _snapshot = None  # copies of list and dict values taken by mark_clean()
+    _tracked_separately = ()  # mutable fields with own change detection
 
     def __init__(self, **fields):
         self.update(fields)
 
+    @classmethod
+    def lazy(cls, fields):
+        """Creates model from raw API data. Fields which need conversion
+        are converted when accessed first time.
+        """
+        obj = cls.__new__(cls)
+        obj.update_lazy(fields)
+        return obj
+
     def __repr__(self):
         return "<{0}:{1}>".format(self.__class__.__name__, self.id)
 
+    def __getattr__(self, name):
+        # called only if attribute is not found, so it's cheap for decoded fields
+        pending = self._pending
+        if pending and name in pending:
+            self.decode_pending(name)
+            return getattr(self, name)
+        raise AttributeError("'{0}' object has no attribute '{1}'".format(self.__class__.__name__, name))
+
+    def __setattr__(self, name, value):
+        pending = self._pending
+        if pending:
+            pending.pop(name, None)
+        object.__setattr__(self, name, value)
+        if type(value) is list or type(value) is dict:
+            self.mutable_fields().add(name)
+        if self._changed is not None and not name.startswith('_'):
+            self.mark_changed((name,))
+
+    @classmethod
+    def field_converter(cls, field):
+        """Returns function converting string value of field or None.
+        Result is cached per model class.
+        """
+        converters = cls.__dict__.get('_converters')
+        if converters is None:
+            converters = cls._converters = {}
+        try:
+            return converters[field]
+        except KeyError:
+            pass
+        if field.endswith('_at'):
+            converter = parse_datetime
+        elif field.endswith('_on') or field.endswith('_due') or field.endswith('_date'):
+            converter = parse_date
+        elif field in cls.Meta.decimal:
+            converter = Decimal
+        else:
+            converter = None
+        converters[field] = converter
+        return converter
+
+    @classmethod
+    def mutable_fields(cls):
+        """Returns set of fields seen with list or dict value. Values of these
+        fields are copied by mark_clean() to detect in-place changes.
+        """
+        fields = cls.__dict__.get('_mutable_fields')
+        if fields is None:
+            fields = cls._mutable_fields = set()
+        return fields
+
+    @classmethod
+    def decode_fields(cls, fields):
+        """Returns copy of raw fields with converted values."""
+        field_converter = cls.field_converter
+        values = {}
+        for field, value in fields.items():
+            if value and isinstance(value, str):
+                converter = field_converter(field)
+                if converter is not None:
+                    value = converter(value)
+            values[field] = value
+        return values
+
     def update(self, fields):
+        self.discard_pending(fields)
+        field_converter = self.field_converter
+        for field, value in fields.items():
+            if value and isinstance(value, str):
+                converter = field_converter(field)
+                if converter is not None:
+                    fields[field] = converter(value)
+            elif type(value) is list or type(value) is dict:
+                self.mutable_fields().add(field)
+        self.set_fields(fields)
+        if self._changed is not None:
+            self.mark_changed(field for field in fields if not field.startswith('_'))
+
+    def set_fields(self, values):
+        """Stores already converted values."""
+        self.__dict__.update(values)
+
+    def field_items(self):
+        return self.__dict__.items()
+
+    def pending_values(self):
+        """Returns dict of pending raw values, it's created if needed."""
+        pending = self._pending
+        if pending is None:
+            pending = {}
+            object.__setattr__(self, '_pending', pending)
+        return pending
+
+    def update_lazy(self, fields):
+        self.discard_pending(fields)
+        pending = self.pending_values()
+        field_converter = self.field_converter
+        values = {}
         for field, value in fields.items():
-            if value and isinstance(value, six.string_types):
-                if field.endswith('_at'):
-                    fields[field] = parse(value)
-                elif field.endswith('_on') or field.endswith('_due') or field.endswith('_date'):
-                    fields[field] = parse(value).date()
-                elif field in self.Meta.decimal:
-                    fields[field] = Decimal(value)
-        self.__dict__.update(fields)
+            if value and isinstance(value, str) and field_converter(field) is not None:
+                pending[field] = value
+            else:
+                if type(value) is list or type(value) is dict:
+                    self.mutable_fields().add(field)
+                values[field] = value
+        self.set_fields(values)
+
+    def discard_pending(self, fields):
+        pending = self._pending
+        if pending:
+            for field in fields:
+                pending.pop(field, None)
+
+    def decode_pending(self, field=None):
+        """Converts given pending field or all pending fields if field is None."""
+        pending = self._pending
+        if not pending:
+            return
+        if field is None:
+            for field in list(pending.keys()):
+                self.decode_pending(field)
+            return
+        value = pending.pop(field)
+        self.set_fields({field: self.field_converter(field)(value)})
+
+    def mark_clean(self):
+        """Starts tracking of changes, called for models loaded from server.
+        Lists and dicts are copied, so in-place changes are detected too.
+        Snapshot is created only for models having such values.
+        """
+        snapshot = None
+        pending = self._pending
+        for field in tuple(self.mutable_fields()):
+            if field.startswith('_') or field in self._tracked_separately or (pending and field in pending):
+                continue
+            value = getattr(self, field, None)
+            value_type = type(value)
+            if value_type is list or value_type is dict:
+                if snapshot is None:
+                    snapshot = {}
+                snapshot[field] = value_type(value)
+        object.__setattr__(self, '_changed', _CLEAN)
+        if snapshot is not None or self._snapshot is not None:
+            object.__setattr__(self, '_snapshot', snapshot)
+
+    def __copy__(self):
+        """Shallow copy with own pending values and tracking state."""
+        cls = self.__class__
+        obj = cls.__new__(cls)
+        obj.set_fields(dict(self.field_items()))
+        for name in ('_pending', '_changed', '_snapshot'):
+            value = getattr(self, name)
+            if value is not None and value is not _CLEAN:
+                value = type(value)(value)
+            if value is not getattr(obj, name):
+                object.__setattr__(obj, name, value)
+        return obj
+
+    def mark_changed(self, fields):
+        """Records fields as changed, set of changed fields is created on first change."""
+        changed = self._changed
+        if type(changed) is frozenset:  # _CLEAN, possibly deep copied
+            changed = set()
+            object.__setattr__(self, '_changed', changed)
+        changed.update(fields)
+
+    def changed_fields(self):
+        """Returns set of fields changed since mark_clean() or None if model is not tracked."""
+        if self._changed is None:
+            return None
+        changed = set(self._changed)
+        for field, value in (self._snapshot or {}).items():
+            if field not in changed and getattr(self, field, None) != value:
+                changed.add(field)
+        return changed
+
+    def is_changed(self):
+        return self._changed is None or bool(self.changed_fields())
 
     def is_field_writable(self, field, value):
         # if hasattr(self.Meta, 'writable'):
@@ -52,12 +266,33 @@ class Model(six.UnicodeMixin):
         return value
 
     def get_fields(self):
+        self.decode_pending()
         data = {}
-        for field, value in self.__dict__.items():
+        for field, value in self.field_items():
+            if field.startswith('_'):
+                continue
             if self.is_field_writable(field, value):
                 data[field] = self.serialize_field_value(field, value)
         return data
 
+    def get_changed_fields(self):
+        """Same as get_fields() but only with fields changed since model was
+        loaded. Returns all fields for models not loaded from server.
+        """
+        changed = self.changed_fields()
+        if changed is None:
+            return self.get_fields()
+        data = {}
+        for field in changed:
+            value = getattr(self, field, None)
+            if self.is_field_writable(field, value):
+                data[field] = self.serialize_changed_value(field, value)
+        return data
+
+    def serialize_changed_value(self, field, value):
+        """Serializes value of changed field for get_changed_fields()."""
+        return self.serialize_field_value(field, value)
+
 
 class Account(Model):
     """See http://docs.fakturoid.apiary.io/ for complete field reference."""
@@ -66,7 +301,7 @@ class Account(Model):
     class Meta:
         decimal = []
 
-    def __unicode__(self):
+    def __str__(self):
         return self.name
 
     def __repr__(self):
@@ -81,7 +316,7 @@ class Subject(Model):
         readonly = ['id', 'avatar_url', 'html_url', 'url', 'updated_at']
         decimal = []
 
-    def __unicode__(self):
+    def __str__(self):
         return self.name
 
 
@@ -96,7 +331,7 @@ class InvoiceLine(Model):
         self.quantity = Decimal(1)
         super(InvoiceLine, self).__init__(**kwargs)
 
-    def __unicode__(self):
+    def __str__(self):
         if self.unit_name:
             return "{0} {1} {2}".format(self.quantity, self.unit_name, self.name)
         else:
@@ -107,29 +342,116 @@ class InvoiceLine(Model):
 
 
 class AbstractInvoice(Model):
-    lines = []
-    _loaded_lines = []  # keep loaded data to be able delete removed lines
+    line_type = InvoiceLine
+    lines = pending_default('lines', [])
+    _loaded_lines = []  # ids of loaded lines to be able delete removed lines
+    _tracked_separately = ('lines',)
+
+    def __setattr__(self, name, value):
+        if name == 'lines' and 'lines' in (self._pending or ()):
+            # loaded lines has to be known to delete them on save
+            self.decode_pending('lines')
+        super(AbstractInvoice, self).__setattr__(name, value)
+
+    @classmethod
+    def decode_fields(cls, fields):
+        values = super(AbstractInvoice, cls).decode_fields(fields)
+        if values.get('lines'):
+            values['lines'] = [cls.line_type.decode_fields(line) for line in values['lines']]
+        return values
 
     def update(self, fields):
         if 'lines' in fields:
-            self.lines = []
-            self._loaded_lines = []
-            for line in fields.pop('lines'):
-                if not isinstance(line, InvoiceLine):
-                    if 'id' in line:
-                        self._loaded_lines.append(line)
-                    line = InvoiceLine(**line)
-                self.lines.append(line)
+            self.update_lines(fields.pop('lines'))
+            if self._changed is not None:
+                self.mark_changed(('lines',))
         super(AbstractInvoice, self).update(fields)
 
+    def update_lazy(self, fields):
+        if 'lines' in fields:
+            fields = dict(fields)
+            self.discard_pending(['lines'])
+            self.pending_values()['lines'] = fields.pop('lines')
+        super(AbstractInvoice, self).update_lazy(fields)
+
+    def decode_pending(self, field=None):
+        if field == 'lines':
+            self.update_lines(self._pending.pop('lines'))
+            if self._changed is not None:
+                # lines decoded after model was marked clean
+                for line in self.lines:
+                    line.mark_clean()
+        else:
+            super(AbstractInvoice, self).decode_pending(field)
+
+    def update_lines(self, lines):
+        self.discard_pending(['lines'])
+        new_lines = []
+        loaded_lines = []
+        for line in lines:
+            if not isinstance(line, InvoiceLine):
+                loaded_lines.append(line.get('id'))
+                line = self.line_type(**line)
+            new_lines.append(line)
+        self.set_fields({'lines': new_lines, '_loaded_lines': loaded_lines})
+
+    def mark_clean(self):
+        super(AbstractInvoice, self).mark_clean()
+        if 'lines' not in (self._pending or ()):
+            for line in self.lines:
+                line.mark_clean()
+
+    def changed_fields(self):
+        changed = super(AbstractInvoice, self).changed_fields()
+        if changed is not None and 'lines' not in changed and 'lines' not in (self._pending or ()):
+            # lines added or removed in place or changed line, order of lines
+            # is not sent by diff, so reordering alone is not a change
+            lines = self.lines
+            loaded = self._loaded_lines
+            if len(lines) != len(loaded) or set(line.id for line in lines) != set(loaded) \
+                    or any(line.is_changed() for line in lines):
+                changed.add('lines')
+        return changed
+
     def serialize_field_value(self, field, value):
-        result = super(AbstractInvoice, self).serialize_field_value(field, value)
         if field == 'lines':
-            ids = map(lambda l: l.get('id'), result)
-            for remote in self._loaded_lines:
-                if remote['id'] not in ids:
-                    remote['_destroy'] = True
-                    result.append(remote)
+            return self.serialize_lines(value)
+        return super(AbstractInvoice, self).serialize_field_value(field, value)
+
+    def get_changed_fields(self):
+        data = super(AbstractInvoice, self).get_changed_fields()
+        if self._changed is not None and data.get('lines') == []:
+            del data['lines']  # lines were only reordered
+        return data
+
+    def serialize_changed_value(self, field, value):
+        if field == 'lines':
+            return self.serialize_lines(value, diff=True)
+        return super(AbstractInvoice, self).serialize_changed_value(field, value)
+
+    def serialize_lines(self, lines, diff=False):
+        """Returns all lines, removed loaded lines are marked with _destroy.
+        With diff only lines changed since invoice was loaded are returned:
+        new lines whole and edited lines with id and changed fields.
+        """
+        result = []
+        ids = set()
+        for line in lines:
+            if not isinstance(line, Model):
+                ids.add(line.get('id'))
+                result.append(line)
+            elif line.id is None or not diff:
+                ids.add(line.id)
+                result.append(line.get_fields())
+            else:
+                ids.add(line.id)
+                if line.is_changed():
+                    fields = line.get_changed_fields()
+                    fields['id'] = line.id
+                    result.append(fields)
+        for id in self._loaded_lines:
+            if id is not None and id not in ids:
+                result.append({'id': id, '_destroy': True})
         return result
 
     def is_field_writable(self, field, value):
@@ -157,7 +479,7 @@ class Invoice(AbstractInvoice):
             'remaining_native_amount'
         ]
 
-    def __unicode__(self):
+    def __str__(self):
         return self.number
 
 
@@ -178,7 +500,7 @@ class Expense(AbstractInvoice):
             'native_subtotal', 'native_total'
         ]
 
-    def __unicode__(self):
+    def __str__(self):
         return self.number
 
 
@@ -193,7 +515,7 @@ class Generator(AbstractInvoice):
         ]
         decimal = ['exchange_rate', 'subtotal', 'total', 'native_subtotal', 'native_total']
 
-    def __unicode__(self):
+    def __str__(self):
         return self.name
 
 
@@ -204,5 +526,5 @@ class Message(Model):
     class Meta:
         decimal = []
 
-    def __unicode__(self):
+    def __str__(self):
         return self.subject
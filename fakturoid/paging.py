@@ -1,15 +1,23 @@
-from itertools import islice
+from collections import OrderedDict
+from contextvars import copy_context
+from itertools import chain, count
 
-from fakturoid import six
+from fakturoid import export
+from fakturoid.index import Index
 
 
 class PagedResource(object):
-    """List adapter for paged resources. Returns sliceable lazy loaded object."""
+    """List adapter for paged resources. Returns sliceable lazy loaded object.
 
-    def __init__(self, page_size=20):
-        self.pages = {}
+    Loaded pages are kept in memory. If cache_pages is given, only that many
+    recently used pages are kept and evicted pages are loaded again on access.
+    """
+
+    def __init__(self, page_size=20, cache_pages=None):
+        self.pages = OrderedDict()
         self.page_size = page_size or 20
         self.page_count = None
+        self.cache_pages = cache_pages
 
     def load_page(self, n):
         raise NotImplementedError("You must implement load_page method.")
@@ -19,22 +27,75 @@ class PagedResource(object):
             # load any page to get page count from headers
             self.get_page(0)
 
-    def get_page(self, n):
+    def get_page(self, n, cache=True):
         if self.page_count and n >= self.page_count:
             raise IndexError('index out of range')
         if n in self.pages:
+            if self.cache_pages:
+                self.pages.move_to_end(n)
             return self.pages[n]
         page = self.load_page(n)
         if page:
-            self.pages[n] = page
+            if cache:
+                self.store_page(n, page)
             return page
         raise IndexError('index out of range')
 
+    def store_page(self, n, page):
+        self.pages[n] = page
+        if self.cache_pages:
+            while len(self.pages) > self.cache_pages:
+                self.pages.popitem(last=False)
+
+    def iter_pages(self, cache=True):
+        n = 0
+        while True:
+            try:
+                page = self.get_page(n, cache)
+            except IndexError:
+                return
+            yield page
+            n += 1
+
+    def __iter__(self):
+        for page in self.iter_pages():
+            for item in page:
+                yield item
+
+    def stream(self):
+        """Iterates over all items without keeping consumed pages in memory."""
+        for page in self.iter_pages(cache=False):
+            for item in page:
+                yield item
+
     def __len__(self):
         self.ensure_page_count()
         return (self.page_size * (self.page_count - 1) +
                 len(self.get_page(self.page_count - 1)))
 
+    def approx_len(self):
+        """Returns length without loading last page. Result is exact if last
+        page is already loaded, otherwise it's upper bound computed from page count.
+        """
+        self.ensure_page_count()
+        if self.page_count - 1 in self.pages:
+            return len(self)
+        return self.page_size * self.page_count
+
+    def iter_indices(self, indices):
+        """Yields items for given indices, loading only pages they belong to.
+        Stops on first index out of range.
+        """
+        for i in indices:
+            page_n, idx = divmod(i, self.page_size)
+            try:
+                page = self.get_page(page_n)
+            except IndexError:
+                return
+            if idx >= len(page):
+                return
+            yield page[idx]
+
     def __getitem__(self, key):
         if isinstance(key, int):
             if key < 0:
@@ -44,28 +105,174 @@ class PagedResource(object):
             page_n, idx = divmod(key, self.page_size)
             return self.get_page(page_n)[idx]
         elif isinstance(key, slice):
-            # TODO support negative step
-            return islice(self, *key.indices(len(self)))
+            start, stop, step = key.start, key.stop, key.step
+            if step is None:
+                step = 1
+            elif step == 0:
+                raise ValueError('slice step cannot be zero')
+            if step < 0 or (start or 0) < 0 or (stop or 0) < 0:
+                # length is needed to resolve negative values
+                return self.iter_indices(range(*key.indices(len(self))))
+            start = start or 0
+            if stop is None:
+                return self.iter_indices(count(start, step))
+            return self.iter_indices(range(start, stop, step))
         else:
             raise TypeError('list indices must be integers')
 
 
-class ModelList(PagedResource, six.UnicodeMixin):
+class ModelList(PagedResource):
+    """Lazy loaded list of models. If prefetch is given, iteration loads
+    up to prefetch following pages in background threads while current
+    page is processed. If lazy is set, models convert their fields on
+    first access (see Model.lazy). Compact lists contain memory efficient
+    models from fakturoid.compact.
+    """
 
-    def __init__(self, model_api, endpoint, params=None):
-        super(ModelList, self).__init__()
+    def __init__(self, model_api, endpoint, params=None, prefetch=None, cache_pages=None, lazy=False, compact=False):
+        super(ModelList, self).__init__(cache_pages=cache_pages)
         self.model_api = model_api
         self.endpoint = endpoint
         self.params = params or {}
+        self.prefetch = prefetch
+        self.lazy = lazy
+        self.compact = compact
+        self.indexes = {}
 
-    def load_page(self, n):
+    def load_response(self, n):
         params = {'page': n + 1}
         params.update(self.params)
         response = self.model_api.session._get(self.endpoint, params=params)
         if self.page_count is None:
             self.page_count = response.get('page_count', n + 1)
-        return list(self.model_api.unpack(response))
+        return response
+
+    def load_page(self, n):
+        response = self.load_response(n)
+        page = list(self.model_api.unpack(response, lazy=self.lazy, compact=self.compact))
+        for index in list(self.indexes.values()):
+            index.add(page)
+        return page
+
+    def stream(self, incremental=False):
+        """Iterates over all items without keeping consumed pages in memory.
+        If incremental is set, response body is read and decoded item by
+        item (prefetch is not used then), so whole page isn't held in memory
+        at once. Useful for pages of invoices with many lines.
+        """
+        if not incremental:
+            return super(ModelList, self).stream()
+        return self._stream_items()
+
+    def _stream_items(self):
+        n = 0
+        while self.page_count is None or n < self.page_count:
+            params = {'page': n + 1}
+            params.update(self.params)
+            response = self.model_api.session._get_stream(self.endpoint, params=params)
+            if self.page_count is None:
+                self.page_count = response.get('page_count', n + 1)
+            empty = True
+            for fields in response['items']:
+                empty = False
+                model = self.model_api.create_models(fields, lazy=self.lazy, compact=self.compact)
+                for index in list(self.indexes.values()):
+                    index.add([model])
+                yield model
+            if empty:
+                return
+            n += 1
+
+    def load_raw_page(self, n):
+        return self.load_response(n)['json']
+
+    def iter_pages(self, cache=True):
+        if not self.prefetch:
+            for page in super(ModelList, self).iter_pages(cache):
+                yield page
+            return
+
+        try:
+            first = self.get_page(0, cache)  # page count is known after first page
+        except IndexError:
+            return
+
+        for n, page in enumerate(self._prefetch(self.load_page, first, self.pages)):
+            if not page:
+                return
+            if cache and n not in self.pages:
+                self.store_page(n, page)
+            yield page
+
+    def iter_raw_pages(self):
+        """Yields pages of raw API data without creating models."""
+        first = self.load_raw_page(0)
+        if not first:
+            return
+        if self.prefetch:
+            pages = self._prefetch(self.load_raw_page, first)
+        else:
+            pages = chain([first], (self.load_raw_page(n) for n in range(1, self.page_count)))
+        for page in pages:
+            if not page:
+                return
+            yield page
+
+    def _prefetch(self, load, first, loaded=None):
+        """Yields first page and following pages loaded by up to prefetch
+        worker threads. Pages found in loaded are not fetched again.
+        """
+        if loaded is None:
+            loaded = {}
+        from concurrent.futures import ThreadPoolExecutor
+        executor = ThreadPoolExecutor(max_workers=self.prefetch)
+        futures = {}
+        next_page = 1
+        try:
+            for n in range(self.page_count):
+                while next_page < self.page_count and next_page <= n + self.prefetch:
+                    if next_page not in loaded:
+                        # run in caller's context to keep request priority
+                        futures[next_page] = executor.submit(copy_context().run, load, next_page)
+                    next_page += 1
+                if n == 0:
+                    yield first
+                elif n in futures:
+                    yield futures.pop(n).result()
+                else:
+                    page = loaded.get(n)
+                    yield page if page is not None else load(n)
+        finally:
+            for future in futures.values():
+                future.cancel()
+            executor.shutdown(wait=False)
+
+    def index(self, field, load=True):
+        """Returns Index of models by field value (see fakturoid.index).
+        Index is created once per field and updated whenever page is loaded.
+        If load is set, all pages are loaded first, otherwise index contains
+        only models loaded so far.
+        """
+        index = self.indexes.get(field)
+        if index is None:
+            index = self.indexes[field] = Index(field)
+            index.add(model for page in list(self.pages.values()) for model in page)
+        if load and not index.complete:
+            for page in self.iter_pages():
+                pass
+            index.complete = True
+        return index
+
+    def to_table(self):
+        """Returns tuple (records, lines) of pyarrow tables. See fakturoid.export."""
+        return export.to_table(self)
+
+    def to_parquet(self, path, lines_path=None):
+        export.to_parquet(self, path, lines_path)
+
+    def to_csv(self, path, lines_path=None):
+        export.to_csv(self, path, lines_path)
 
-    def __unicode__(self):
+    def __str__(self):
         # TODO print if loaded
         return "<list of {0} models>".format(self.model_api.model_type.__name__)
@@ -0,0 +1,207 @@
+"""Sessions of many Fakturoid accounts.
+
+    from fakturoid.pool import FakturoidPool
+
+    pool = FakturoidPool([('slug1', 'your@email.com', 'apikey038dc73...'),
+                          ('slug2', 'your@email.com', 'apikey1ab27f0...')],
+                         rate_limit=20, account_rate_limit=2)
+    for result in pool.map(lambda fa: fa.invoices(status='overdue'), workers=16):
+        if result.ok:
+            print(result.slug, len(result.value))
+
+Sessions are created on first use and share one transport (connection
+pool) and global scheduler, every account has own scheduler limiting its
+requests. Lists returned by mapped function are loaded completely in
+worker. Results are yielded as soon as they are ready, tagged by slug.
+
+With processes=True function runs in worker processes, so it has to be
+picklable (defined at module level) and so do returned values. Every
+process has own connections and global limit is divided among processes.
+"""
+from collections import namedtuple, OrderedDict
+import threading
+
+from fakturoid.api import Fakturoid
+from fakturoid.paging import PagedResource
+from fakturoid.throttle import Scheduler, AccountScheduler, priority, BULK
+from fakturoid.transport import RequestsTransport
+
+__all__ = ['FakturoidPool', 'PoolResult']
+
+
+class PoolResult(namedtuple('PoolResult', ['slug', 'value', 'error'])):
+    """Result of function called for single account."""
+
+    __slots__ = ()
+
+    @property
+    def ok(self):
+        return self.error is None
+
+
+def call_session(session, fn):
+    try:
+        with priority(BULK):
+            value = fn(session)
+            if isinstance(value, PagedResource):
+                value = list(value)
+        return PoolResult(session.slug, value, None)
+    except Exception as e:
+        return PoolResult(session.slug, None, e)
+
+
+class FakturoidPool(object):
+    """Sessions of many accounts sharing transport and global scheduler.
+
+    accounts -- (slug, email, api_key) tuples or mapping slug -> (email, api_key)
+    rate_limit -- requests per second of all accounts together
+    account_rate_limit -- requests per second of single account
+    session_options -- other arguments passed to every session
+    """
+    session_type = Fakturoid
+
+    def __init__(self, accounts=(), user_agent=None, pool_size=20, keep_alive=True, rate_limit=None,
+                 account_rate_limit=None, max_retries=3, transport=None, **session_options):
+        self.user_agent = user_agent
+        self.pool_size = pool_size
+        self.keep_alive = keep_alive
+        self.rate_limit = rate_limit
+        self.account_rate_limit = account_rate_limit
+        self.max_retries = max_retries
+        self.session_options = session_options
+        self.transport = transport or RequestsTransport(pool_size, keep_alive)
+        self.scheduler = Scheduler(rate=rate_limit, max_retries=max_retries)
+        self._accounts = OrderedDict()
+        self._sessions = {}
+        self._lock = threading.Lock()
+        if hasattr(accounts, 'items'):
+            accounts = ((slug, email, api_key) for slug, (email, api_key) in accounts.items())
+        for slug, email, api_key in accounts:
+            self.add(slug, email, api_key)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def __len__(self):
+        return len(self._accounts)
+
+    def __iter__(self):
+        return iter(list(self._accounts))
+
+    def __contains__(self, slug):
+        return slug in self._accounts
+
+    def __getitem__(self, slug):
+        return self.session(slug)
+
+    @property
+    def slugs(self):
+        return list(self._accounts)
+
+    def add(self, slug, email, api_key):
+        """Adds account or replaces credentials of existing one."""
+        with self._lock:
+            self._accounts[slug] = (email, api_key)
+            self._sessions.pop(slug, None)
+
+    def remove(self, slug):
+        with self._lock:
+            del self._accounts[slug]
+            self._sessions.pop(slug, None)
+
+    def session(self, slug):
+        """Returns session of account, it's created on first call."""
+        session = self._sessions.get(slug)
+        if session is None:
+            with self._lock:
+                session = self._sessions.get(slug)
+                if session is None:
+                    email, api_key = self._accounts[slug]
+                    scheduler = AccountScheduler(self.scheduler, rate=self.account_rate_limit,
+                                                 max_retries=self.max_retries)
+                    session = self.session_type(slug, email, api_key, user_agent=self.user_agent,
+                                                scheduler=scheduler, transport=self.transport,
+                                                **self.session_options)
+                    self._sessions[slug] = session
+        return session
+
+    def close(self):
+        """Close pooled connections of all sessions."""
+        self.transport.close()
+
+    def map(self, fn, slugs=None, workers=8, processes=False):
+        """Calls fn(session) for every account (or given slugs) and yields
+        PoolResult in order of completion. Failure of one account doesn't
+        stop others, exception is available as error of its result.
+        """
+        slugs = list(self._accounts) if slugs is None else list(slugs)
+        if processes:
+            return self._map_processes(fn, slugs, workers)
+        return self._map_threads(fn, slugs, workers)
+
+    def _map_threads(self, fn, slugs, workers):
+        if workers <= 1:
+            for slug in slugs:
+                yield call_session(self.session(slug), fn)
+            return
+        from concurrent.futures import ThreadPoolExecutor
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            def submit(slug):
+                return executor.submit(call_session, self.session(slug), fn)
+            for result in _completed(slugs, workers, submit):
+                yield result
+
+    def _map_processes(self, fn, slugs, workers):
+        from concurrent.futures import ProcessPoolExecutor
+        options = dict(self.session_options, user_agent=self.user_agent, pool_size=self.pool_size,
+                       keep_alive=self.keep_alive, account_rate_limit=self.account_rate_limit,
+                       max_retries=self.max_retries)
+        if self.rate_limit:
+            options['rate_limit'] = float(self.rate_limit) / workers
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_process,
+                                 initargs=(type(self), options)) as executor:
+            def submit(slug):
+                email, api_key = self._accounts[slug]
+                return executor.submit(_call_in_process, slug, email, api_key, fn)
+            for result in _completed(slugs, workers, submit):
+                yield result
+
+
+def _completed(slugs, workers, submit):
+    """Keeps up to twice as many calls as workers submitted and yields
+    their results as they complete.
+    """
+    from concurrent.futures import wait, FIRST_COMPLETED
+    slugs = iter(slugs)
+    pending = {}  # future -> slug
+    while True:
+        for slug in slugs:
+            pending[submit(slug)] = slug
+            if len(pending) >= workers * 2:
+                break
+        if not pending:
+            return
+        done, _ = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            slug = pending.pop(future)
+            try:
+                yield future.result()
+            except Exception as e:  # e.g. result of process couldn't be pickled
+                yield PoolResult(slug, None, e)
+
+
+_process_pool = None
+
+
+def _init_process(pool_type, options):
+    global _process_pool
+    _process_pool = pool_type(**options)
+
+
+def _call_in_process(slug, email, api_key, fn):
+    if slug not in _process_pool:
+        _process_pool.add(slug, email, api_key)
+    return call_session(_process_pool.session(slug), fn)
@@ -0,0 +1,242 @@
+"""Local full-text search in subjects.
+
+    fa.subjects.search('acme', local=True)
+
+Index is built from all subjects on first local search and then refreshed
+with subjects updated since last refresh. Subjects saved or deleted
+through session are updated immediately. Query terms are matched as
+prefixes of words in indexed fields, terms with at least three characters
+also by trigrams, so substrings and small typos are found too. Matching
+ignores case and diacritics, all terms of query have to match.
+"""
+import re
+import threading
+import time
+import unicodedata
+import heapq
+from bisect import bisect_left
+
+from fakturoid.models import Subject
+
+__all__ = ['SubjectIndex']
+
+FIELDS = ('name', 'registration_no', 'vat_no', 'email', 'city')
+
+SHORT = 2  # terms up to this length are matched by prefix buckets only
+
+_word_pattern = re.compile(r'\w+', re.UNICODE)
+
+
+def normalize(text):
+    text = unicodedata.normalize('NFKD', text.lower())
+    return ''.join(c for c in text if not unicodedata.combining(c))
+
+
+def tokenize(text):
+    return _word_pattern.findall(normalize(text))
+
+
+def trigrams(word):
+    # padded same way as PostgreSQL pg_trgm, so word beginnings and ends weigh more
+    word = '  {0} '.format(word)
+    return set(word[i:i + 3] for i in range(len(word) - 2))
+
+
+def short_prefixes(word):
+    return [word[:n] for n in range(1, min(len(word), SHORT) + 1)]
+
+
+class SubjectIndex(object):
+    """In-memory search index of subjects.
+
+    fields -- indexed subject fields
+    similarity -- minimal share of query term trigrams found in word
+    """
+
+    def __init__(self, subjects=(), fields=FIELDS, similarity=0.6):
+        self.fields = fields
+        self.similarity = similarity
+        self.updated_since = None  # latest updated_at of indexed subjects
+        self.refreshed_at = None
+        self._subjects = {}
+        self._words = {}  # subject id -> indexed words
+        self._postings = {}  # word -> subject ids
+        self._trigrams = {}  # trigram -> words
+        self._prefixes = {}  # short prefix -> subject ids
+        self._sorted_words = None
+        self._ranks = None  # subject id -> position when ordered by name
+        self._lock = threading.RLock()
+        self.add(subjects)
+
+    def __len__(self):
+        return len(self._subjects)
+
+    def add(self, subjects):
+        """Adds subjects or replaces already indexed ones with same id."""
+        with self._lock:
+            for subject in subjects:
+                self.remove(subject.id)
+                self._ranks = None
+                words = set()
+                for field in self.fields:
+                    value = getattr(subject, field, None)
+                    if value:
+                        words.update(tokenize(str(value)))
+                self._subjects[subject.id] = subject
+                self._words[subject.id] = words
+                for word in words:
+                    ids = self._postings.get(word)
+                    if ids is None:
+                        ids = self._postings[word] = set()
+                        for trigram in trigrams(word):
+                            self._trigrams.setdefault(trigram, set()).add(word)
+                        self._sorted_words = None
+                    ids.add(subject.id)
+                    for prefix in short_prefixes(word):
+                        self._prefixes.setdefault(prefix, set()).add(subject.id)
+                updated_at = getattr(subject, 'updated_at', None)
+                if updated_at and (self.updated_since is None or updated_at > self.updated_since):
+                    self.updated_since = updated_at
+
+    def remove(self, id):
+        with self._lock:
+            if self._subjects.pop(id, None) is not None:
+                self._ranks = None
+            for word in self._words.pop(id, ()):
+                # all words of subject are removed, so it's in no bucket of theirs
+                for prefix in short_prefixes(word):
+                    ids = self._prefixes.get(prefix)
+                    if ids is not None:
+                        ids.discard(id)
+                        if not ids:
+                            del self._prefixes[prefix]
+                ids = self._postings[word]
+                ids.discard(id)
+                if not ids:
+                    del self._postings[word]
+                    for trigram in trigrams(word):
+                        self._trigrams[trigram].discard(word)
+                    self._sorted_words = None
+
+    def clear(self):
+        with self._lock:
+            self._subjects.clear()
+            self._words.clear()
+            self._postings.clear()
+            self._trigrams.clear()
+            self._prefixes.clear()
+            self._sorted_words = None
+            self._ranks = None
+            self.updated_since = None
+
+    def refresh(self, session, full=False):
+        """Loads subjects updated since last refresh (all pages). Subjects
+        deleted in Fakturoid are not reported by API, use full refresh to drop them.
+        """
+        self.refreshed(list(self.updated_subjects(session, full)), full)
+
+    async def refresh_async(self, session, full=False):
+        """Same as refresh() for AsyncFakturoid."""
+        self.refreshed(await self.updated_subjects(session, full).fetch_all(), full)
+
+    def updated_subjects(self, session, full=False):
+        """Returns list of subjects to be loaded by refresh."""
+        params = {}
+        if not full and self.updated_since is not None:
+            params['updated_since'] = self.updated_since.isoformat()
+        return session.list_type(session._models_api[Subject], 'subjects', params)
+
+    def refreshed(self, subjects, full=False):
+        with self._lock:
+            if full:
+                self.clear()
+            self.add(subjects)
+            self.refreshed_at = time.monotonic()
+
+    def age(self):
+        """Seconds since last refresh, None if index wasn't refreshed yet."""
+        if self.refreshed_at is None:
+            return None
+        return time.monotonic() - self.refreshed_at
+
+    def _tiers(self, term, enough=None):
+        """Returns list of (score, subject ids) matching term, best first.
+        Subject can be in more tiers. Typo tolerant trigram matches
+        are skipped when at least enough subjects are matched by prefix.
+        """
+        exact = self._postings.get(term, ())
+        if len(term) <= SHORT:
+            return [(2.0, exact), (1.5, self._prefixes.get(term, ()))]
+        words = self._sorted_words
+        if words is None:
+            words = self._sorted_words = sorted(self._postings)
+        prefix = set()
+        i = bisect_left(words, term)
+        while i < len(words) and words[i].startswith(term):
+            prefix.update(self._postings[words[i]])
+            i += 1
+        tiers = [(2.0, exact), (1.5, prefix)]
+        if enough is not None and len(prefix) >= enough:
+            return tiers
+        postings = sorted((self._trigrams.get(trigram, ()) for trigram in trigrams(term)), key=len)
+        needed = next(count for count in range(len(postings) + 1)
+                      if float(count) / len(postings) >= self.similarity)
+        # word having at least needed trigrams has one of the rarest ones,
+        # so only these are counted instead of all words of common trigrams
+        similar = {}
+        for word in set().union(*postings[:len(postings) - needed + 1]):
+            if word.startswith(term):
+                continue
+            similarity = float(sum(1 for words in postings if word in words)) / len(postings)
+            if similarity >= self.similarity:
+                similar.setdefault(similarity, set()).update(self._postings[word])
+        tiers.extend(sorted(similar.items(), reverse=True))
+        return tiers
+
+    def _rank(self):
+        ranks = self._ranks
+        if ranks is None:
+            subjects = self._subjects
+            ordered = sorted(subjects, key=lambda id: subjects[id].name or '')
+            ranks = self._ranks = dict((id, i) for i, id in enumerate(ordered))
+        return ranks
+
+    def search(self, query, limit=20):
+        """Returns subjects matching all terms of query ordered by relevance."""
+        terms = tokenize(query)
+        if not terms:
+            return []
+        with self._lock:
+            if len(terms) == 1:
+                # lower tiers can't outrank prefix matches of single term
+                tiers = self._tiers(terms[0], enough=limit)
+            else:
+                scores = None
+                for term in terms:
+                    term_scores = {}
+                    # worst tier first, so best score of subject is written last
+                    for score, ids in reversed(self._tiers(term)):
+                        term_scores.update(dict.fromkeys(ids, score))
+                    if scores is None:
+                        scores = term_scores
+                    else:
+                        if len(term_scores) < len(scores):
+                            scores, term_scores = term_scores, scores
+                        scores = dict((id, score + term_scores[id]) for id, score in scores.items()
+                                      if id in term_scores)
+                    if not scores:
+                        return []
+                by_score = {}
+                for id, score in scores.items():
+                    by_score.setdefault(score, []).append(id)
+                tiers = sorted(by_score.items(), reverse=True)
+            ranks = self._rank()
+            ranked = []
+            seen = set()
+            for score, ids in tiers:
+                ids = [id for id in ids if id not in seen] if seen else ids
+                ranked.extend(heapq.nsmallest(limit - len(ranked), ids, key=ranks.__getitem__))
+                if len(ranked) >= limit:
+                    break
+                seen.update(ids)
+            return [self._subjects[id] for id in ranked]
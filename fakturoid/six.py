@@ -1,17 +0,0 @@
-import sys
-
-if sys.version_info[0] >= 3:  # Python 3
-    string_types = (str,)
-else:
-    string_types = (basestring,)
-
-
-class UnicodeMixin(object):
-    """Mixin class to handle defining the proper __str__/__unicode__
-    methods in Python 2 or 3."""
-    if sys.version_info[0] >= 3:  # Python 3
-        def __str__(self):
-            return self.__unicode__()
-    else:  # Python 2
-        def __str__(self):
-            return self.__unicode__().encode('utf8')
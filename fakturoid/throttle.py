@@ -0,0 +1,226 @@
+"""Request scheduling respecting Fakturoid rate limits.
+
+All requests of session pass through Scheduler. It combines token bucket
+with configured rate, pacing by rate limit headers sent by server and
+back-off with jitter for 429 and 5xx responses. Waiting requests are
+served by priority, so interactive calls are not stuck behind bulk export.
+
+    with fa.bulk():
+        fa.invoices().to_csv('invoices.csv')
+"""
+import heapq
+import itertools
+import random
+import re
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+__all__ = ['Scheduler', 'AccountScheduler', 'INTERACTIVE', 'BULK', 'priority']
+
+INTERACTIVE = 0
+BULK = 10
+
+_priority = ContextVar('fakturoid_priority', default=INTERACTIVE)
+
+_rate_limit_pattern = re.compile(r'r=(\d+).*?t=([\d.]+)')
+
+
+@contextmanager
+def priority(level):
+    """Sets priority of requests made in block (including prefetch threads
+    and asyncio tasks started from it). Lower value is served first.
+    """
+    token = _priority.set(level)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+def _header(headers, name):
+    return headers[name] if name in headers else None
+
+
+def _seconds(value):
+    try:
+        return max(0.0, float(value))
+    except (TypeError, ValueError):
+        return None
+
+
+class Scheduler(object):
+    """Thread safe request scheduler.
+
+    rate -- requests per second, None means no client side limit
+    burst -- maximal number of requests sent at once (defaults to rate)
+    max_retries -- how many times is request repeated on 429 and 5xx
+    backoff -- base of exponential back-off in seconds
+    """
+    IDEMPOTENT_METHODS = ('get', 'put', 'delete')
+    RETRY_STATUSES = (500, 502, 503, 504)
+    POLL_INTERVAL = 0.01  # seconds between checks of async request waiting behind others
+
+    def __init__(self, rate=None, burst=None, max_retries=3, backoff=0.5, max_backoff=60.0):
+        self.rate = rate
+        self.burst = burst or (max(1.0, rate) if rate else 1.0)
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+
+        self._clock = time.monotonic
+        self._tokens = self.burst
+        self._updated = self._clock()
+        self._blocked_until = 0.0
+        self._budget = None  # (remaining requests, window end) reported by server
+        self._last_grant = 0.0
+        self._cond = threading.Condition()
+        self._waiting = []
+        self._seq = itertools.count()
+
+    def _refill(self, now):
+        if self.rate:
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def _wait_time(self, now):
+        wait = self._blocked_until - now
+        if self.rate and self._tokens < 1:
+            wait = max(wait, (1 - self._tokens) / self.rate)
+        if self._budget:
+            remaining, window_end = self._budget
+            if now >= window_end:
+                self._budget = None
+            elif remaining <= 0:
+                wait = max(wait, window_end - now)
+            else:
+                # spread remaining requests evenly over rest of window
+                interval = (window_end - now) / remaining
+                wait = max(wait, self._last_grant + interval - now)
+        return wait
+
+    def _grant(self, now):
+        if self.rate:
+            self._tokens -= 1
+        if self._budget:
+            remaining, window_end = self._budget
+            self._budget = (remaining - 1, window_end)
+        self._last_grant = now
+
+    def acquire(self, level=None):
+        """Blocks until request can be sent."""
+        if level is None:
+            level = _priority.get()
+        with self._cond:
+            ticket = (level, next(self._seq))
+            heapq.heappush(self._waiting, ticket)
+            try:
+                while True:
+                    now = self._clock()
+                    self._refill(now)
+                    timeout = None
+                    if self._waiting[0] == ticket:
+                        timeout = self._wait_time(now)
+                        if timeout <= 0:
+                            self._grant(now)
+                            return
+                    self._cond.wait(timeout)
+            finally:
+                self._waiting.remove(ticket)
+                heapq.heapify(self._waiting)
+                self._cond.notify_all()
+
+    async def acquire_async(self, level=None):
+        """Awaits until request can be sent. Doesn't block event loop, waiting
+        requests are served by priority together with blocking ones.
+        """
+        import asyncio  # imported here, sync sessions don't need it
+        if level is None:
+            level = _priority.get()
+        with self._cond:
+            ticket = (level, next(self._seq))
+            heapq.heappush(self._waiting, ticket)
+        try:
+            while True:
+                with self._cond:
+                    now = self._clock()
+                    self._refill(now)
+                    if self._waiting[0] == ticket:
+                        wait = self._wait_time(now)
+                        if wait <= 0:
+                            self._grant(now)
+                            return
+                    else:
+                        # condition can't be awaited, check again shortly
+                        wait = self.POLL_INTERVAL
+                await asyncio.sleep(wait)
+        finally:
+            with self._cond:
+                self._waiting.remove(ticket)
+                heapq.heapify(self._waiting)
+                self._cond.notify_all()
+
+    def feedback(self, status_code, headers):
+        """Updates limits from response headers."""
+        now = self._clock()
+        with self._cond:
+            retry_after = _seconds(_header(headers, 'retry-after'))
+            if status_code == 429:
+                self._blocked_until = max(self._blocked_until, now + (retry_after or self.backoff))
+
+            budget = None
+            value = _header(headers, 'x-ratelimit')
+            if value:
+                m = _rate_limit_pattern.search(value)
+                if m:
+                    budget = int(m.group(1)), float(m.group(2))
+            else:
+                remaining = _header(headers, 'x-ratelimit-remaining')
+                reset = _seconds(_header(headers, 'x-ratelimit-reset'))
+                if remaining is not None and reset is not None:
+                    if reset > 1e9:  # epoch timestamp
+                        reset = max(0.0, reset - time.time())
+                    budget = int(remaining), reset
+            if budget:
+                self._budget = budget[0], now + budget[1]
+            self._cond.notify_all()
+
+    def retry_delay(self, method, status_code, headers, attempt):
+        """Returns seconds to wait before request is repeated or None if it shouldn't be repeated."""
+        if attempt >= self.max_retries:
+            return None
+        if status_code == 429:
+            retry_after = _seconds(_header(headers, 'retry-after'))
+            if retry_after is not None:
+                return retry_after
+        elif status_code not in self.RETRY_STATUSES or method not in self.IDEMPOTENT_METHODS:
+            return None
+        delay = min(self.max_backoff, self.backoff * 2 ** attempt)
+        return delay / 2 + random.uniform(0, delay / 2)
+
+    def sleep(self, seconds):
+        time.sleep(seconds)
+
+
+class AccountScheduler(Scheduler):
+    """Scheduler of single account sharing global scheduler with other
+    accounts. Request has to pass limits of account first and then global
+    limits. Rate limit headers and retries are handled per account.
+    """
+
+    def __init__(self, parent, rate=None, burst=None, max_retries=3, backoff=0.5, max_backoff=60.0):
+        super(AccountScheduler, self).__init__(rate, burst, max_retries, backoff, max_backoff)
+        self.parent = parent
+
+    def acquire(self, level=None):
+        if level is None:
+            level = _priority.get()
+        super(AccountScheduler, self).acquire(level)
+        self.parent.acquire(level)
+
+    async def acquire_async(self, level=None):
+        if level is None:
+            level = _priority.get()
+        await super(AccountScheduler, self).acquire_async(level)
+        await self.parent.acquire_async(level)
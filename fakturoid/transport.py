@@ -0,0 +1,165 @@
+"""Transports sending HTTP requests of session.
+
+Transport has single method ``request(method, url, **kwargs)`` returning
+response object with ``status_code``, ``headers`` (lowercase names have to
+work), ``text``, ``content``, ``json()`` and ``raise_for_status()``. Keyword
+arguments are ``auth``, ``headers``, ``params``, ``data`` and ``stream``.
+Streamed response is read by ``iter_content(chunk_size)`` and ``close()``.
+
+    from fakturoid.transport import RecordReplayTransport
+
+    # record responses of real service
+    fa = Fakturoid('yourslug', 'your@email.com', 'apikey038dc73...',
+                   transport=RecordReplayTransport('recorded', mode='record'))
+    # and serve them later without network access
+    fa = Fakturoid('yourslug', 'your@email.com', 'apikey038dc73...',
+                   transport=RecordReplayTransport('recorded', latency=0.05))
+
+Async transport is in fakturoid.aio. requests is imported on first request,
+so that importing package stays fast.
+"""
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+
+__all__ = ['Transport', 'RequestsTransport', 'RecordReplayTransport', 'RecordedResponse']
+
+
+class Transport(object):
+
+    def request(self, method, url, **kwargs):
+        raise NotImplementedError("You must implement request method.")
+
+    def close(self):
+        pass
+
+
+class RequestsTransport(Transport):
+    """Transport using requests session with pooled keep-alive connections."""
+
+    def __init__(self, pool_size=10, keep_alive=True):
+        self.pool_size = pool_size
+        self.keep_alive = keep_alive
+        self._http = None
+        self._http_lock = threading.Lock()
+
+    def _get_http(self):
+        """Returns requests session. Session is created lazily and its
+        connection pool is safe to use from multiple threads.
+        """
+        http = self._http
+        if http is None:
+            with self._http_lock:
+                if self._http is None:
+                    import requests
+                    from requests.adapters import HTTPAdapter
+                    http = requests.Session()
+                    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size)
+                    http.mount('https://', adapter)
+                    http.mount('http://', adapter)
+                    if not self.keep_alive:
+                        http.headers['Connection'] = 'close'
+                    self._http = http
+                http = self._http
+        return http
+
+    def request(self, method, url, **kwargs):
+        return getattr(self._get_http(), method)(url, **kwargs)
+
+    def close(self):
+        """Close pooled connections, new ones are opened on next request."""
+        with self._http_lock:
+            if self._http is not None:
+                self._http.close()
+                self._http = None
+
+
+class RecordedResponse(object):
+
+    def __init__(self, status_code, headers, text):
+        self.status_code = status_code
+        self.headers = dict((name.lower(), value) for name, value in headers.items())
+        self.text = text
+
+    @property
+    def content(self):
+        return self.text.encode('utf-8')
+
+    def json(self):
+        return json.loads(self.text)
+
+    def iter_content(self, chunk_size=1):
+        content = self.content
+        for i in range(0, len(content), chunk_size):
+            yield content[i:i + chunk_size]
+
+    def close(self):
+        pass
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            import requests
+            raise requests.HTTPError('{0} Error'.format(self.status_code), response=self)
+
+
+class RecordReplayTransport(Transport):
+    """Records responses to directory (mode='record') and serves them back
+    (mode='replay'). Every response is delayed by latency seconds in replay.
+    Requests are identified by method, url, params and body, identical
+    requests recorded more times are replayed with last response.
+
+    transport -- transport used for recording, RequestsTransport by default
+    """
+
+    def __init__(self, directory, mode='replay', transport=None, latency=0.0):
+        if mode not in ('record', 'replay'):
+            raise ValueError("mode must be 'record' or 'replay'")
+        self.directory = directory
+        self.mode = mode
+        self.transport = transport
+        self.latency = latency
+        if mode == 'record':
+            if self.transport is None:
+                self.transport = RequestsTransport()
+            if not os.path.isdir(directory):
+                os.makedirs(directory)
+
+    def _path(self, method, url, params, data):
+        key = json.dumps([method, url, sorted((params or {}).items()), data], sort_keys=True, default=str)
+        return os.path.join(self.directory, hashlib.sha1(key.encode('utf-8')).hexdigest() + '.json')
+
+    def request(self, method, url, **kwargs):
+        path = self._path(method, url, kwargs.get('params'), kwargs.get('data'))
+        if self.mode == 'record':
+            return self._record(path, method, url, kwargs)
+        try:
+            with open(path) as f:
+                recorded = json.load(f)
+        except (IOError, OSError):
+            raise LookupError('no recorded response for {0} {1}'.format(method.upper(), url))
+        if self.latency:
+            time.sleep(self.latency)
+        return RecordedResponse(recorded['status_code'], recorded['headers'], recorded['text'])
+
+    def _record(self, path, method, url, kwargs):
+        r = self.transport.request(method, url, **kwargs)
+        data = {
+            'method': method,
+            'url': url,
+            'params': kwargs.get('params'),
+            'status_code': r.status_code,
+            'headers': dict(r.headers),
+            'text': r.text,
+        }
+        fd, tmp = tempfile.mkstemp(dir=self.directory)
+        with os.fdopen(fd, 'w') as f:
+            json.dump(data, f, default=str)
+        os.replace(tmp, path)
+        return r
+
+    def close(self):
+        if self.transport is not None:
+            self.transport.close()
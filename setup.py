@@ -1,12 +1,6 @@
 import os
 from setuptools import setup
 
-# work around to prevent http://bugs.python.org/issue15881 from showing up
-try:
-    import multiprocessing
-except ImportError:
-    pass
-
 # def read(fname):
 #     return open(os.path.join(os.path.dirname(__file__), fname)).read()
 
@@ -33,17 +27,20 @@ setup(
     platforms='any',
     keywords=['fakturoid', 'accounting'],
     packages=['fakturoid'],
+    python_requires='>=3.7',
     install_requires=['requests', 'python-dateutil'],
-    tests_require=['mock'],
+    extras_require={
+        'async': ['httpx'],
+        'export': ['pyarrow'],
+    },
     test_suite="tests",
     classifiers=[
         "Development Status :: 5 - Production/Stable",
         "Intended Audience :: Developers",
         "License :: OSI Approved :: MIT License",
         "Operating System :: OS Independent",
-        "Programming Language :: Python :: 2.6",
-        "Programming Language :: Python :: 2.7",
         "Programming Language :: Python :: 3",
+        "Programming Language :: Python :: 3 :: Only",
         "Topic :: Office/Business :: Financial :: Accounting",
     ],
 )
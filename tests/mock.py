@@ -1,6 +1,8 @@
 import os
 import json
 
+import requests
+
 
 class FakeResponse(object):
     status_code = 200
@@ -10,12 +12,25 @@ class FakeResponse(object):
     def __init__(self, text):
         self.text = text
 
+    @property
+    def content(self):
+        return self.text.encode('utf-8')
+
     def json(self):
         return json.loads(self.text)
 
-    def raise_for_status(self):
+    def iter_content(self, chunk_size=1):
+        content = self.content
+        for i in range(0, len(content), chunk_size):
+            yield content[i:i + chunk_size]
+
+    def close(self):
         pass
 
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.HTTPError('{0} Error'.format(self.status_code), response=self)
+
 
 def response(name):
     content = open(os.path.join(os.path.dirname(__file__), 'responses', name)).read()
@@ -0,0 +1,131 @@
+import asyncio
+import json
+import unittest
+
+try:
+    import httpx
+    from fakturoid.aio import AsyncFakturoid
+except ImportError:
+    httpx = None
+
+from tests.mock import response
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+@unittest.skipIf(httpx is None, 'httpx is not installed')
+class AsyncFakturoidTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.requests = []
+        self.fa = AsyncFakturoid('myslug', '9ACA7', 'Test App')
+
+    def mock(self, handler):
+        def wrapped(request):
+            self.requests.append(request)
+            return handler(request)
+        self.fa.transport._http = httpx.AsyncClient(transport=httpx.MockTransport(wrapped))
+
+    def test_load(self):
+        self.mock(lambda request: httpx.Response(200, text=response('invoice_9.json').text))
+        invoice = run(self.fa.invoice(9))
+
+        self.assertEqual('https://app.fakturoid.cz/api/v2/accounts/myslug/invoices/9.json', str(self.requests[0].url))
+        self.assertEqual('2012-0004', invoice.number)
+        self.assertEqual(2, len(invoice.lines))
+
+    def test_save_unchanged(self):
+        self.mock(lambda request: httpx.Response(200, text=response('invoice_9.json').text))
+
+        async def load_and_save():
+            invoice = await self.fa.invoice(9)
+            await self.fa.save(invoice)
+        run(load_and_save())
+        self.assertEqual(['GET'], [request.method for request in self.requests])
+
+    def test_coalesce(self):
+        self.mock(lambda request: httpx.Response(200, text=response('invoice_9.json').text))
+
+        async def load():
+            return await asyncio.gather(*[self.fa.invoice(9) for i in range(3)])
+        invoices = run(load())
+
+        self.assertEqual(1, len(self.requests))
+        self.assertEqual(['2012-0004'] * 3, [i.number for i in invoices])
+        self.assertEqual(3, len(set(id(i) for i in invoices)))
+
+    def test_coalesce_leader_changes_result(self):
+        self.mock(lambda request: httpx.Response(200, text=response('invoice_9.json').text))
+
+        async def get(leader):
+            result = await self.fa._get('invoices/9.json')
+            if leader:
+                result['json']['number'] = 'changed'  # owner changes result right away
+            return result
+
+        async def load():
+            return await asyncio.gather(get(True), get(False), get(False))
+        results = run(load())
+
+        self.assertEqual(1, len(self.requests))
+        self.assertEqual(['changed', '2012-0004', '2012-0004'], [r['json']['number'] for r in results])
+
+    def test_validation(self):
+        with self.assertRaises(TypeError):
+            self.fa.invoice('9')
+
+    def test_fire(self):
+        self.mock(lambda request: httpx.Response(201))
+        run(self.fa.fire_invoice_event(9, 'pay'))
+
+        request = self.requests[0]
+        self.assertEqual('POST', request.method)
+        self.assertEqual('https://app.fakturoid.cz/api/v2/accounts/myslug/invoices/9/fire.json?event=pay', str(request.url))
+
+    def test_fire_invoice_events(self):
+        def handler(request):
+            if '/2/' in str(request.url):
+                return httpx.Response(422, json={'errors': {'paid_at': ['is invalid']}})
+            return httpx.Response(201)
+        self.mock(handler)
+
+        results = run(self.fa.fire_invoice_events([(1, 'pay'), (2, 'pay')]))
+        self.assertEqual(['ok', 'invalid'], [r.status for r in results])
+        self.assertEqual({'paid_at': ['is invalid']}, results[1].errors)
+
+    def test_iterate_pages(self):
+        def handler(request):
+            page = int(request.url.params['page'])
+            data = [{'id': page * 10 + i, 'number': str(i)} for i in range(2)]
+            return httpx.Response(200, text=json.dumps(data), headers={
+                'Link': '<https://app.fakturoid.cz/api/v2/accounts/myslug/invoices.json?page=3>; rel="last"'
+            })
+        self.mock(handler)
+
+        async def collect():
+            return [invoice.id async for invoice in self.fa.invoices()]
+
+        self.assertEqual([10, 11, 20, 21, 30, 31], run(collect()))
+        self.assertEqual(3, len(self.requests))
+
+    def test_fetch_all(self):
+        self.mock(lambda request: httpx.Response(200, text=response('invoices.json').text))
+        invoices = run(self.fa.invoices().fetch_all())
+        self.assertEqual([9, 10], [i.id for i in invoices])
+
+    def test_local_search(self):
+        self.mock(lambda request: httpx.Response(200, text=response('subjects.json').text))
+
+        async def search():
+            return [await self.fa.subjects.search(query, local=True) for query in ('micro', 'apple')]
+        micro, apple = run(search())
+
+        self.assertEqual(['MICROSOFT s.r.o.'], [s.name for s in micro])
+        self.assertEqual(['Apple Czech s.r.o.'], [s.name for s in apple])
+        self.assertEqual(1, len(self.requests))
+
+
+if __name__ == '__main__':
+    unittest.main()
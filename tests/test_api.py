@@ -1,10 +1,15 @@
-from __future__ import absolute_import
-
+import json
+import shutil
+import tempfile
 import unittest
 from datetime import date
-from mock import patch
+from decimal import Decimal
+from unittest.mock import patch
 
-from fakturoid import Fakturoid
+from fakturoid import Fakturoid, Subject
+from fakturoid.bulk import BulkResult
+from fakturoid.cache import MemoryCache, FileCache
+from fakturoid.compact import CompactSubject
 
 from tests.mock import response, FakeResponse
 
@@ -15,9 +20,100 @@ class FakturoidTestCase(unittest.TestCase):
         self.fa = Fakturoid('myslug', '9ACA7', 'Test App')
 
 
+class SessionTestCase(FakturoidTestCase):
+
+    def test_pooled_session_is_reused(self):
+        http = self.fa.transport._get_http()
+        self.assertIs(http, self.fa.transport._get_http())
+        self.assertEqual(10, http.get_adapter('https://app.fakturoid.cz')._pool_maxsize)
+
+    def test_close(self):
+        with Fakturoid('myslug', '9ACA7', 'Test App', pool_size=2) as fa:
+            http = fa.transport._get_http()
+        self.assertIsNone(fa.transport._http)
+        self.assertIsNot(http, fa.transport._get_http())
+
+    def test_keep_alive_disabled(self):
+        fa = Fakturoid('myslug', '9ACA7', 'Test App', keep_alive=False)
+        self.assertEqual('close', fa.transport._get_http().headers['Connection'])
+
+
+class CacheTestCase(unittest.TestCase):
+
+    def not_modified(self):
+        r = FakeResponse('')
+        r.status_code = 304
+        return r
+
+    def subject_response(self):
+        r = response('subject_28.json')
+        r.headers = {'etag': 'W/"abc"', 'last-modified': 'Sat, 02 Jun 2012 07:34:47 GMT'}
+        return r
+
+    def test_conditional_get(self):
+        fa = Fakturoid('myslug', '9ACA7', 'Test App', cache=MemoryCache())
+        with patch('requests.Session.get', side_effect=[self.subject_response(), self.not_modified()]) as mock:
+            subject = fa.subject(28)
+            subject.name = 'Changed'
+            cached = fa.subject(28)
+        self.assertIsNot(subject, cached)
+        self.assertEqual('MICROSOFT s.r.o.', cached.name)
+        self.assertEqual('2012-06-02T09:34:47+02:00', cached.updated_at.isoformat())
+        self.assertFalse(cached.is_changed())
+
+        self.assertNotIn('If-None-Match', mock.call_args_list[0][1]['headers'])
+        headers = mock.call_args_list[1][1]['headers']
+        self.assertEqual('W/"abc"', headers['If-None-Match'])
+        self.assertEqual('Sat, 02 Jun 2012 07:34:47 GMT', headers['If-Modified-Since'])
+
+    def test_conditional_get_lines(self):
+        r = response('invoice_9.json')
+        r.headers = {'etag': 'W/"abc"'}
+        fa = Fakturoid('myslug', '9ACA7', 'Test App', cache=MemoryCache())
+        with patch('requests.Session.get', side_effect=[r, self.not_modified()]):
+            invoice = fa.invoice(9)
+            invoice.lines[0].name = 'Changed'
+            del invoice.lines[1]
+            cached = fa.invoice(9)
+        self.assertEqual(2, len(cached.lines))
+        self.assertEqual('PC', cached.lines[0].name)
+        self.assertEqual(Decimal('20000'), cached.lines[0].unit_price)
+        self.assertFalse(cached.is_changed())
+
+    def test_conditional_get_list(self):
+        invoices = json.loads(response('invoices.json').text)
+        for invoice in invoices:
+            invoice['tags'] = ['a']
+        r = FakeResponse(json.dumps(invoices))
+        r.headers = {'etag': 'W/"abc"'}
+        fa = Fakturoid('myslug', '9ACA7', 'Test App', cache=MemoryCache())
+        with patch('requests.Session.get', side_effect=[r, self.not_modified()]):
+            invoice = list(fa.invoices())[0]
+            invoice.tags.append('local')
+            cached = list(fa.invoices())[0]
+        self.assertIsNot(invoice, cached)
+        self.assertEqual(['a'], cached.tags)
+        self.assertEqual(['a', 'local'], invoice.tags)
+
+    def test_file_cache(self):
+        directory = tempfile.mkdtemp()
+        try:
+            fa = Fakturoid('myslug', '9ACA7', 'Test App', cache=FileCache(directory))
+            with patch('requests.Session.get', return_value=self.subject_response()):
+                fa.subject(28)
+
+            fa = Fakturoid('myslug', '9ACA7', 'Test App', cache=FileCache(directory))
+            with patch('requests.Session.get', return_value=self.not_modified()) as mock:
+                subject = fa.subject(28)
+            self.assertEqual('W/"abc"', mock.call_args[1]['headers']['If-None-Match'])
+            self.assertEqual('47123737', subject.registration_no)
+        finally:
+            shutil.rmtree(directory)
+
+
 class AccountTestCase(FakturoidTestCase):
 
-    @patch('requests.get', return_value=response('account.json'))
+    @patch('requests.Session.get', return_value=response('account.json'))
     def test_load(self, mock):
         account = self.fa.account()
 
@@ -28,7 +124,7 @@ class AccountTestCase(FakturoidTestCase):
 
 class SubjectTestCase(FakturoidTestCase):
 
-    @patch('requests.get', return_value=response('subject_28.json'))
+    @patch('requests.Session.get', return_value=response('subject_28.json'))
     def test_load(self, mock):
         subject = self.fa.subject(28)
 
@@ -37,7 +133,7 @@ class SubjectTestCase(FakturoidTestCase):
         self.assertEqual('47123737', subject.registration_no)
         self.assertEqual('2012-06-02T09:34:47+02:00', subject.updated_at.isoformat())
 
-    @patch('requests.get', return_value=response('subjects.json'))
+    @patch('requests.Session.get', return_value=response('subjects.json'))
     def test_find(self, mock):
         subjects = self.fa.subjects()
 
@@ -45,17 +141,28 @@ class SubjectTestCase(FakturoidTestCase):
         self.assertEqual(2, len(subjects))
         self.assertEqual('Apple Czech s.r.o.', subjects[0].name)
 
+    @patch('requests.Session.get', return_value=response('subjects.json'))
+    def test_find_compact(self, mock):
+        subjects = self.fa.subjects(compact=True)
+        self.assertIsInstance(subjects[0], CompactSubject)
+        self.assertEqual('Apple Czech s.r.o.', subjects[0].name)
+
+    @patch('requests.Session.delete', return_value=FakeResponse(''))
+    def test_delete_compact(self, mock):
+        self.fa.delete(CompactSubject(id=28))
+        self.assertEqual('https://app.fakturoid.cz/api/v2/accounts/myslug/subjects/28.json', mock.call_args[0][0])
+
 
 class InvoiceTestCase(FakturoidTestCase):
 
-    @patch('requests.get', return_value=response('invoice_9.json'))
+    @patch('requests.Session.get', return_value=response('invoice_9.json'))
     def test_load(self, mock):
         invoice = self.fa.invoice(9)
 
         self.assertEqual('https://app.fakturoid.cz/api/v2/accounts/myslug/invoices/9.json', mock.call_args[0][0])
         self.assertEqual('2012-0004', invoice.number)
 
-    @patch('requests.post', return_value=FakeResponse(''))
+    @patch('requests.Session.post', return_value=FakeResponse(''))
     def test_fire(self, mock):
         self.fa.fire_invoice_event(9, 'pay')
 
@@ -65,7 +172,7 @@ class InvoiceTestCase(FakturoidTestCase):
                                      headers={'User-Agent': 'python-fakturoid (https://github.com/farin/python-fakturoid)', 'Content-Type': 'application/json'},
                                      params={'event': 'pay'})
 
-    @patch('requests.post', return_value=FakeResponse(''))
+    @patch('requests.Session.post', return_value=FakeResponse(''))
     def test_fire_with_args(self, mock):
         self.fa.fire_invoice_event(9, 'pay', paid_at=date(2018, 11, 19))
 
@@ -75,24 +182,86 @@ class InvoiceTestCase(FakturoidTestCase):
                                      headers={'User-Agent': 'python-fakturoid (https://github.com/farin/python-fakturoid)', 'Content-Type': 'application/json'},
                                      params={'event': 'pay', 'paid_at': '2018-11-19'})
 
-    @patch('requests.get', return_value=response('invoices.json'))
+    @patch('requests.Session.get', return_value=response('invoices.json'))
     def test_find(self, mock):
-        self.fa.invoices()[:10]
+        invoices = list(self.fa.invoices()[:10])
 
         self.assertEqual('https://app.fakturoid.cz/api/v2/accounts/myslug/invoices.json', mock.call_args[0][0])
+        self.assertEqual(['2012-0004', '2012-0005'], [i.number for i in invoices])
         # TODO paging test
 
+    @patch('requests.Session.put', return_value=response('invoice_9.json'))
+    @patch('requests.Session.get', return_value=response('invoice_9.json'))
+    def test_save_changed_fields(self, get_mock, put_mock):
+        invoice = self.fa.invoice(9)
+        invoice.note = 'Paid by card'
+        self.fa.save(invoice)
+
+        self.assertEqual('https://app.fakturoid.cz/api/v2/accounts/myslug/invoices/9.json', put_mock.call_args[0][0])
+        self.assertEqual({'note': 'Paid by card'}, json.loads(put_mock.call_args[1]['data']))
+        self.assertFalse(invoice.is_changed())
+
+    @patch('requests.Session.put')
+    @patch('requests.Session.get', return_value=response('invoice_9.json'))
+    def test_save_unchanged(self, get_mock, put_mock):
+        invoice = self.fa.invoice(9)
+        self.fa.save(invoice)
+        self.assertFalse(put_mock.called)
+
+
+class BulkTestCase(FakturoidTestCase):
+
+    def fake_post(self, url, **kwargs):
+        invoice_id = int(url.split('/')[-2])
+        if invoice_id == 2:
+            r = FakeResponse('{"errors": {"paid_at": ["is invalid"]}}')
+            r.status_code = 422
+        elif invoice_id == 3:
+            r = FakeResponse('')
+            r.status_code = 500
+        else:
+            r = FakeResponse('')
+            r.status_code = 201
+        return r
+
+    def test_fire_invoice_events(self):
+        with patch('requests.Session.post', side_effect=self.fake_post) as mock:
+            results = self.fa.fire_invoice_events([
+                (1, 'pay', {'paid_at': date(2018, 11, 19)}),
+                (2, 'pay'),
+                (3, 'cancel'),
+                (4, 'invalid_event'),
+            ])
+
+        self.assertEqual(3, mock.call_count)
+        self.assertEqual([BulkResult.OK, BulkResult.INVALID, BulkResult.FAILED, BulkResult.FAILED],
+                         [r.status for r in results])
+        self.assertEqual({'paid_at': ['is invalid']}, results[1].errors)
+        self.assertEqual(500, results[2].error.response.status_code)
+        self.assertEqual((4, 'invalid_event'), results[3].item)
+        self.assertIsNone(results[3].errors)
+
+    @patch('requests.Session.post', return_value=response('subject_28.json'))
+    def test_save_many(self, mock):
+        mock.return_value.status_code = 201
+        subjects = [Subject(name='MICROSOFT s.r.o.'), Subject(name='Apple')]
+        results = self.fa.save_many(subjects, workers=2)
+
+        self.assertTrue(all(r.ok for r in results))
+        self.assertIs(subjects[0], results[0].value)
+        self.assertEqual(28, subjects[1].id)
+
 
 class GeneratorTestCase(FakturoidTestCase):
 
-    @patch('requests.get', return_value=response('generator_4.json'))
+    @patch('requests.Session.get', return_value=response('generator_4.json'))
     def test_load(self, mock):
         g = self.fa.generator(4)
 
         self.assertEqual('https://app.fakturoid.cz/api/v2/accounts/myslug/generators/4.json', mock.call_args[0][0])
         self.assertEqual('Podpora', g.name)
 
-    @patch('requests.get', return_value=response('generators.json'))
+    @patch('requests.Session.get', return_value=response('generators.json'))
     def test_find(self, mock):
         generators = self.fa.generators()
 
@@ -0,0 +1,46 @@
+import unittest
+
+from fakturoid import Fakturoid
+
+from benchmarks import run
+from benchmarks.server import StubServer
+
+
+class StubServerTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.server = StubServer(invoices=45, lines=3).start()
+        self.fa = Fakturoid('bench', 'bench@example.com', 'key', base_url=self.server.base_url)
+
+    def tearDown(self):
+        self.fa.close()
+        self.server.stop()
+
+    def test_listing(self):
+        invoices = self.fa.invoices()
+        self.assertEqual(45, len(invoices))
+        self.assertEqual(list(range(1, 46)), [i.id for i in invoices])
+        self.assertEqual(3, len(invoices[44].lines))
+        self.assertEqual(3, self.server.requests)
+
+    def test_detail(self):
+        self.assertEqual('2020-00007', self.fa.invoice(7).number)
+
+    def test_run(self):
+        data = run.run(invoices=30, lines=2, repeat=1)
+        self.assertEqual(30, data['results']['list_invoices']['items'])
+        self.assertEqual(30, data['results']['list_subjects']['items'])  # more than one page
+        self.assertIn('peak_bytes', data['results']['memory_stream'])
+        self.assertEqual(150, data['results']['search_short']['subjects'])
+        ratios = run.compare(data, data)
+        self.assertEqual(1.0, ratios['decode_invoice'])
+
+    def test_timed_setup(self):
+        data = []
+        result = run.timed(data.append, 3, setup=lambda: len(data))
+        self.assertEqual([0, 1, 2], data)
+        self.assertEqual(3, result['repeat'])
+
+
+if __name__ == '__main__':
+    unittest.main()
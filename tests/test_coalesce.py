@@ -0,0 +1,133 @@
+import threading
+import time
+import unittest
+from unittest.mock import patch
+
+from fakturoid import Fakturoid
+from fakturoid.coalesce import SingleFlight, Memo
+
+from tests.mock import response, FakeResponse
+
+
+class SingleFlightTestCase(unittest.TestCase):
+
+    def run_threads(self, flight, fn, count=5):
+        results = [None] * count
+
+        def call(i):
+            try:
+                results[i] = flight.do('key', fn)
+            except Exception as e:
+                results[i] = e
+        threads = [threading.Thread(target=call, args=(i,)) for i in range(count)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return results
+
+    def test_shared_call(self):
+        calls = []
+
+        def fn():
+            calls.append(1)
+            time.sleep(0.2)
+            return {'json': {'tags': ['a']}}
+        results = self.run_threads(SingleFlight(), fn)
+
+        self.assertEqual(1, len(calls))
+        self.assertEqual([{'json': {'tags': ['a']}}] * 5, results)
+        self.assertEqual(5, len(set(id(r['json']['tags']) for r in results)))  # every caller has own copy
+
+    def test_leader_changes_result(self):
+        original = {'json': {'tags': ['a']}}
+
+        def fn():
+            time.sleep(0.2)
+            return original
+        flight = SingleFlight()
+        results = []
+
+        def call():
+            result = flight.do('key', fn)
+            if result is original:
+                result['json']['tags'].append('leader')  # owner changes result right away
+            else:
+                results.append(result)
+        threads = [threading.Thread(target=call) for i in range(5)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual([['a']] * 4, [r['json']['tags'] for r in results])
+
+    def test_error(self):
+        def fn():
+            time.sleep(0.2)
+            raise ValueError('invalid')
+        results = self.run_threads(SingleFlight(), fn)
+        self.assertTrue(all(isinstance(r, ValueError) for r in results))
+
+    def test_sequential_calls_are_not_shared(self):
+        flight = SingleFlight()
+        self.assertEqual(1, flight.do('key', lambda: 1))
+        self.assertEqual(2, flight.do('key', lambda: 2))
+
+
+class MemoTestCase(unittest.TestCase):
+
+    def test_ttl(self):
+        now = [0]
+        memo = Memo(10)
+        memo._clock = lambda: now[0]
+        memo.set('subjects/28', {'json': {'id': 28}})
+        self.assertEqual({'json': {'id': 28}}, memo.get('subjects/28'))
+        now[0] = 10
+        self.assertIsNone(memo.get('subjects/28'))
+
+
+class SessionCoalesceTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.fa = Fakturoid('myslug', '9ACA7', 'Test App', memo_ttl=60)
+
+    def test_concurrent_loads(self):
+        def get(*args, **kwargs):
+            time.sleep(0.2)
+            return response('subject_28.json')
+
+        subjects = []
+        with patch('requests.Session.get', side_effect=get) as mock:
+            threads = [threading.Thread(target=lambda: subjects.append(self.fa.subject(28))) for i in range(4)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        self.assertEqual(1, mock.call_count)
+        self.assertEqual(4, len(set(id(s) for s in subjects)))
+
+    @patch('requests.Session.put', return_value=response('subject_28.json'))
+    @patch('requests.Session.get', return_value=response('subject_28.json'))
+    def test_memo_invalidated_on_save(self, get_mock, put_mock):
+        subject = self.fa.subject(28)
+        self.assertIsNot(subject, self.fa.subject(28))
+        self.assertEqual(1, get_mock.call_count)
+
+        subject.name = 'Microsoft'
+        self.fa.save(subject)
+        self.fa.subject(28)
+        self.assertEqual(2, get_mock.call_count)
+
+    @patch('requests.Session.post', return_value=FakeResponse(''))
+    @patch('requests.Session.get', return_value=response('invoice_9.json'))
+    def test_memo_invalidated_on_fire(self, get_mock, post_mock):
+        post_mock.return_value.status_code = 201
+        self.fa.invoice(9)
+        self.fa.fire_invoice_event(9, 'pay')
+        self.fa.invoice(9)
+        self.assertEqual(2, get_mock.call_count)
+
+
+if __name__ == '__main__':
+    unittest.main()
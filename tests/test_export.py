@@ -0,0 +1,117 @@
+import csv
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from datetime import date
+from decimal import Decimal
+
+try:
+    import pyarrow
+except ImportError:
+    pyarrow = None
+
+from fakturoid.api import InvoicesApi
+from fakturoid.paging import ModelList
+
+
+class FakeSession(object):
+    """Returns two pages with copies of invoice 9."""
+
+    def __init__(self):
+        with open(os.path.join(os.path.dirname(__file__), 'responses', 'invoice_9.json')) as f:
+            self.invoice = json.load(f)
+
+    def _get(self, endpoint, params=None):
+        page = params['page']
+        invoices = [dict(self.invoice, id=page * 10 + i) for i in range(2)]
+        return {'json': invoices, 'page_count': 2}
+
+
+class ExportTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.invoices = ModelList(InvoicesApi(FakeSession()), 'invoices')
+        self.tmp = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def test_to_csv(self):
+        path = os.path.join(self.tmp, 'invoices.csv')
+        lines_path = os.path.join(self.tmp, 'lines.csv')
+        self.invoices.to_csv(path, lines_path)
+
+        with open(path) as f:
+            rows = list(csv.DictReader(f))
+        self.assertEqual(['10', '11', '20', '21'], [row['id'] for row in rows])
+        self.assertEqual('48000.0', rows[0]['total'])
+        self.assertEqual('2011-10-20T12:11:37+02:00', rows[0]['paid_at'])
+        self.assertNotIn('lines', rows[0])
+
+        with open(lines_path) as f:
+            lines = list(csv.DictReader(f))
+        self.assertEqual(8, len(lines))
+        self.assertEqual(('10', 'PC'), (lines[0]['invoice_id'], lines[0]['name']))
+
+    @unittest.skipIf(pyarrow is None, 'pyarrow is not installed')
+    def test_to_table(self):
+        records, lines = self.invoices.to_table()
+
+        self.assertEqual(4, records.num_rows)
+        self.assertEqual(pyarrow.decimal128(20, 6), records.schema.field('total').type)
+        self.assertEqual(Decimal('48000'), records.column('total')[0].as_py())
+        self.assertEqual(date(2011, 10, 13), records.column('issued_on')[0].as_py())
+        self.assertEqual(pyarrow.timestamp('us', tz='UTC'), records.schema.field('paid_at').type)
+        self.assertEqual(8, lines.num_rows)
+        self.assertEqual([10, 10, 11, 11, 20, 20, 21, 21], lines.column('invoice_id').to_pylist())
+
+    @unittest.skipIf(pyarrow is None, 'pyarrow is not installed')
+    def test_to_table_values(self):
+        session = self.invoices.model_api.session
+        session.invoice.update(exchange_rate='25.12345678', taxable_fulfillment_due='')
+        records, lines = self.invoices.to_table()
+        self.assertEqual(Decimal('25.123457'), records.column('exchange_rate')[0].as_py())
+        self.assertIsNone(records.column('taxable_fulfillment_due')[0].as_py())
+
+    @unittest.skipIf(pyarrow is None, 'pyarrow is not installed')
+    def test_to_parquet(self):
+        import pyarrow.parquet as pq
+        path = os.path.join(self.tmp, 'invoices.parquet')
+        self.invoices.to_parquet(path)
+        self.assertEqual(4, pq.read_table(path).num_rows)
+
+    @unittest.skipIf(pyarrow is None, 'pyarrow is not installed')
+    def test_to_parquet_pages(self):
+        import pyarrow.parquet as pq
+        session = self.invoices.model_api.session
+        get = session._get
+
+        def _get(endpoint, params=None):
+            response = get(endpoint, params)
+            for invoice in response['json']:
+                if params['page'] == 1:
+                    invoice['note'] = None
+                else:
+                    invoice['note'] = 'page 2'
+                    invoice['extra_field'] = 1
+                    del invoice['total']
+            return response
+        session._get = _get
+
+        path = os.path.join(self.tmp, 'invoices.parquet')
+        lines_path = os.path.join(self.tmp, 'lines.parquet')
+        self.invoices.to_parquet(path, lines_path)
+
+        parquet = pq.ParquetFile(path)
+        self.assertEqual(2, parquet.num_row_groups)  # one per page
+        records = parquet.read()
+        self.assertEqual([None, None, 'page 2', 'page 2'], records.column('note').to_pylist())
+        self.assertEqual([Decimal('48000')] * 2 + [None] * 2, records.column('total').to_pylist())
+        self.assertNotIn('extra_field', records.column_names)
+        self.assertEqual(8, pq.read_table(lines_path).num_rows)
+
+
+if __name__ == '__main__':
+    unittest.main()
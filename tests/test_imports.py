@@ -0,0 +1,41 @@
+import os
+import subprocess
+import sys
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+HEAVY_MODULES = ('requests', 'urllib3', 'dateutil', 'asyncio', 'sqlite3', 'orjson', 'ujson',
+                 'concurrent.futures', 'logging')
+
+
+def run_python(code):
+    return subprocess.check_output([sys.executable, '-c', code], cwd=ROOT).decode('utf-8').split()
+
+
+class LazyImportTestCase(unittest.TestCase):
+
+    def test_import_is_light(self):
+        loaded = run_python('import sys, fakturoid; print(" ".join(m for m in {0!r} if m in sys.modules))'
+                            .format(HEAVY_MODULES))
+        self.assertEqual([], loaded)
+
+    def test_offline_models(self):
+        loaded = run_python(
+            'import sys\n'
+            'from fakturoid import Invoice, InvoiceLine\n'
+            'invoice = Invoice(issued_on="2020-01-31", lines=[InvoiceLine(name="Work", unit_price=10)])\n'
+            'invoice.get_fields()\n'
+            'print(" ".join(m for m in ("requests", "dateutil") if m in sys.modules))')
+        self.assertEqual([], loaded)
+
+    def test_http_stack_loaded_on_first_use(self):
+        loaded = run_python('import sys, fakturoid\n'
+                            'fa = fakturoid.Fakturoid("slug", "email", "key")\n'
+                            'fa.transport._get_http()\n'
+                            'print("requests" in sys.modules)')
+        self.assertEqual(['True'], loaded)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,66 @@
+import unittest
+
+from fakturoid.index import Index
+from fakturoid.models import Invoice
+from fakturoid.paging import ModelList
+
+from tests.test_paging import FakeSession, FakeModelApi
+
+
+class InvoiceModelApi(FakeModelApi):
+
+    def unpack(self, response, lazy=False, compact=False):
+        return [Invoice(id=i, number='2020-{0:04d}'.format(i), variable_symbol=str(i % 5))
+                for i in response['json']]
+
+
+class IndexTestCase(unittest.TestCase):
+
+    def test_lookup(self):
+        index = Index('variable_symbol', [Invoice(id=1, variable_symbol='11'), Invoice(id=2, variable_symbol='11'),
+                                          Invoice(id=3, variable_symbol=None)])
+        self.assertEqual([1, 2], [i.id for i in index['11']])
+        self.assertEqual(1, index.first('11').id)
+        self.assertEqual((), index.get('12'))
+        self.assertNotIn(None, index)
+        with self.assertRaises(KeyError):
+            index['12']
+
+    def test_replace_by_id(self):
+        index = Index('variable_symbol', [Invoice(id=1, variable_symbol='11')])
+        index.add([Invoice(id=1, variable_symbol='12')])
+        self.assertNotIn('11', index)
+        self.assertEqual([1], [i.id for i in index['12']])
+
+    def test_key(self):
+        index = Index('email', [Invoice(id=1, email='Info@Example.com')], key=str.lower)
+        self.assertEqual([1], [i.id for i in index.get('INFO@example.com')])
+        self.assertIn('info@example.com', index)
+
+
+class ModelListIndexTestCase(unittest.TestCase):
+
+    def test_index(self):
+        session = FakeSession(4)
+        ml = ModelList(InvoiceModelApi(session), 'invoices', prefetch=2)
+        ml.page_size = 3
+        index = ml.index('variable_symbol')
+        self.assertEqual([2, 7], [i.id for i in index['2']])
+        self.assertEqual(11, ml.index('number')['2020-0011'][0].id)
+        self.assertEqual([1, 2, 3, 4], sorted(session.calls))
+
+    def test_updated_on_page_load(self):
+        session = FakeSession(4)
+        ml = ModelList(InvoiceModelApi(session), 'invoices', cache_pages=1)
+        ml.page_size = 3
+        ml[0]
+        index = ml.index('variable_symbol', load=False)
+        self.assertEqual([0], [i.id for i in index['0']])
+        ml[5]
+        self.assertEqual([0, 5], [i.id for i in index['0']])
+        ml[0]  # evicted page loaded again replaces old models
+        self.assertEqual([0, 5], sorted(i.id for i in index['0']))
+
+
+if __name__ == '__main__':
+    unittest.main()
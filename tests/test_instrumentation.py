@@ -0,0 +1,71 @@
+import logging
+import unittest
+from unittest.mock import patch
+
+from fakturoid import Fakturoid
+from fakturoid.instrumentation import Callbacks, Histogram, LoggingInstrument, MetricsCollector, endpoint_name
+
+from tests.mock import response, FakeResponse
+
+
+class HistogramTestCase(unittest.TestCase):
+
+    def test_observe(self):
+        histogram = Histogram(buckets=(0.1, 1.0))
+        for value in (0.05, 0.1, 0.5, 2.0):
+            histogram.observe(value)
+        self.assertEqual([(0.1, 2), (1.0, 3), (float('inf'), 4)], histogram.cumulative())
+        self.assertEqual(0.1, histogram.quantile(0.5))
+        self.assertEqual(2.0, histogram.quantile(1.0))
+
+    def test_endpoint_name(self):
+        self.assertEqual('invoices/:id/fire', endpoint_name('invoices/9/fire'))
+        self.assertEqual('invoices/regular', endpoint_name('invoices/regular'))
+
+
+class InstrumentationTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.metrics = MetricsCollector()
+        self.fa = Fakturoid('myslug', '9ACA7', 'Test App', instruments=[self.metrics])
+
+    def test_callbacks(self):
+        calls = []
+        self.fa.add_instrument(Callbacks(before_request=lambda request: calls.append(('before', request.name)),
+                                         after_request=lambda request, r: calls.append(('after', request.status_code))))
+        with patch('requests.Session.get', return_value=response('invoice_9.json')):
+            self.fa.invoice(9)
+        self.assertEqual([('before', 'invoices/:id'), ('after', 200)], calls)
+
+    def test_metrics(self):
+        limited = FakeResponse('')
+        limited.status_code = 429
+        limited.headers = {'retry-after': '0'}
+        with patch('requests.Session.get', side_effect=[limited, response('invoices.json')]):
+            list(self.fa.invoices())
+
+        data = self.metrics.snapshot()
+        [stats] = data['requests']
+        self.assertEqual(('GET', 'invoices', 2, 1), (stats['method'], stats['endpoint'], stats['count'], stats['retries']))
+        self.assertEqual({200: 1, 429: 1}, stats['statuses'])
+        self.assertEqual(len(response('invoices.json').content), stats['bytes'])
+        self.assertEqual(1, stats['decode_count'])
+        self.assertEqual([('invoices', 'Invoice', 2)], [(m['endpoint'], m['model'], m['count']) for m in data['models']])
+
+        text = self.metrics.to_prometheus()
+        self.assertIn('fakturoid_responses_total{method="GET",endpoint="invoices",status="429"} 1', text)
+        self.assertIn('fakturoid_request_duration_seconds_count{method="GET",endpoint="invoices"} 2', text)
+        self.assertIn('fakturoid_models_total{endpoint="invoices",model="Invoice"} 2', text)
+
+    def test_logging(self):
+        self.fa.add_instrument(LoggingInstrument(level=logging.INFO))
+        with patch('requests.Session.get', return_value=response('invoice_9.json')):
+            with self.assertLogs('fakturoid', logging.INFO) as logs:
+                self.fa.invoice(9)
+                self.metrics.log()
+        self.assertIn('GET invoices/9 200', logs.output[0])
+        self.assertIn('GET invoices/:id: 1 requests (200:1)', logs.output[1])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,48 @@
+import json
+import unittest
+from unittest.mock import patch
+
+from fakturoid import Fakturoid
+from fakturoid.jsonstream import iter_array
+
+from tests.mock import response
+
+
+def chunked(data, size):
+    data = data.encode('utf-8')
+    return [data[i:i + size] for i in range(0, len(data), size)]
+
+
+class IterArrayTestCase(unittest.TestCase):
+
+    def test_items(self):
+        items = [{'name': 'Čaj "zelený"', 'lines': [{'id': 1}, {'id': 2}]}, {'name': '[,]{}'}, []]
+        data = ' [ ' + ' , '.join(json.dumps(item, ensure_ascii=False) for item in items) + ' ] '
+        for size in (1, 2, 7, 1000):
+            self.assertEqual(items, list(iter_array(chunked(data, size))))
+
+    def test_empty(self):
+        self.assertEqual([], list(iter_array([b'[', b' ]'])))
+
+    def test_invalid(self):
+        with self.assertRaises(ValueError):
+            list(iter_array([b'{"id": 1}']))
+        with self.assertRaises(ValueError):
+            list(iter_array([b'[{"id": 1}, {"id"']))
+        with self.assertRaises(ValueError):
+            list(iter_array([b'[{"id": 1} {"id": 2}]']))
+
+
+class StreamTestCase(unittest.TestCase):
+
+    @patch('requests.Session.get', return_value=response('invoices.json'))
+    def test_incremental_stream(self, mock):
+        fa = Fakturoid('myslug', '9ACA7', 'Test App')
+        invoices = fa.invoices().stream(incremental=True)
+        self.assertEqual(['2012-0004', '2012-0005'], [i.number for i in invoices])
+        self.assertTrue(mock.call_args[1]['stream'])
+        self.assertEqual({'page': 1}, mock.call_args[1]['params'])
+
+
+if __name__ == '__main__':
+    unittest.main()
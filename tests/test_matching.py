@@ -0,0 +1,89 @@
+import os
+import shutil
+import tempfile
+import unittest
+from datetime import date
+from decimal import Decimal
+
+from fakturoid.matching import Matcher, Payment, read_payments_csv, parse_amount
+from fakturoid.models import Invoice
+
+
+class MatcherTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.matcher = Matcher([
+            Invoice(id=1, variable_symbol='20200001', subject_id=10, remaining_amount='1000.0'),
+            Invoice(id=2, variable_symbol='20200002', subject_id=10, remaining_amount='500.0'),
+            Invoice(id=3, variable_symbol='555', subject_id=11, remaining_amount='200.0'),
+            Invoice(id=4, variable_symbol='555', subject_id=12, remaining_amount='300.0'),
+        ])
+
+    def test_match(self):
+        result = self.matcher.match([
+            Payment('20200001', '1000', date(2020, 1, 5)),
+            Payment('20200002', '200'),
+            Payment('555', '300'),  # same symbol, amount decides
+            Payment('555', '250'),
+            Payment(None, '300', subject_id=10),  # remains after partial payment
+            Payment(None, '200'),
+            Payment('999', '1'),
+        ])
+
+        self.assertEqual([(1, '1000'), (4, '300'), (2, '300')],
+                         [(m.invoice.id, str(m.payment.amount)) for m in result.exact])
+        self.assertEqual([2], [m.invoice.id for m in result.partial])
+        self.assertEqual([[3, 4], [3]], [[i.id for i in m.candidates] for m in result.ambiguous])
+        self.assertEqual([Decimal(1)], [m.payment.amount for m in result.unmatched])
+
+    def test_variable_symbol_zeros(self):
+        matcher = Matcher([Invoice(id=1, variable_symbol='00555', remaining_amount='200.0'),
+                           Invoice(id=2, variable_symbol=20200001, remaining_amount='100.0')])
+        result = matcher.match([Payment('0000000555', '200'), Payment('0020200001', '100')])
+        self.assertEqual([1, 2], [m.invoice.id for m in result.exact])
+        self.assertEqual('555', Payment(555, '1').variable_symbol)
+        self.assertIsNone(Payment('000', '1').variable_symbol)
+
+    def test_float_amount(self):
+        self.assertEqual(Decimal('100.1'), Payment('1', 100.1).amount)
+        matcher = Matcher([Invoice(id=1, variable_symbol='1', remaining_amount='100.10')])
+        self.assertEqual(1, len(matcher.match([Payment('1', 100.1)]).exact))
+
+    def test_overpayment(self):
+        result = self.matcher.match([Payment('20200002', '400'), Payment('20200002', '400')])
+        self.assertEqual(1, len(result.partial))
+        self.assertEqual(1, len(result.ambiguous))  # only 100 remains after first payment
+
+    def test_pay_events(self):
+        result = self.matcher.match([Payment('20200001', '1000', date(2020, 1, 5)), Payment('20200002', '200')])
+        self.assertEqual([
+            (1, 'pay', {'paid_amount': Decimal(1000), 'paid_at': date(2020, 1, 5)}),
+            (2, 'pay', {'paid_amount': Decimal(200)}),
+        ], result.pay_events())
+
+
+class ReadPaymentsTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def test_read_csv(self):
+        path = os.path.join(self.tmp, 'statement.csv')
+        with open(path, 'w') as f:
+            f.write('vs;amount;date\n20200001;1 000,50;2020-01-05\n;20;\n')
+        payments = list(read_payments_csv(path, variable_symbol='vs', paid_on='date', delimiter=';'))
+        self.assertEqual([Payment('20200001', '1000.50', date(2020, 1, 5)), Payment(None, '20')], payments)
+
+    def test_parse_amount(self):
+        self.assertEqual(Decimal('1234.56'), parse_amount('1.234,56'))
+        self.assertEqual(Decimal('1234.56'), parse_amount('1,234.56'))
+        self.assertEqual(Decimal('1234567.5'), parse_amount('1\xa0234\xa0567,5'))
+        self.assertEqual(Decimal('-20'), parse_amount('-20'))
+        self.assertEqual(Decimal('1234'), parse_amount('1.234', decimal_separator=','))
+
+
+if __name__ == '__main__':
+    unittest.main()
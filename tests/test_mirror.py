@@ -0,0 +1,78 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from fakturoid import Fakturoid
+
+
+class FakeServer(object):
+
+    def __init__(self):
+        self.data = {
+            'subjects': [{'id': 1, 'name': 'Apple', 'custom_id': 'A1', 'updated_at': '2012-06-01T10:00:00+02:00'}],
+            'invoices': [
+                {'id': 9, 'number': '2012-0004', 'subject_id': 1, 'status': 'paid', 'total': '48000.0',
+                 'variable_symbol': '20120004', 'updated_at': '2012-05-13T12:11:37+02:00', 'lines': []},
+                {'id': 10, 'number': '2012-0005', 'subject_id': 1, 'status': 'open', 'total': '1000.0',
+                 'variable_symbol': '20120005', 'updated_at': '2012-05-14T12:11:37+02:00', 'lines': []},
+            ],
+            'expenses': [],
+            'generators': [],
+        }
+        self.calls = []
+
+    def get(self, endpoint, params=None):
+        self.calls.append((endpoint, dict(params)))
+        records = self.data[endpoint]
+        since = params.get('updated_since')
+        if since:
+            records = [r for r in records if r['updated_at'] >= since]
+        return {'json': records if params['page'] == 1 else []}
+
+
+class MirrorTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.server = FakeServer()
+        self.fa = Fakturoid('myslug', '9ACA7', 'Test App')
+        self.fa._get = self.server.get
+        self.mirror = self.fa.mirror(os.path.join(self.tmp, 'mirror.sqlite'))
+
+    def tearDown(self):
+        self.mirror.close()
+        shutil.rmtree(self.tmp)
+
+    def test_sync(self):
+        self.assertEqual({'subjects': 1, 'invoices': 2, 'expenses': 0, 'generators': 0}, self.mirror.sync())
+        self.assertEqual('2012-05-14T12:11:37+02:00', self.mirror.updated_since('invoices'))
+        self.assertIsNone(self.mirror.updated_since('expenses'))
+
+        self.server.data['invoices'][0].update(status='open', updated_at='2012-05-15T08:00:00+02:00')
+        self.assertEqual(2, self.mirror.sync_collection('invoices'))
+        self.assertEqual({'updated_since': '2012-05-14T12:11:37+02:00', 'page': 1}, self.server.calls[-1][1])
+        self.assertEqual(['2012-0005', '2012-0004'], [i.number for i in self.mirror.invoices(status='open')])
+
+    def test_queries(self):
+        self.mirror.sync()
+        invoice = self.mirror.invoices(number='2012-0004')[0]
+        self.assertEqual(9, invoice.id)
+        self.assertEqual(48000, invoice.total)
+        self.assertEqual(['2012-0004'], [i.number for i in self.mirror.invoices(subject_id=1, status='paid')])
+        self.assertEqual(['2012-0005'], [i.number for i in self.mirror.invoices(variable_symbol='20120005')])
+        self.assertEqual('Apple', self.mirror.subjects(custom_id='A1')[0].name)
+        self.assertEqual('2012-0005', self.mirror.get('invoices', 10).number)
+        self.assertIsNone(self.mirror.get('invoices', 11))
+        with self.assertRaises(TypeError):
+            self.mirror.find('invoices', total=1)
+
+    def test_full_sync_removes_deleted(self):
+        self.mirror.sync()
+        del self.server.data['invoices'][1]
+        self.mirror.sync(['invoices'], full=True)
+        self.assertEqual([9], [i.id for i in self.mirror.invoices()])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,253 @@
+import copy
+import json
+import os
+import unittest
+from datetime import date, datetime
+from decimal import Decimal
+
+from fakturoid.compact import CompactInvoice, CompactInvoiceLine, CompactSubject
+from fakturoid.models import Invoice, InvoiceLine, parse_date, parse_datetime
+
+
+class ConvertersTestCase(unittest.TestCase):
+
+    def test_parse_datetime(self):
+        self.assertEqual('2012-05-13T12:11:37+02:00', parse_datetime('2012-05-13T12:11:37+02:00').isoformat())
+        # not ISO 8601, handled by dateutil
+        self.assertEqual(datetime(2012, 5, 13, 12, 11), parse_datetime('May 13 2012 12:11'))
+
+    def test_parse_date(self):
+        self.assertEqual(date(2011, 10, 13), parse_date('2011-10-13'))
+        self.assertEqual(date(2011, 10, 13), parse_date('2011-10-13T10:00:00+02:00'))
+
+    def test_field_converter(self):
+        self.assertIs(parse_datetime, Invoice.field_converter('paid_at'))
+        self.assertIs(parse_date, Invoice.field_converter('taxable_fulfillment_due'))
+        self.assertIs(Decimal, Invoice.field_converter('total'))
+        self.assertIsNone(Invoice.field_converter('number'))
+        self.assertIsNone(InvoiceLine.field_converter('total'))
+
+
+class ModelTestCase(unittest.TestCase):
+
+    def test_update(self):
+        invoice = Invoice(number='2012-0004', total='48000.0', issued_on='2011-10-13',
+                          paid_at='2011-10-20T12:11:37+02:00', sent_at=None)
+        self.assertEqual('2012-0004', invoice.number)
+        self.assertEqual(Decimal('48000.0'), invoice.total)
+        self.assertEqual(date(2011, 10, 13), invoice.issued_on)
+        self.assertEqual('2011-10-20T12:11:37+02:00', invoice.paid_at.isoformat())
+        self.assertIsNone(invoice.sent_at)
+
+
+class LazyModelTestCase(unittest.TestCase):
+
+    def setUp(self):
+        with open(os.path.join(os.path.dirname(__file__), 'responses', 'invoice_9.json')) as f:
+            self.raw = json.load(f)
+
+    def test_lazy_fields(self):
+        invoice = Invoice.lazy(self.raw)
+        self.assertEqual('2012-0004', invoice.number)
+        self.assertNotIn('total', invoice.__dict__)
+        self.assertNotIn('lines', invoice.__dict__)
+
+        self.assertEqual(Decimal('48000.0'), invoice.total)
+        self.assertEqual(date(2011, 10, 13), invoice.issued_on)
+        self.assertEqual(['PC', 'Notebook'], [line.name for line in invoice.lines])
+        self.assertEqual(Decimal('20000.0'), invoice.lines[0].unit_price)
+
+    def test_get_fields(self):
+        self.assertEqual(Invoice(**self.raw).get_fields(), Invoice.lazy(self.raw).get_fields())
+
+    def test_update(self):
+        invoice = Invoice.lazy(self.raw)
+        invoice.update({'total': '100.0', 'lines': []})
+        self.assertEqual(Decimal('100.0'), invoice.total)
+        self.assertEqual([], invoice.lines)
+        self.assertEqual(Decimal('40000.0'), invoice.subtotal)
+
+    def test_missing_attribute(self):
+        with self.assertRaises(AttributeError):
+            Invoice.lazy(self.raw).unknown_field
+
+    def test_copy(self):
+        for invoice in [Invoice.lazy(self.raw), CompactInvoice.lazy(self.raw)]:
+            clone = copy.copy(invoice)
+            self.assertEqual(2, len(clone.lines))
+            self.assertEqual(Decimal('48000.0'), clone.total)
+            self.assertEqual(['PC', 'Notebook'], [line.name for line in invoice.lines])
+            self.assertEqual(Decimal('48000.0'), invoice.total)
+            self.assertIsNot(invoice.lines, clone.lines)
+
+
+class CompactModelTestCase(unittest.TestCase):
+
+    def setUp(self):
+        with open(os.path.join(os.path.dirname(__file__), 'responses', 'invoice_9.json')) as f:
+            self.raw = json.load(f)
+
+    def test_attributes(self):
+        invoice = CompactInvoice(**dict(self.raw, unknown_field='x'))
+        self.assertIsInstance(invoice, Invoice)
+        self.assertEqual('2012-0004', invoice.number)
+        self.assertEqual(Decimal('48000.0'), invoice.total)
+        self.assertEqual('x', invoice.unknown_field)
+        self.assertEqual({'unknown_field': 'x'}, invoice.__dict__)
+        self.assertIsInstance(invoice.lines[0], CompactInvoiceLine)
+        self.assertEqual('PC', str(invoice.lines[0]))
+
+    def test_state_in_slots(self):
+        invoice = CompactInvoice.lazy(dict(self.raw))
+        invoice.mark_clean()
+        invoice.number = '2012-0100'
+        self.assertIsNone(invoice._extra)  # instance dict is not used
+        self.assertEqual({'number'}, invoice.changed_fields())
+        invoice.unknown_field = 'x'
+        self.assertTrue(invoice._extra)
+        self.assertEqual('x', invoice.get_fields()['unknown_field'])
+
+    def test_defaults(self):
+        subject = CompactSubject()
+        self.assertIsNone(subject.id)
+        self.assertIsNone(subject.name)
+        self.assertEqual([], CompactInvoice().lines)
+        with self.assertRaises(AttributeError):
+            subject.street
+
+    def test_get_fields(self):
+        raw = dict(self.raw, unknown_field='x')
+        self.assertEqual(Invoice(**dict(raw)).get_fields(), CompactInvoice(**dict(raw)).get_fields())
+
+    def test_lazy(self):
+        invoice = CompactInvoice.lazy(self.raw)
+        self.assertEqual(Decimal('48000.0'), invoice.total)
+        self.assertEqual(2, len(invoice.lines))
+        self.assertEqual(Invoice(**self.raw).get_fields(), invoice.get_fields())
+
+
+class ChangeTrackingTestCase(unittest.TestCase):
+
+    def setUp(self):
+        with open(os.path.join(os.path.dirname(__file__), 'responses', 'invoice_9.json')) as f:
+            self.raw = json.load(f)
+        for id, line in zip([1304, 1305], self.raw['lines']):
+            line['id'] = id
+
+    def loaded(self, model_type=Invoice, lazy=False):
+        invoice = model_type.lazy(dict(self.raw)) if lazy else model_type(**dict(self.raw))
+        invoice.mark_clean()
+        return invoice
+
+    def test_untracked(self):
+        invoice = Invoice(**self.raw)
+        self.assertEqual(invoice.get_fields(), invoice.get_changed_fields())
+
+    def test_changed_fields(self):
+        for invoice in [self.loaded(), self.loaded(lazy=True), self.loaded(CompactInvoice)]:
+            self.assertEqual({}, invoice.get_changed_fields())
+            invoice.note = 'Paid'
+            invoice.issued_on = date(2011, 10, 14)
+            self.assertEqual({'note': 'Paid', 'issued_on': '2011-10-14'}, invoice.get_changed_fields())
+            invoice.mark_clean()
+            self.assertEqual({}, invoice.get_changed_fields())
+
+    def test_update(self):
+        invoice = self.loaded()
+        invoice.update({'note': 'Paid', 'total': '100.0'})
+        self.assertEqual({'note': 'Paid'}, invoice.get_changed_fields())  # total is readonly
+
+    def test_changed_in_place(self):
+        invoice = self.loaded()
+        invoice.tags = ['a']
+        invoice.mark_clean()
+        invoice.tags.append('b')
+        self.assertEqual({'tags': ['a', 'b']}, invoice.get_changed_fields())
+
+    def test_tracking_state_created_lazily(self):
+        for invoice in [self.loaded(), self.loaded(CompactInvoice)]:
+            invoice.tags = ['a']
+            invoice.mark_clean()
+            self.assertIs(invoice._changed, invoice.lines[0]._changed)  # shared until first change
+            self.assertIsNone(invoice.lines[0]._snapshot)  # no list values
+            self.assertEqual({'tags': ['a']}, invoice._snapshot)
+            self.assertFalse(invoice.is_changed())
+            invoice.note = 'Paid'
+            self.assertEqual({'note'}, invoice.changed_fields())
+            self.assertFalse(invoice.lines[0].changed_fields())
+
+    def test_copy(self):
+        self.assertIn('lines', vars(self.loaded()))
+        for invoice in [self.loaded(), self.loaded(CompactInvoice)]:
+            invoice.tags = ['a']
+            invoice.mark_clean()
+            clone = copy.copy(invoice)
+            clone.note = 'Paid'
+            clone.tags = clone.tags + ['b']
+            self.assertEqual({'note', 'tags'}, clone.changed_fields())
+            self.assertEqual(set(), invoice.changed_fields())
+            self.assertEqual(['a'], invoice.tags)
+            deep = copy.deepcopy(invoice)
+            deep.tags.append('c')
+            self.assertEqual({'tags'}, deep.changed_fields())
+            deep.note = 'Paid'
+            self.assertEqual({'note', 'tags'}, deep.changed_fields())
+            self.assertFalse(invoice.is_changed())
+
+    def test_changed_lines(self):
+        for invoice in [self.loaded(), self.loaded(lazy=True)]:
+            self.assertFalse(invoice.is_changed())
+            invoice.lines[0].quantity = Decimal(2)
+            self.assertEqual({'lines': [{'id': 1304, 'quantity': '2'}]}, invoice.get_changed_fields())
+
+    def test_removed_lines(self):
+        for invoice in [self.loaded(), self.loaded(lazy=True), self.loaded(CompactInvoice)]:
+            invoice.lines = invoice.lines[:1]
+            self.assertEqual([{'id': 1305, '_destroy': True}], invoice.get_changed_fields()['lines'])
+
+    def test_loaded_lines_fields(self):
+        for invoice in [self.loaded(), self.loaded(lazy=True), self.loaded(CompactInvoice)]:
+            invoice.lines[0].quantity = Decimal(2)
+            lines = invoice.get_fields()['lines']
+            self.assertEqual([1304, 1305], [line['id'] for line in lines])
+            self.assertEqual(('PC', '2'), (lines[0]['name'], lines[0]['quantity']))
+            del invoice.lines[0]
+            lines = invoice.get_fields()['lines']
+            self.assertEqual(('Notebook', 1305), (lines[0]['name'], lines[0]['id']))
+            self.assertEqual({'id': 1304, '_destroy': True}, lines[1])
+            clone = Invoice(**self.loaded().get_fields())
+            self.assertEqual(['PC', 'Notebook'], [line.name for line in clone.lines])
+
+    def test_reordered_lines(self):
+        invoice = self.loaded()
+        invoice.lines.reverse()
+        self.assertFalse(invoice.is_changed())
+        invoice.lines = invoice.lines[::-1]
+        self.assertEqual({}, invoice.get_changed_fields())
+
+    def test_added_line(self):
+        invoice = self.loaded()
+        invoice.lines.append(InvoiceLine(name='Mouse', unit_price=Decimal(200)))
+        self.assertEqual([{'name': 'Mouse', 'quantity': '1', 'unit_price': '200'}], invoice.get_changed_fields()['lines'])
+
+    def test_untracked_lines(self):
+        invoice = Invoice(**self.raw)
+        del invoice.lines[0]
+        lines = invoice.get_fields()['lines']
+        self.assertEqual([1305, 1304], [line['id'] for line in lines])
+        self.assertEqual({'id': 1304, '_destroy': True}, lines[1])
+
+    def test_many_lines(self):
+        raw = dict(self.raw, lines=[dict(self.raw['lines'][0], id=id) for id in range(1, 601)])
+        invoice = Invoice(**raw)
+        invoice.mark_clean()
+        invoice.lines[10].name = 'Monitor'
+        del invoice.lines[100:]
+        lines = invoice.get_changed_fields()['lines']
+        self.assertEqual({'id': 11, 'name': 'Monitor'}, lines[0])
+        self.assertEqual(list(range(101, 601)), [line['id'] for line in lines[1:]])
+        self.assertTrue(all(line['_destroy'] for line in lines[1:]))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,9 +1,29 @@
-from __future__ import absolute_import
-
 import unittest
-from mock import patch
+from unittest.mock import patch
+
+from fakturoid.paging import PagedResource, ModelList
+
+
+class FakeSession(object):
+
+    def __init__(self, page_count, page_size=3):
+        self.page_count = page_count
+        self.page_size = page_size
+        self.calls = []
+
+    def _get(self, endpoint, params=None):
+        self.calls.append(params['page'])
+        start = (params['page'] - 1) * self.page_size
+        return {'json': list(range(start, start + self.page_size)), 'page_count': self.page_count}
+
+
+class FakeModelApi(object):
+
+    def __init__(self, session):
+        self.session = session
 
-from fakturoid.paging import PagedResource
+    def unpack(self, response, lazy=False, compact=False):
+        return response['json']
 
 
 class PageResourceTestCase(unittest.TestCase):
@@ -36,6 +56,15 @@ class PageResourceTestCase(unittest.TestCase):
         self.assertEqual('abcdefghijk', ''.join(self.pg[:]))
         self.assertEqual('efghijk', ''.join(self.pg[-7:]))
         self.assertEqual('ceg', ''.join(self.pg[2:8:2]))
+        self.assertEqual('kjihgfedcba', ''.join(self.pg[::-1]))
+        self.assertEqual('hfd', ''.join(self.pg[7:1:-2]))
+        self.assertEqual('', ''.join(self.pg[20:30]))
+        with self.assertRaises(ValueError):
+            self.pg[::0]
+
+    def test_approx_len(self):
+        del self.pg.pages[2]
+        self.assertEqual(15, self.pg.approx_len())
 
     @patch.object(PagedResource, 'load_page', return_value=['x', 'y', 'z'])
     def test_loadpage(self, load_page):
@@ -43,3 +72,55 @@ class PageResourceTestCase(unittest.TestCase):
         unloaded.page_size = 5
         self.assertEqual('z', unloaded[2])
         load_page.assert_called_once_with(0)
+
+
+class ModelListTestCase(unittest.TestCase):
+
+    def test_iterate(self):
+        session = FakeSession(4)
+        ml = ModelList(FakeModelApi(session), 'invoices')
+        ml.page_size = 3
+        self.assertEqual(list(range(12)), [i for i in ml])
+        self.assertEqual([1, 2, 3, 4], session.calls)
+
+    def test_iterate_prefetch(self):
+        session = FakeSession(10)
+        ml = ModelList(FakeModelApi(session), 'invoices', prefetch=3)
+        ml.page_size = 3
+        self.assertEqual(list(range(30)), [i for i in ml])
+        self.assertEqual(list(range(1, 11)), sorted(session.calls))
+
+    def test_prefetch_stops_early(self):
+        session = FakeSession(10)
+        ml = ModelList(FakeModelApi(session), 'invoices', prefetch=2)
+        ml.page_size = 3
+        for i in ml:
+            if i == 4:
+                break
+        self.assertTrue(len(session.calls) <= 4)
+
+    def test_stream(self):
+        session = FakeSession(5)
+        ml = ModelList(FakeModelApi(session), 'invoices')
+        ml.page_size = 3
+        self.assertEqual(list(range(15)), [i for i in ml.stream()])
+        self.assertEqual({}, dict(ml.pages))
+
+    def test_cache_pages(self):
+        session = FakeSession(5)
+        ml = ModelList(FakeModelApi(session), 'invoices', cache_pages=2)
+        ml.page_size = 3
+        self.assertEqual(list(range(15)), [i for i in ml])
+        self.assertEqual([3, 4], list(ml.pages))
+        self.assertEqual(1, ml[1])  # evicted page is loaded again
+        self.assertEqual([1, 2, 3, 4, 5, 1], session.calls)
+        self.assertEqual([4, 0], list(ml.pages))
+
+    def test_slice_loads_covered_pages_only(self):
+        session = FakeSession(100)
+        ml = ModelList(FakeModelApi(session), 'invoices')
+        ml.page_size = 3
+        self.assertEqual([150, 151, 152, 153], list(ml[150:154]))
+        self.assertEqual([51, 52], session.calls)
+        self.assertEqual([297, 298, 299], list(ml[297:]))
+        self.assertEqual([51, 52, 100], session.calls)
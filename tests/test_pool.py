@@ -0,0 +1,59 @@
+import unittest
+
+from fakturoid.pool import FakturoidPool
+from fakturoid.throttle import AccountScheduler
+
+from benchmarks.server import StubServer
+
+
+def invoice_numbers(fa):
+    return [invoice.number for invoice in fa.invoices()]
+
+
+class FakturoidPoolTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.server = StubServer(invoices=30).start()
+        self.pool = FakturoidPool([('slug{0}'.format(i), 'bench@example.com', 'key') for i in range(5)],
+                                  base_url=self.server.base_url, rate_limit=1000, account_rate_limit=100)
+
+    def tearDown(self):
+        self.pool.close()
+        self.server.stop()
+
+    def test_sessions(self):
+        fa = self.pool['slug1']
+        self.assertIs(fa, self.pool.session('slug1'))
+        self.assertEqual('slug1', fa.slug)
+        self.assertIs(self.pool.transport, fa.transport)
+        self.assertIsInstance(fa.scheduler, AccountScheduler)
+        self.assertIs(self.pool.scheduler, fa.scheduler.parent)
+        self.assertEqual(100, fa.scheduler.rate)
+
+    def test_map(self):
+        results = list(self.pool.map(lambda fa: fa.invoices(), workers=3))
+        self.assertEqual(sorted(self.pool.slugs), sorted(r.slug for r in results))
+        for result in results:
+            self.assertTrue(result.ok)
+            self.assertEqual(30, len(result.value))  # lists are loaded completely
+        self.assertEqual(10, self.server.requests)
+
+    def test_map_errors(self):
+        def fn(fa):
+            if fa.slug == 'slug2':
+                raise ValueError('failed')
+            return fa.slug
+        results = dict((r.slug, r) for r in self.pool.map(fn, slugs=['slug1', 'slug2'], workers=1))
+        self.assertEqual('slug1', results['slug1'].value)
+        self.assertFalse(results['slug2'].ok)
+        self.assertEqual('failed', str(results['slug2'].error))
+
+    def test_map_processes(self):
+        results = list(self.pool.map(invoice_numbers, slugs=['slug3', 'slug4'], workers=2, processes=True))
+        self.assertEqual(['slug3', 'slug4'], sorted(r.slug for r in results))
+        self.assertEqual(['2020-00001', '2020-00002'], results[0].value[:2])
+        self.assertEqual(30, len(results[1].value))
+
+
+if __name__ == '__main__':
+    unittest.main()
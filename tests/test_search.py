@@ -0,0 +1,90 @@
+import json
+import unittest
+from unittest.mock import patch
+
+from fakturoid import Fakturoid, Subject
+from fakturoid.search import SubjectIndex
+
+from tests.mock import response, FakeResponse
+
+
+class SubjectIndexTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.index = SubjectIndex([
+            Subject(id=1, name='Účetnictví Novák', city='Brno', registration_no='12345678', vat_no='CZ12345678'),
+            Subject(id=2, name='Nová Firma s.r.o.', city='Praha', email='info@novafirma.cz'),
+            Subject(id=3, name='Apple Czech s.r.o.', city='Praha'),
+        ])
+
+    def ids(self, query):
+        return [s.id for s in self.index.search(query)]
+
+    def test_prefix(self):
+        self.assertEqual([2, 1], self.ids('nov'))  # same score, ordered by name
+        self.assertEqual([1], self.ids('ucetni'))  # diacritics and case are ignored
+        self.assertEqual([2], self.ids('nova praha'))  # all terms have to match
+        self.assertEqual([], self.ids('x'))
+
+    def test_trigrams(self):
+        self.assertEqual([1], self.ids('12345678'))  # substring of vat_no
+        self.assertEqual([3], self.ids('aple'))
+        self.assertEqual([2], self.ids('novafirma'))
+
+    def test_short_terms(self):
+        self.assertEqual([2, 1], self.ids('n'))
+        self.assertEqual([2], self.ids('in'))  # info@novafirma.cz
+        self.index.remove(2)
+        self.index.add([Subject(id=1, name='Účetnictví Dvořák')])
+        self.assertEqual([], self.ids('n'))
+        self.assertEqual([1], self.ids('dv'))
+
+    def test_limit(self):
+        self.assertEqual([3], [s.id for s in self.index.search('praha', limit=1)])
+        self.assertEqual([2], [s.id for s in self.index.search('n', limit=1)])
+        self.assertEqual([3], [s.id for s in self.index.search('aple', limit=1)])
+
+    def test_update(self):
+        self.index.add([Subject(id=3, name='Orange', city='Praha')])
+        self.assertEqual([], self.ids('apple'))
+        self.assertEqual([3], self.ids('orange'))
+        self.index.remove(2)
+        self.assertEqual([3], self.ids('praha'))
+
+
+class LocalSearchTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.fa = Fakturoid('myslug', '9ACA7', 'Test App')
+
+    @patch('requests.Session.get', return_value=response('subjects.json'))
+    def test_local_search(self, mock):
+        self.assertEqual(['MICROSOFT s.r.o.'], [s.name for s in self.fa.subjects.search('micro', local=True)])
+        self.assertEqual(['Apple Czech s.r.o.'], [s.name for s in self.fa.subjects.search('apple', local=True)])
+        self.assertEqual(1, mock.call_count)
+
+        self.fa.subject_index(max_age=0)
+        self.assertEqual({'page': 1, 'updated_since': '2012-06-02T09:34:47+02:00'}, mock.call_args[1]['params'])
+
+    def test_load_all_pages(self):
+        def get(url, params=None, **kwargs):
+            subjects = [{'id': params['page'] * 10 + i, 'name': 'Subject {0}{1}'.format(params['page'], i)}
+                        for i in range(2)]
+            r = FakeResponse(json.dumps(subjects))
+            r.headers = {'link': '<https://app.fakturoid.cz/api/v2/accounts/myslug/subjects.json?page=3>; rel="last"'}
+            return r
+        with patch('requests.Session.get', side_effect=get) as mock:
+            self.assertEqual(['Subject 31'], [s.name for s in self.fa.subjects.search('subject 31', local=True)])
+        self.assertEqual(6, len(self.fa.subject_index()))
+        self.assertEqual(3, mock.call_count)
+
+    @patch('requests.Session.delete', return_value=FakeResponse(''))
+    @patch('requests.Session.get', return_value=response('subjects.json'))
+    def test_delete_updates_index(self, get_mock, delete_mock):
+        self.fa.subject_index()
+        self.fa.delete(Subject(id=28))
+        self.assertEqual([], self.fa.subjects.search('microsoft', local=True))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,119 @@
+import threading
+import time
+import unittest
+from unittest.mock import Mock, patch
+
+from fakturoid import Fakturoid
+from fakturoid.throttle import Scheduler, priority, BULK
+
+from tests.mock import response, FakeResponse
+
+
+class SchedulerTestCase(unittest.TestCase):
+
+    def test_rate(self):
+        scheduler = Scheduler(rate=100, burst=1)
+        start = time.time()
+        for i in range(11):
+            scheduler.acquire()
+        self.assertGreaterEqual(time.time() - start, 0.09)
+
+    def test_retry_after(self):
+        scheduler = Scheduler()
+        scheduler.feedback(429, {'retry-after': '0.1'})
+        self.assertEqual(0.1, scheduler.retry_delay('post', 429, {'retry-after': '0.1'}, 0))
+        start = time.time()
+        scheduler.acquire()
+        self.assertGreaterEqual(time.time() - start, 0.08)
+
+    def test_retry_delay(self):
+        scheduler = Scheduler(max_retries=2, backoff=1)
+        self.assertIsNone(scheduler.retry_delay('get', 404, {}, 0))
+        self.assertIsNone(scheduler.retry_delay('post', 503, {}, 0))
+        self.assertIsNone(scheduler.retry_delay('get', 503, {}, 2))
+        delay = scheduler.retry_delay('get', 503, {}, 1)
+        self.assertTrue(1 <= delay <= 2)
+
+    def test_rate_limit_headers(self):
+        scheduler = Scheduler()
+        scheduler.feedback(200, {'x-ratelimit': 'default;r=0;t=0.1'})
+        start = time.time()
+        scheduler.acquire()
+        self.assertGreaterEqual(time.time() - start, 0.08)
+
+    def test_priority(self):
+        scheduler = Scheduler()
+        scheduler.feedback(429, {'retry-after': '0.1'})
+        order = []
+
+        def call(name, level):
+            with priority(level):
+                scheduler.acquire()
+            order.append(name)
+
+        bulk = threading.Thread(target=call, args=('bulk', BULK))
+        bulk.start()
+        time.sleep(0.02)
+        interactive = threading.Thread(target=call, args=('interactive', 0))
+        interactive.start()
+        bulk.join()
+        interactive.join()
+        self.assertEqual(['interactive', 'bulk'], order)
+
+    def test_priority_async(self):
+        import asyncio
+        scheduler = Scheduler()
+        scheduler.feedback(429, {'retry-after': '0.1'})
+        order = []
+
+        async def call(name, level):
+            with priority(level):
+                await scheduler.acquire_async()
+            order.append(name)
+
+        def sync_call():
+            scheduler.acquire()
+            order.append('sync')
+
+        async def main():
+            bulk = asyncio.ensure_future(call('bulk', BULK))
+            await asyncio.sleep(0.02)
+            thread = threading.Thread(target=sync_call)
+            thread.start()
+            await asyncio.sleep(0.02)
+            await call('interactive', 0)
+            await bulk
+            thread.join()
+
+        asyncio.run(main())
+        self.assertEqual('bulk', order[-1])
+        self.assertEqual(['interactive', 'sync'], sorted(order[:2]))
+
+
+class SessionRetryTestCase(unittest.TestCase):
+
+    def test_retry_on_429(self):
+        fa = Fakturoid('myslug', '9ACA7', 'Test App')
+        limited = FakeResponse('')
+        limited.status_code = 429
+        limited.headers = {'retry-after': '0'}
+        with patch('requests.Session.get', side_effect=[limited, response('subject_28.json')]) as mock:
+            subject = fa.subject(28)
+        self.assertEqual(2, mock.call_count)
+        self.assertEqual(28, subject.id)
+
+    def test_retry_closes_stream(self):
+        fa = Fakturoid('myslug', '9ACA7', 'Test App')
+        unavailable = FakeResponse('')
+        unavailable.status_code = 503
+        unavailable.headers = {}
+        unavailable.close = Mock()
+        fa.scheduler.backoff = 0
+        with patch('requests.Session.get', side_effect=[unavailable, response('invoices.json')]):
+            invoices = list(fa.invoices().stream())
+        self.assertEqual(2, len(invoices))
+        unavailable.close.assert_called_once_with()
+
+
+if __name__ == '__main__':
+    unittest.main()
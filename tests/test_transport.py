@@ -0,0 +1,71 @@
+import shutil
+import tempfile
+import unittest
+from unittest.mock import patch
+
+import requests
+
+from fakturoid import Fakturoid
+from fakturoid.transport import RecordReplayTransport
+
+from tests.mock import response, FakeResponse
+
+
+class FakeTransport(object):
+
+    def __init__(self):
+        self.calls = []
+
+    def request(self, method, url, **kwargs):
+        self.calls.append((method, url, kwargs.get('params')))
+        r = response('invoices.json')
+        r.headers = {'Link': '<https://app.fakturoid.cz/api/v2/accounts/myslug/invoices.json?page=3>; rel="last"'}
+        return r
+
+    def close(self):
+        pass
+
+
+class RecordReplayTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def session(self, transport):
+        return Fakturoid('myslug', '9ACA7', 'Test App', transport=transport)
+
+    def test_record_and_replay(self):
+        recording = FakeTransport()
+        fa = self.session(RecordReplayTransport(self.directory, mode='record', transport=recording))
+        self.assertEqual(['2012-0004', '2012-0005'], [i.number for i in fa.invoices(status='paid')[:2]])
+
+        fa = self.session(RecordReplayTransport(self.directory, latency=0.01))
+        with patch('fakturoid.transport.time.sleep') as sleep:
+            invoices = fa.invoices(status='paid')
+            self.assertEqual(['2012-0004', '2012-0005'], [i.number for i in invoices[:2]])
+        sleep.assert_called_once_with(0.01)
+        self.assertEqual(3, invoices.page_count)  # from recorded Link header
+        self.assertEqual(1, len(recording.calls))
+
+    def test_missing_response(self):
+        fa = self.session(RecordReplayTransport(self.directory))
+        with self.assertRaises(LookupError):
+            fa.invoice(9)
+
+    def test_recorded_error(self):
+        not_found = FakeResponse('')
+        not_found.status_code = 404
+        recording = FakeTransport()
+        recording.request = lambda method, url, **kwargs: not_found
+        with self.assertRaises(requests.HTTPError):
+            self.session(RecordReplayTransport(self.directory, mode='record', transport=recording)).invoice(1)
+
+        with self.assertRaises(requests.HTTPError):
+            self.session(RecordReplayTransport(self.directory)).invoice(1)
+
+
+if __name__ == '__main__':
+    unittest.main()